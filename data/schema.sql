@@ -1,35 +1,97 @@
+-- each paper, with its cost on each day of the week (cost_0 is Monday) and a bitmask of the days it is delivered (bit 0 is Monday)
 CREATE TABLE IF NOT EXISTS papers (
     paper_id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL,
+    cost_0 REAL NOT NULL DEFAULT 0,
+    cost_1 REAL NOT NULL DEFAULT 0,
+    cost_2 REAL NOT NULL DEFAULT 0,
+    cost_3 REAL NOT NULL DEFAULT 0,
+    cost_4 REAL NOT NULL DEFAULT 0,
+    cost_5 REAL NOT NULL DEFAULT 0,
+    cost_6 REAL NOT NULL DEFAULT 0,
+    delivery_mask INTEGER NOT NULL DEFAULT 0 CHECK (delivery_mask >= 0 AND delivery_mask < 128),
     CONSTRAINT unique_paper_name UNIQUE (name)
 );
 
-CREATE TABLE IF NOT EXISTS cost_and_delivery_data (
-    paper_day_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    paper_id INTEGER NOT NULL REFERENCES papers(paper_id),
-    day_id INTEGER NOT NULL,
-    cost REAL NOT NULL,
-    delivered INTEGER NOT NULL,
-    CONSTRAINT unique_paper_day UNIQUE (paper_id, day_id)
-);
+-- compatibility view over the packed cost and delivery data of each paper, with one row for each day of each paper (as it was stored before)
+-- writes to the view are applied to `papers` by the triggers below
+CREATE VIEW IF NOT EXISTS cost_and_delivery_data (paper_day_id, paper_id, day_id, cost, delivered) AS
+WITH days (day_id) AS (VALUES (0), (1), (2), (3), (4), (5), (6))
+SELECT
+    papers.paper_id * 7 + days.day_id,
+    papers.paper_id,
+    days.day_id,
+    CASE days.day_id WHEN 0 THEN papers.cost_0 WHEN 1 THEN papers.cost_1 WHEN 2 THEN papers.cost_2 WHEN 3 THEN papers.cost_3 WHEN 4 THEN papers.cost_4 WHEN 5 THEN papers.cost_5 WHEN 6 THEN papers.cost_6 END,
+    (papers.delivery_mask >> days.day_id) & 1
+FROM papers
+CROSS JOIN days;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_insert INSTEAD OF INSERT ON cost_and_delivery_data
+BEGIN
+    UPDATE papers SET
+        cost_0 = CASE NEW.day_id WHEN 0 THEN NEW.cost ELSE cost_0 END,
+        cost_1 = CASE NEW.day_id WHEN 1 THEN NEW.cost ELSE cost_1 END,
+        cost_2 = CASE NEW.day_id WHEN 2 THEN NEW.cost ELSE cost_2 END,
+        cost_3 = CASE NEW.day_id WHEN 3 THEN NEW.cost ELSE cost_3 END,
+        cost_4 = CASE NEW.day_id WHEN 4 THEN NEW.cost ELSE cost_4 END,
+        cost_5 = CASE NEW.day_id WHEN 5 THEN NEW.cost ELSE cost_5 END,
+        cost_6 = CASE NEW.day_id WHEN 6 THEN NEW.cost ELSE cost_6 END,
+        delivery_mask = (delivery_mask & ~(1 << NEW.day_id)) | ((NEW.delivered != 0) << NEW.day_id)
+    WHERE paper_id = NEW.paper_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_update INSTEAD OF UPDATE ON cost_and_delivery_data
+BEGIN
+    UPDATE papers SET
+        cost_0 = CASE NEW.day_id WHEN 0 THEN NEW.cost ELSE cost_0 END,
+        cost_1 = CASE NEW.day_id WHEN 1 THEN NEW.cost ELSE cost_1 END,
+        cost_2 = CASE NEW.day_id WHEN 2 THEN NEW.cost ELSE cost_2 END,
+        cost_3 = CASE NEW.day_id WHEN 3 THEN NEW.cost ELSE cost_3 END,
+        cost_4 = CASE NEW.day_id WHEN 4 THEN NEW.cost ELSE cost_4 END,
+        cost_5 = CASE NEW.day_id WHEN 5 THEN NEW.cost ELSE cost_5 END,
+        cost_6 = CASE NEW.day_id WHEN 6 THEN NEW.cost ELSE cost_6 END,
+        delivery_mask = (delivery_mask & ~(1 << NEW.day_id)) | ((NEW.delivered != 0) << NEW.day_id)
+    WHERE paper_id = NEW.paper_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_delete INSTEAD OF DELETE ON cost_and_delivery_data
+BEGIN
+    UPDATE papers SET
+        cost_0 = CASE OLD.day_id WHEN 0 THEN 0 ELSE cost_0 END,
+        cost_1 = CASE OLD.day_id WHEN 1 THEN 0 ELSE cost_1 END,
+        cost_2 = CASE OLD.day_id WHEN 2 THEN 0 ELSE cost_2 END,
+        cost_3 = CASE OLD.day_id WHEN 3 THEN 0 ELSE cost_3 END,
+        cost_4 = CASE OLD.day_id WHEN 4 THEN 0 ELSE cost_4 END,
+        cost_5 = CASE OLD.day_id WHEN 5 THEN 0 ELSE cost_5 END,
+        cost_6 = CASE OLD.day_id WHEN 6 THEN 0 ELSE cost_6 END,
+        delivery_mask = delivery_mask & ~(1 << OLD.day_id)
+    WHERE paper_id = OLD.paper_id;
+END;
 
+-- strings without a paper ID apply to every paper
+-- the mask is the day bitmask of the string, compiled when it is added (NULL until it is backfilled, in which case the string is parsed instead)
 CREATE TABLE IF NOT EXISTS undelivered_strings (
     string_id INTEGER PRIMARY KEY AUTOINCREMENT,
     year INTEGER NOT NULL CHECK (year >= 0),
     month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
-    paper_id INTEGER NOT NULL REFERENCES papers(paper_id),
-    string TEXT NOT NULL
+    paper_id INTEGER REFERENCES papers(paper_id),
+    string TEXT NOT NULL,
+    mask INTEGER
 );
 
+-- timestamps are stored as YYYY-MM-DD HH:MM:SS, so that they sort (and can be range-scanned through `unique_log`) in order of time
 CREATE TABLE IF NOT EXISTS logs (
     log_id INTEGER PRIMARY KEY AUTOINCREMENT,
     paper_id INTEGER NOT NULL REFERENCES papers(paper_id),
     timestamp TEXT NOT NULL,
     month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
     year INTEGER NOT NULL CHECK (year >= 0),
+    undelivered_mask INTEGER NOT NULL DEFAULT 0,
     CONSTRAINT unique_log UNIQUE (timestamp, paper_id, month, year)
 );
 
+-- legacy log format, with one row per undelivered date
+-- new logs store their undelivered dates as a day bitmask in `logs`, and existing rows are moved there on startup
 CREATE TABLE IF NOT EXISTS undelivered_dates_logs (
     undelivered_dates_log_id INTEGER PRIMARY KEY AUTOINCREMENT,
     log_id INTEGER NOT NULL REFERENCES logs(log_id),
@@ -40,4 +102,134 @@ CREATE TABLE IF NOT EXISTS cost_logs (
     cost_log_id INTEGER PRIMARY KEY AUTOINCREMENT,
     log_id INTEGER NOT NULL REFERENCES logs(log_id),
     cost REAL NOT NULL
-);
\ No newline at end of file
+);
+
+-- indexes for the lookups the core does most often
+-- undelivered strings are read by month, and their masks and the strings themselves are included so that those reads never touch the table
+CREATE INDEX IF NOT EXISTS undelivered_strings_by_month ON undelivered_strings (year, month, paper_id, mask, string);
+CREATE INDEX IF NOT EXISTS logs_by_paper ON logs (paper_id, year, month);
+CREATE INDEX IF NOT EXISTS cost_logs_by_log ON cost_logs (log_id, cost);
+CREATE INDEX IF NOT EXISTS undelivered_dates_logs_by_log ON undelivered_dates_logs (log_id);
+
+-- revision counters, bumped by the triggers below whenever data that affects a bill changes
+-- the same triggers mark the papers whose cached bills are affected as dirty, or drop the whole cached bill of the month for strings for every paper
+-- paper and cost data affect every month, and are counted under month 0 and year 0
+-- undelivered strings only affect their own month, and are counted under that month and year
+CREATE TABLE IF NOT EXISTS revisions (
+    month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
+    year INTEGER NOT NULL CHECK (year >= 0),
+    revision INTEGER NOT NULL,
+    PRIMARY KEY (month, year)
+);
+
+CREATE TRIGGER IF NOT EXISTS papers_insert_revision AFTER INSERT ON papers
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills;
+END;
+
+CREATE TRIGGER IF NOT EXISTS papers_delete_revision AFTER DELETE ON papers
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills;
+END;
+
+CREATE TRIGGER IF NOT EXISTS papers_update_revision AFTER UPDATE OF cost_0, cost_1, cost_2, cost_3, cost_4, cost_5, cost_6, delivery_mask ON papers
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_insert_revision AFTER INSERT ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills
+    WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NOT NULL;
+
+    DELETE FROM cached_bills WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NULL;
+END;
+
+-- compiling the mask of a string does not change what it means, so it does not count as a change
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_update_revision AFTER UPDATE OF year, month, paper_id, string ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills
+    WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NOT NULL;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills
+    WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NOT NULL;
+
+    DELETE FROM cached_bills WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NULL;
+    DELETE FROM cached_bills WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_delete_revision AFTER DELETE ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills
+    WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NOT NULL;
+
+    DELETE FROM cached_bills WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NULL;
+END;
+
+-- the last bill calculated for each month, and the revisions of the data it was calculated from
+CREATE TABLE IF NOT EXISTS cached_bills (
+    month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
+    year INTEGER NOT NULL CHECK (year >= 0),
+    papers_revision INTEGER NOT NULL,
+    strings_revision INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (month, year)
+);
+
+CREATE TABLE IF NOT EXISTS cached_bill_costs (
+    month INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    paper_id INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    undelivered_mask INTEGER NOT NULL,
+    PRIMARY KEY (month, year, paper_id),
+    FOREIGN KEY (month, year) REFERENCES cached_bills(month, year)
+);
+
+-- papers whose cached bills are out of date, marked by the triggers above whenever their data changes
+-- these are recalculated on their own, instead of recalculating the whole month
+CREATE TABLE IF NOT EXISTS dirty_papers (
+    month INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    paper_id INTEGER NOT NULL,
+    PRIMARY KEY (month, year, paper_id)
+);
+
+-- dropping a cached bill drops its costs and dirty papers with it
+CREATE TRIGGER IF NOT EXISTS cached_bills_delete AFTER DELETE ON cached_bills
+BEGIN
+    DELETE FROM cached_bill_costs WHERE month = OLD.month AND year = OLD.year;
+    DELETE FROM dirty_papers WHERE month = OLD.month AND year = OLD.year;
+END;
+
+-- the version of this schema, which must be the same as the number of migrations in `npbc_migrations.py`
+-- this way, a DB created from this file is never migrated again
+PRAGMA user_version = 9;
@@ -11,9 +11,10 @@ wraps a CLI around the core functionality (using argparse)
 from argparse import ArgumentParser
 from argparse import Namespace as ArgNamespace
 from collections.abc import Generator
-from datetime import datetime
-from json import dumps
-from sqlite3 import Connection, DatabaseError, connect
+from datetime import date, datetime, time
+from json import JSONDecodeError, dumps, load
+from multiprocessing import freeze_support
+from sqlite3 import Connection, DatabaseError
 from sys import argv
 
 from colorama import Fore, Style
@@ -34,19 +35,24 @@ def define_and_read_args(arguments: list[str]) -> ArgNamespace:
         prog="npbc",
         description="Calculates your monthly newspaper bill."
     )
+    main_parser.add_argument('--profile', choices=npbc_core.PERFORMANCE_PROFILES, help=f"Performance profile for the DB connection. Defaults to the NPBC_PERFORMANCE_PROFILE environment variable, or \"{npbc_core.PERFORMANCE_PROFILE}\".")
     functions = main_parser.add_subparsers(required=True)
 
 
     # calculate subparser
     calculate_parser = functions.add_parser(
         'calculate',
-        help="Calculate the bill for one month. Previous month will be used if month or year flags are not set."
+        help="Calculate the bill for one month, or for a range of months. Previous month will be used if month or year flags are not set."
     )
 
     calculate_parser.set_defaults(func=calculate)
     calculate_parser.add_argument('-m', '--month', type=int, help="Month to calculate bill for. Must be between 1 and 12.")
     calculate_parser.add_argument('-y', '--year', type=int, help="Year to calculate bill for. Must be greater than 0.")
     calculate_parser.add_argument('-l', '--nolog', help="Don't log the result of the calculation.", action='store_true')
+    calculate_parser.add_argument('-f', '--from', dest='from_month', type=str, help="First month of a range to calculate bills for, in the format YYYY-MM. Must be used with --to.")
+    calculate_parser.add_argument('-t', '--to', dest='to_month', type=str, help="Last month of a range to calculate bills for, in the format YYYY-MM. Must be used with --from.")
+    calculate_parser.add_argument('-w', '--workers', type=int, help="Number of processes to calculate with. Papers are split into shards, and each shard is calculated by one process.")
+    calculate_parser.add_argument('--shardsize', type=int, help=f"Number of papers in each shard, when calculating with more than one process. Defaults to {npbc_core.SHARD_SIZE}.", default=npbc_core.SHARD_SIZE)
 
 
     # add undelivered string subparser
@@ -71,6 +77,7 @@ def define_and_read_args(arguments: list[str]) -> ArgNamespace:
 
     deludl_parser.set_defaults(func=deludl)
     deludl_parser.add_argument('-p', '--paperid', type=str, help="ID of paper to unregister undelivered incident(s) for.")
+    deludl_parser.add_argument('-a', '--all', help="Unregister undelivered incident(s) that were registered for all papers.", action='store_true')
     deludl_parser.add_argument('-i', '--stringid', type=str, help="String ID of paper to unregister undelivered incident(s) for.")
     deludl_parser.add_argument('-m', '--month', type=int, help="Month to unregister undelivered incident(s) for. Must be between 1 and 12.")
     deludl_parser.add_argument('-y', '--year', type=int, help="Year to unregister undelivered incident(s) for. Must be greater than 0.")
@@ -85,12 +92,22 @@ def define_and_read_args(arguments: list[str]) -> ArgNamespace:
 
     getudl_parser.set_defaults(func=getudl)
     getudl_parser.add_argument('-p', '--paperid', type=str, help="ID for paper.")
+    getudl_parser.add_argument('-a', '--all', help="Only get strings that were registered for all papers.", action='store_true')
     getudl_parser.add_argument('-i', '--stringid', type=str, help="String ID of paper to unregister undelivered incident(s) for.")
     getudl_parser.add_argument('-m', '--month', type=int, help="Month. Must be between 1 and 12.")
     getudl_parser.add_argument('-y', '--year', type=int, help="Year. Must be greater than 0.")
     getudl_parser.add_argument('-s', '--string', type=str, help="Dates when you did not receive any papers.")
 
 
+    # compile undelivered strings subparser
+    compileudl_parser = functions.add_parser(
+        'compileudl',
+        help="Compile stored date strings that were added before their days were stored alongside them, so that they do not need to be parsed again when calculating."
+    )
+
+    compileudl_parser.set_defaults(func=compileudl)
+
+
     # edit paper subparser
     editpaper_parser = functions.add_parser(
         'editpaper',
@@ -125,6 +142,39 @@ def define_and_read_args(arguments: list[str]) -> ArgNamespace:
     delpaper_parser.set_defaults(func=delpaper)
     delpaper_parser.add_argument('-p', '--paperid', type=str, help="ID for paper to be deleted.", required=True)
 
+    # bulk papers subparser
+    bulkpapers_parser = functions.add_parser(
+        'bulkpapers',
+        help="Add, edit, and/or delete many newspapers at once, from a JSON file."
+    )
+
+    bulkpapers_parser.set_defaults(func=bulkpapers)
+    bulkpapers_parser.add_argument('-f', '--file', type=str, help="Path to a JSON object with an \"upsert\" list of papers (each with a \"name\", \"delivered\" days as 'Y'/'N' for all seven weekdays or as a bitmask, and seven daywise \"costs\") and/or a \"delete\" list of paper names. Papers that already exist (by name) are edited.", required=True)
+
+    # import subparser
+    import_parser = functions.add_parser(
+        'import',
+        help="Import newspapers or undelivered strings from a CSV or JSON Lines file."
+    )
+
+    import_parser.set_defaults(func=import_file)
+    import_parser.add_argument('-k', '--kind', type=str, choices=npbc_core.IMPORT_KINDS, help="What the file contains. Papers need a \"name\", the \"delivered\" days ('Y'/'N' for all seven weekdays, or a bitmask), and daywise costs (a \"costs\" list, or \"cost_0\" to \"cost_6\"). Strings need a \"month\", \"year\", and \"string\", and are for all papers unless they have a \"paper_id\".", required=True)
+    import_parser.add_argument('-f', '--file', type=str, help="Path to the file to import. CSV files must have a header row, and JSON Lines files must have one object per line.", required=True)
+    import_parser.add_argument('-r', '--rejects', type=str, help="Path to write the records that could not be imported to, as JSON Lines.")
+
+    # export subparser
+    export_parser = functions.add_parser(
+        'export',
+        help="Export logs, undelivered dates, or newspapers to a CSV, JSON Lines, or NumPy (.npy/.npz) file."
+    )
+
+    export_parser.set_defaults(func=export_file)
+    export_parser.add_argument('-k', '--kind', type=str, choices=tuple(npbc_core.EXPORT_COLUMNS), help="What to export. Logs have one row per log (with its cost and undelivered day bitmask), and dates have one row per undelivered date.", required=True)
+    export_parser.add_argument('-o', '--output', type=str, help="Path to the file to export to. The format is chosen by its extension.", required=True)
+    export_parser.add_argument('-p', '--paperid', type=int, help="ID for paper to export.")
+    export_parser.add_argument('-f', '--from', dest='from_month', type=str, help="First month of logs to export, in the format YYYY-MM.")
+    export_parser.add_argument('-t', '--to', dest='to_month', type=str, help="Last month of logs to export, in the format YYYY-MM.")
+
     # get paper subparser
     getpapers_parser = functions.add_parser(
         'getpapers',
@@ -149,7 +199,20 @@ def define_and_read_args(arguments: list[str]) -> ArgNamespace:
     getlogs_parser.add_argument('-p', '--paperid', type=str, help="ID for paper.")
     getlogs_parser.add_argument('-m', '--month', type=int, help="Month. Must be between 1 and 12.")
     getlogs_parser.add_argument('-y', '--year', type=int, help="Year. Must be greater than 0.")
-    getlogs_parser.add_argument('-t' , '--timestamp', type=str, help="Timestamp. Must be in the format dd/mm/yyyy hh:mm:ss AM/PM.")
+    getlogs_parser.add_argument('-t' , '--timestamp', type=str, help="Timestamp. Must be in the format yyyy-mm-dd hh:mm:ss or dd/mm/yyyy hh:mm:ss AM/PM.")
+    getlogs_parser.add_argument('-s', '--since', type=str, help="Earliest timestamp, inclusive. Must be in the format yyyy-mm-dd[ hh:mm:ss] or dd/mm/yyyy hh:mm:ss AM/PM.")
+    getlogs_parser.add_argument('-u', '--until', type=str, help="Latest timestamp, inclusive. Must be in the format yyyy-mm-dd[ hh:mm:ss] or dd/mm/yyyy hh:mm:ss AM/PM. A date on its own includes the whole day.")
+
+
+    # archive logs subparser
+    archive_parser = functions.add_parser(
+        'archive',
+        help="Move the logs of a past year out of the main database, into an archive of their own. Archived logs are still included in getlogs and export."
+    )
+
+    archive_parser.set_defaults(func=archive)
+    archive_parser.add_argument('-y', '--year', type=int, help="Year to archive the logs of. Must be before the current year.", required=True)
+    archive_parser.add_argument('-v', '--vacuum', help="Shrink the main database file afterwards, to give back the space the logs used.", action='store_true')
 
 
     # update application subparser
@@ -190,7 +253,13 @@ def calculate(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     """calculate the cost for a given month and year
     - default to the previous month if no month and no year is given
     - default to the current month if no month is given and year is given
-    - default to the current year if no year is given and month is given"""
+    - default to the current year if no year is given and month is given
+    - if a range of months is given, calculate for each month in the range instead"""
+
+    # if a range of months is given, calculate for the whole range at once
+    if parsed_arguments.from_month or parsed_arguments.to_month:
+        calculate_range(parsed_arguments, connection)
+        return
 
     ## deal with month and year
 
@@ -217,36 +286,15 @@ def calculate(parsed_arguments: ArgNamespace, connection: Connection) -> None:
         month = previous_month.month
         year = previous_month.year
 
-    # prepare a dictionary for undelivered strings
-    undelivered_strings = {
-        int(paper_data.paper_id): []
-        for paper_data in npbc_core.get_papers(connection)
-    }
-
-    # get the undelivered strings from the database
-    try:
-        raw_undelivered_strings = npbc_core.get_undelivered_strings(connection, month=month, year=year)
-
-        # add them to the dictionary
-        for raw_undelivered_string in raw_undelivered_strings:
-            undelivered_strings[raw_undelivered_string.paper_id].append(raw_undelivered_string.string)
-
-    # ignore if none exist
-    except npbc_exceptions.StringNotExists:
-        pass
-    
-    # if there is a database error, print an error message
-    except DatabaseError as e:
-        status_print(False, f"Database error: {e}\nPlease report this to the developer.")
-        return
-
     try:
-        # calculate the cost for each paper
-        costs, total, undelivered_dates = npbc_core.calculate_cost_of_all_papers(
+        # calculate the cost for each paper, reusing the cached bill if nothing has changed
+        costs, total, undelivered_dates = npbc_core.calculate_bill_with_cache(
             connection,
-            undelivered_strings,
             month,
-            year
+            year,
+            workers=parsed_arguments.workers,
+            shard_size=parsed_arguments.shardsize,
+            profile=parsed_arguments.profile
         )
     
     # if there is a database error, print an error message
@@ -254,6 +302,11 @@ def calculate(parsed_arguments: ArgNamespace, connection: Connection) -> None:
         status_print(False, f"Database error: {e}\nPlease report this to the developer.")
         return
 
+    # if the number of workers or the shard size is invalid, print an error message
+    except ValueError as e:
+        status_print(False, f"Invalid input: {e}")
+        return
+
     # format the results
     formatted = '\n'.join(npbc_core.format_output(connection, costs, total, month, year))
 
@@ -275,6 +328,62 @@ def calculate(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     return
 
 
+def calculate_range(parsed_arguments: ArgNamespace, connection: Connection) -> None:
+    """calculate the cost for each month in a range of months (bounds inclusive)
+    - both ends of the range must be given, in the format YYYY-MM
+    - unless the user specifies so, every month is logged in a single transaction"""
+
+    if not (parsed_arguments.from_month and parsed_arguments.to_month):
+        status_print(False, "Both the start (--from) and end (--to) of the range must be given.")
+        return
+
+    if parsed_arguments.month or parsed_arguments.year:
+        status_print(False, "A range of months cannot be combined with the month or year flags.")
+        return
+
+    # parse the start and end of the range
+    try:
+        start = datetime.strptime(parsed_arguments.from_month, r'%Y-%m')
+        end = datetime.strptime(parsed_arguments.to_month, r'%Y-%m')
+
+    except ValueError:
+        status_print(False, "Invalid month format. Please use the following format: YYYY-MM")
+        return
+
+    if start > end:
+        status_print(False, "The start of the range must not be after its end.")
+        return
+
+    try:
+        # calculate the cost for each paper, for each month
+        range_costs = npbc_core.calculate_cost_of_all_papers_in_range(connection, start.month, start.year, end.month, end.year)
+
+    # if there is a database error, print an error message
+    except DatabaseError as e:
+        status_print(False, f"Database error: {e}\nPlease report this to the developer.")
+        return
+
+    # format the results
+    formatted = '\n'.join(npbc_core.format_output_of_range(connection, range_costs))
+
+    # unless the user specifies so, log the results to the database
+    if not parsed_arguments.nolog:
+        try:
+            npbc_core.save_results_in_range(connection, range_costs)
+
+        # if there is a database error, print an error message
+        except DatabaseError as e:
+            status_print(False, f"Database error: {e}\nPlease report this to the developer.")
+            return
+
+        formatted += '\n\nLogs saved to file.'
+
+    # print the results
+    status_print(True, "Success!")
+    print(f"SUMMARY:\n\n{formatted}")
+    return
+
+
 def addudl(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     """add undelivered strings to the database
     - default to the current month if no month and/or no year is given"""
@@ -344,7 +453,8 @@ def deludl(parsed_arguments: ArgNamespace, connection: Connection) -> None:
             year=parsed_arguments.year,
             paper_id=parsed_arguments.paperid,
             string=parsed_arguments.string,
-            string_id=parsed_arguments.stringid
+            string_id=parsed_arguments.stringid,
+            all_papers=parsed_arguments.all
         )
 
     # if no parameters are given, print an error message
@@ -388,7 +498,8 @@ def getudl(parsed_arguments: ArgNamespace, connection: Connection) -> None:
             year=parsed_arguments.year,
             paper_id=parsed_arguments.paperid,
             string_id=parsed_arguments.stringid,
-            string=parsed_arguments.string
+            string=parsed_arguments.string,
+            all_papers=parsed_arguments.all
         )
 
     # if the string doesn't exist, print an error message
@@ -403,10 +514,27 @@ def getudl(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     # print the column headers
     print(f"{Fore.YELLOW}string_id{Style.RESET_ALL} | {Fore.YELLOW}paper_id{Style.RESET_ALL} | {Fore.YELLOW}year{Style.RESET_ALL} | {Fore.YELLOW}month{Style.RESET_ALL} | {Fore.YELLOW}string{Style.RESET_ALL}")
 
-    # print the strings
-    for items in undelivered_strings:
-        print(', '.join([str(item) for item in items]))
+    # print the strings (with "all" in place of the paper ID of strings for all papers)
+    for undelivered_string in undelivered_strings:
+        print(', '.join([str(item) for item in undelivered_string._replace(paper_id=undelivered_string.paper_id or 'all')]))
+
+    return
+
 
+def compileudl(parsed_arguments: ArgNamespace, connection: Connection) -> None:
+    """compile the stored undelivered strings that do not have masks yet
+    - strings that can't be compiled are left as they are, and are reported when calculating"""
+
+    # attempt to compile the strings
+    try:
+        compiled, failed = npbc_core.backfill_undelivered_string_masks(connection)
+
+    # if there is a database error, print an error message
+    except DatabaseError as e:
+        status_print(False, f"Database error: {e}\nPlease report this to the developer.")
+        return
+
+    status_print(not failed, f"Compiled {compiled} string(s). Skipped {failed} string(s) that are not valid for their month.")
     return
 
 
@@ -446,23 +574,19 @@ def extract_costs_from_user_input(connection: Connection, paper_id: int | None,
     # if the delivery data is not given, but the paper ID is given, get the delivery data from the database
     elif paper_id:
         
-        # get the delivery data from the database, and filter for the paper ID
+        # get the delivery data of the paper from the database
         try:
-            raw_data = [paper for paper in npbc_core.get_papers(connection) if paper[0] == int(paper_id)]
+            delivered = npbc_core.get_paper(connection, int(paper_id)).delivered.astype(bool).tolist()
+
+        # if the paper doesn't exist, let the caller report it
+        except npbc_exceptions.PaperNotExists:
+            raise
     
         # if there is a database error, print an error message
         except DatabaseError as e:
             status_print(False, f"Database error: {e}\nPlease report this to the developer.")
             return
 
-        raw_data.sort(key=lambda paper: paper_id)
-
-        # extract the data from the database
-        delivered = [
-            bool(paper_data.delivered)
-            for paper_data in raw_data
-        ]
-
         # if the number of days the paper is delivered is not equal to the number of costs, raise an error
         if len(suspected_data) != delivered.count(True):
             raise npbc_exceptions.InvalidInput("Number of costs don't match number of days delivered.")
@@ -567,6 +691,143 @@ def delpaper(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     return
 
 
+def extract_paper_definitions_from_user_input(input_papers: list) -> Generator[npbc_core.PaperDefinition, None, None]:
+    """convert the papers in a bulk input file to paper definitions
+    - the delivery days may be given as /[YN]{7}/ or as a bitmask
+    - anything else is left as it is, to be reported by the core along with the other invalid papers"""
+
+    for input_paper in input_papers:
+        if not isinstance(input_paper, dict):
+            input_paper = {}
+
+        delivered = input_paper.get('delivered')
+
+        if isinstance(delivered, str) and DELIVERY_MATCH_REGEX.match(delivered):
+            delivered = npbc_core.get_delivery_mask(extract_delivery_from_user_input(delivered))
+
+        yield npbc_core.PaperDefinition(input_paper.get('name'), delivered, input_paper.get('costs') or ())
+
+
+def bulkpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
+    """add, edit, and/or delete papers in bulk
+    - the changes are made in a single transaction
+    - papers that are invalid are skipped, and reported with their position in the file"""
+
+    # attempt to read the file
+    try:
+        with open(parsed_arguments.file, 'r', encoding='utf-8') as input_file:
+            input_data = load(input_file)
+
+    # if the file can't be read, print an error message
+    except (OSError, JSONDecodeError) as e:
+        status_print(False, f"Could not read file: {e}")
+        return
+
+    if not isinstance(input_data, dict) or not isinstance(input_data.get('upsert', []), list) or not isinstance(input_data.get('delete', []), list):
+        status_print(False, "Invalid input: the file must contain a JSON object with \"upsert\" and/or \"delete\" lists.")
+        return
+
+    # attempt to make the changes
+    try:
+        with npbc_core.transaction(connection, "bulkpapers"):
+            upserted = npbc_core.upsert_papers(connection, extract_paper_definitions_from_user_input(input_data.get('upsert', [])))
+            deleted = npbc_core.delete_papers(connection, input_data.get('delete', []))
+
+    # if there is a database error, print an error message
+    except DatabaseError as e:
+        status_print(False, f"Database error: {e}\nPlease report this to the developer.")
+        return
+
+    # print the papers that were skipped
+    for operation, report in (('upsert', upserted), ('delete', deleted)):
+        for index, message in report.errors:
+            print(f"{Fore.YELLOW}{operation}[{index}]{Style.RESET_ALL}: {message}")
+
+    status_print(
+        not (upserted.errors or deleted.errors),
+        f"Added or edited {upserted.applied} paper(s), and deleted {deleted.applied} paper(s). Skipped {len(upserted.errors) + len(deleted.errors)} invalid item(s)."
+    )
+
+    return
+
+
+def import_file(parsed_arguments: ArgNamespace, connection: Connection) -> None:
+    """import papers or undelivered strings from a file
+    - the import is made in a single transaction
+    - records that are invalid are skipped, and written to the reject file if one is given"""
+
+    # attempt to import the file
+    try:
+        report = npbc_core.import_records(connection, parsed_arguments.kind, parsed_arguments.file, parsed_arguments.rejects)
+
+    # if the file is of an unknown format, print an error message
+    except npbc_exceptions.InvalidInput as e:
+        status_print(False, f"Invalid input: {e}")
+        return
+
+    # if a file can't be read or written, print an error message
+    except OSError as e:
+        status_print(False, f"Could not read or write file: {e}")
+        return
+
+    # if there is a database error, print an error message
+    except DatabaseError as e:
+        status_print(False, f"Database error: {e}\nPlease report this to the developer.")
+        return
+
+    status_print(
+        not report.rejected,
+        f"Imported {report.imported} record(s). Rejected {report.rejected} record(s)."
+    )
+
+    return
+
+
+def export_file(parsed_arguments: ArgNamespace, connection: Connection) -> None:
+    """export logs, undelivered dates, or papers to a file
+    - logs and dates may be filtered by paper and by a range of months (either end of which may be left open)"""
+
+    # parse the ends of the range that are given
+    try:
+        start = datetime.strptime(parsed_arguments.from_month, r'%Y-%m') if parsed_arguments.from_month else None
+        end = datetime.strptime(parsed_arguments.to_month, r'%Y-%m') if parsed_arguments.to_month else None
+
+    except ValueError:
+        status_print(False, "Invalid month format. Please use the following format: YYYY-MM")
+        return
+
+    # attempt to export the data
+    try:
+        written = npbc_core.export_records(
+            connection,
+            parsed_arguments.kind,
+            parsed_arguments.output,
+            paper_id=parsed_arguments.paperid,
+            start_month=start.month if start else None,
+            start_year=start.year if start else None,
+            end_month=end.month if end else None,
+            end_year=end.year if end else None
+        )
+
+    # if the file is of an unknown format, print an error message
+    except npbc_exceptions.InvalidInput as e:
+        status_print(False, f"Invalid input: {e}")
+        return
+
+    # if the file can't be written, print an error message
+    except OSError as e:
+        status_print(False, f"Could not write file: {e}")
+        return
+
+    # if there is a database error, print an error message
+    except DatabaseError as e:
+        status_print(False, f"Database error: {e}\nPlease report this to the developer.")
+        return
+
+    status_print(True, f"Exported {written} row(s).")
+    return
+
+
 def getpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     """get a list of all papers in the database
     - filter by whichever parameter the user provides. they may use as many as they want (but keys are always printed)
@@ -575,7 +836,7 @@ def getpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
 
     # get the papers from the database
     try:
-        raw_data = npbc_core.get_papers(connection)
+        paper_columns = npbc_core.get_paper_columns(connection)
 
     # if there is a database error, print an error message
     except DatabaseError as e:
@@ -584,11 +845,7 @@ def getpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
 
     # initialize lists for column headers and paper IDs
     headers = ['paper_id']
-    ids = []
-
-    # extract paperr IDs
-    ids = list(set(paper[0] for paper in raw_data))
-    ids.sort()
+    ids = paper_columns.paper_ids.tolist()
     
     # initialize lists for the data, based on the number of paper IDs
     delivery = [None for _ in ids]
@@ -598,33 +855,14 @@ def getpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     # if the user wants the name, add it to the headers and the data to the list
     if parsed_arguments.names:
         headers.append('name')
-
-        names = list(set(
-            (paper_data.paper_id, paper_data.name)
-            for paper_data in raw_data
-        ))
-
-        # sort the names by paper ID and extract the names only
-        names.sort(key=lambda item: item[0])
-        names = [name for _, name in names]
+        names = list(paper_columns.names)
 
     # if the user wants the delivery data or the costs, get the data about days
     if parsed_arguments.delivered or parsed_arguments.cost:
 
-        # initialize a dictionary for the days of each paper
-        days = {
-            paper_id: {}
-            for paper_id in ids
-        }
-
-        # for each paper, add the days to the dictionary
-        for paper_data in raw_data:
-            days[paper_data.paper_id][paper_data.day_id] = {}
-        
-        # for each paper, add the costs and delivery data to the dictionary
-        for paper_data in raw_data:
-            days[paper_data.paper_id][paper_data.day_id]['delivery'] = paper_data.delivered
-            days[paper_data.paper_id][paper_data.day_id]['cost'] = paper_data.cost
+        # rows of delivery data and costs for each paper
+        delivery_rows = paper_columns.delivered.tolist()
+        cost_rows = paper_columns.costs.tolist()
 
         # if the user wants the data as json, print it and return. include all the data
         if parsed_arguments.json:
@@ -633,13 +871,13 @@ def getpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
                     'name': name,
                     'days': [
                         {
-                            'delivery': days[paper_id][day_id]['delivery'],
-                            'cost': days[paper_id][day_id]['cost']
+                            'delivery': delivered,
+                            'cost': cost
                         }
-                        for day_id in range(len(npbc_core.WEEKDAY_NAMES))
+                        for delivered, cost in zip(delivery_row, cost_row)
                     ]
                 }
-                for paper_id, name in zip(ids, names)
+                for paper_id, name, delivery_row, cost_row in zip(ids, names, delivery_rows, cost_rows)
             }
 
             print(dumps(json_data))
@@ -653,10 +891,10 @@ def getpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
             # convert the data to the /[YN]{7}/ format the user is used to
             delivery = [
                 ''.join([
-                    'Y' if days[paper_id][day_id]['delivery'] else 'N'
-                    for day_id in range(len(npbc_core.WEEKDAY_NAMES))
+                    'Y' if delivered else 'N'
+                    for delivered in delivery_row
                 ])
-                for paper_id in ids
+                for delivery_row in delivery_rows
             ]
 
         # if the user wants the costs, add it to the headers and the data to the list
@@ -666,11 +904,11 @@ def getpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
             # convert the data to the /x(;x){0,6}/ where x is a floating point number format the user is used to
             costs = [
                 ';'.join([
-                    str(days[paper_id][day_id]['cost'])
-                    for day_id in range(len(npbc_core.WEEKDAY_NAMES))
-                    if days[paper_id][day_id]['cost'] != 0
+                    str(cost)
+                    for cost in cost_row
+                    if cost != 0
                 ])
-                for paper_id in ids
+                for cost_row in cost_rows
             ]
 
     # print the headers
@@ -697,10 +935,28 @@ def getpapers(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     return
 
 
+def extract_timestamp_from_user_input(input_timestamp: str, end_of_day: bool = False) -> datetime:
+    """convert the user input to a timestamp
+    - accepts ISO 8601 (as logs are stored), or dd/mm/yyyy hh:mm:ss AM/PM (as logs were stored before)
+    - a date without a time is the start of that day, or its last second if end_of_day is set (so that it is included as an upper bound)"""
+
+    try:
+        return datetime.strptime(input_timestamp, r'%d/%m/%Y %I:%M:%S %p')
+
+    except ValueError:
+        pass
+
+    try:
+        return datetime.combine(date.fromisoformat(input_timestamp), time(23, 59, 59) if end_of_day else time())
+
+    except ValueError:
+        return datetime.fromisoformat(input_timestamp)
+
+
 def getlogs(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     """get a list of all logs in the database
     - filter by whichever parameter the user provides. they may use as many as they want (but log IDs are always printed)
-    - available parameters: log_id, paper_id, month, year, timestamp
+    - available parameters: log_id, paper_id, month, year, timestamp, since, until
     - will return both date logs and cost logs"""
 
     # attempt to get the logs from the database
@@ -711,7 +967,9 @@ def getlogs(parsed_arguments: ArgNamespace, connection: Connection) -> None:
             query_paper_id=parsed_arguments.paperid,
             query_month=parsed_arguments.month,
             query_year=parsed_arguments.year,
-            query_timestamp= datetime.strptime(parsed_arguments.timestamp, r'%d/%m/%Y %I:%M:%S %p') if parsed_arguments.timestamp else None
+            query_timestamp=extract_timestamp_from_user_input(parsed_arguments.timestamp) if parsed_arguments.timestamp else None,
+            query_since=extract_timestamp_from_user_input(parsed_arguments.since) if parsed_arguments.since else None,
+            query_until=extract_timestamp_from_user_input(parsed_arguments.until, end_of_day=True) if parsed_arguments.until else None
         )
 
     # if there is a database error, print an error message
@@ -721,7 +979,7 @@ def getlogs(parsed_arguments: ArgNamespace, connection: Connection) -> None:
 
     # if there is a date format error, print an error message
     except ValueError:
-        status_print(False, "Invalid date format. Please use the following format: dd/mm/yyyy hh:mm:ss AM/PM")
+        status_print(False, "Invalid date format. Please use the following format: yyyy-mm-dd hh:mm:ss")
         return
 
     # print column headers
@@ -737,6 +995,40 @@ def getlogs(parsed_arguments: ArgNamespace, connection: Connection) -> None:
     return
 
 
+def archive(parsed_arguments: ArgNamespace, connection: Connection) -> None:
+    """archive the logs of a past year
+    - unless the user specifies so, the space the logs used is kept by the main database file, to be reused by new data"""
+
+    # attempt to archive the logs
+    try:
+        moved = npbc_core.archive_logs(connection, parsed_arguments.year, profile=parsed_arguments.profile)
+
+        if parsed_arguments.vacuum:
+            connection.execute("VACUUM;")
+
+    # if the year is invalid, print an error message
+    except npbc_exceptions.InvalidInput as e:
+        status_print(False, f"Invalid input: {e}")
+        return
+
+    # if the archive can't be created, print an error message
+    except OSError as e:
+        status_print(False, f"Could not create archive: {e}")
+        return
+
+    # if there is a database error, print an error message
+    except DatabaseError as e:
+        status_print(False, f"Database error: {e}\nPlease report this to the developer.")
+        return
+
+    if not moved:
+        status_print(True, f"No logs to archive for {parsed_arguments.year}.")
+        return
+
+    status_print(True, f"Archived {moved} log(s) to {npbc_core.get_archive_path(parsed_arguments.year)}.")
+    return
+
+
 def update(parsed_arguments: ArgNamespace, _: Connection) -> None:
     """update the application
     - under normal operation, this function should never run
@@ -765,15 +1057,20 @@ def main(arguments: list[str]) -> None:
 
     # attempt to initialize the database
     try:
-        database_path = npbc_core.create_and_setup_DB()
+        database_path = npbc_core.create_and_setup_DB(parsed_namespace.profile)
     
     # if there is a database error, print an error message
     except DatabaseError as e:
         status_print(False, f"Database error: {e}\nPlease report this to the developer.")
         return
 
+    # if the performance profile is unknown (only possible through the environment), print an error message
+    except npbc_exceptions.InvalidInput as e:
+        status_print(False, f"{e}")
+        return
+
     try:
-        with connect(database_path) as connection:
+        with npbc_core.connect_to_DB(database_path, parsed_namespace.profile) as connection:
             
             # execute the appropriate function
             parsed_namespace.func(parsed_namespace, connection)
@@ -786,4 +1083,8 @@ def main(arguments: list[str]) -> None:
 
 
 if __name__ == "__main__":
+
+    # needed for worker processes to start in the bundled executable
+    freeze_support()
+
     main(argv[1:])
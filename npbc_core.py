@@ -7,18 +7,30 @@ provides the core functionality
 """
 
 from calendar import day_name as weekday_names_iterable
-from calendar import monthcalendar, monthrange
+from calendar import monthrange
 from collections import namedtuple
-from collections.abc import Generator
+from bisect import bisect_right
+from collections.abc import Generator, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from csv import DictReader
+from csv import writer as csv_writer
 from datetime import date, datetime, timedelta
+from functools import lru_cache
+from heapq import merge
+from itertools import islice
+from json import JSONDecodeError, dumps, loads
 from os import environ
 from pathlib import Path
 from sqlite3 import Connection, connect
+from tempfile import TemporaryDirectory
+from zipfile import ZIP_STORED, ZipFile
 
 import numpy
 import numpy.typing
 
 import npbc_exceptions
+import npbc_migrations
 import npbc_regex
 
 ## paths for the folder containing schema and database files
@@ -32,349 +44,1359 @@ DATABASE_PATH = DATABASE_DIR / "npbc.sqlite"
 SCHEMA_DIR = Path(DATABASE_VARIABLE) if DATABASE_VARIABLE is not None else Path(__file__).parent
 SCHEMA_PATH = SCHEMA_DIR / "schema.sql"
 
+## folder for archives of old logs, with one DB for the logs of each year
+ARCHIVE_DIR = DATABASE_DIR / "archives"
+ARCHIVE_PREFIX = "logs-"
+
+## schema of each archive, which only has the logs (with the same IDs as they had in the main DB) and their costs
+ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS logs (
+        log_id INTEGER PRIMARY KEY,
+        paper_id INTEGER NOT NULL,
+        timestamp TEXT NOT NULL,
+        month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
+        year INTEGER NOT NULL CHECK (year >= 0),
+        undelivered_mask INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS cost_logs (
+        cost_log_id INTEGER PRIMARY KEY,
+        log_id INTEGER NOT NULL REFERENCES logs(log_id),
+        cost REAL NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS logs_by_paper ON logs (paper_id, year, month);
+    CREATE INDEX IF NOT EXISTS logs_by_timestamp ON logs (timestamp);
+    CREATE INDEX IF NOT EXISTS cost_logs_by_log ON cost_logs (log_id, cost);
+"""
+
+## format of the timestamps of logs, which sorts in order of time
+TIMESTAMP_FORMAT = r'%Y-%m-%d %H:%M:%S'
+
+## seconds to wait for another process that is setting up the DB at the same time
+SETUP_TIMEOUT = 60
+
+## named performance profiles, as the pragmas applied to each new connection
+# "balanced" lets readers and writers work at the same time (WAL), and trades a little durability on power loss for much faster commits
+# "compatible" keeps SQLite's defaults (rollback journal, full sync), as connections were opened before profiles existed
+PERFORMANCE_PROFILES = {
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000
+    },
+    'compatible': {}
+}
+
+## the profile used if none is given, which may be overridden by the environment
+PERFORMANCE_PROFILE_VARIABLE = environ.get("NPBC_PERFORMANCE_PROFILE")
+PERFORMANCE_PROFILE = PERFORMANCE_PROFILE_VARIABLE if PERFORMANCE_PROFILE_VARIABLE is not None else 'balanced'
+
 ## constant for names of weekdays
 WEEKDAY_NAMES = tuple(weekday_names_iterable)
 
+## columns of `papers` holding the cost of each paper on each day of the week (in the same order as WEEKDAY_NAMES)
+# the days each paper is delivered are stored alongside, as a bitmask in `delivery_mask` (bit n is the nth day of the week)
+COST_COLUMNS = tuple(f"cost_{day_id}" for day_id in range(len(WEEKDAY_NAMES)))
+
 # create tuple classes for return data
 Papers = namedtuple("Papers", ["paper_id", "name", "day_id", "delivered", "cost"])
+PaperColumns = namedtuple("PaperColumns", ["paper_ids", "names", "costs", "delivered"])
+Paper = namedtuple("Paper", ["paper_id", "name", "costs", "delivered"])
+PaperDefinition = namedtuple("PaperDefinition", ["name", "delivery_mask", "costs"])
+BulkReport = namedtuple("BulkReport", ["applied", "errors"])
+ImportReport = namedtuple("ImportReport", ["imported", "rejected"])
 UndeliveredStrings = namedtuple("UndeliveredStrings", ["string_id", "paper_id", "year", "month", "string"])
+UndeliveredStringToken = namedtuple("UndeliveredStringToken", ["kind", "operands"])
+RangeCosts = namedtuple("RangeCosts", ["paper_ids", "months", "costs", "totals", "undelivered_masks"])
+MonthContext = namedtuple("MonthContext", [
+    "month",
+    "year",
+    "number_of_days",
+    "first_weekday",
+    "number_of_each_weekday",
+    "weekday_masks",
+    "nth_weekday_days",
+    "all_mask",
+    "weekday_of_each_day",
+    "weekday_matrix"
+])
+
+## number of papers sent to each worker when calculating in parallel
+SHARD_SIZE = 10000
+
+## number of rows written to the DB in each batch when saving results
+SAVE_BATCH_SIZE = 5000
+
+## number of rows fetched from the DB at a time when reading logs
+LOG_FETCH_SIZE = 1000
+
+## largest number of variables SQLite is guaranteed to accept in one statement (older builds are limited to 999)
+SQLITE_MAX_VARIABLES = 999
+
+## what can be imported from files, and the extensions of the JSON Lines files they can be imported from (CSV files must end in .csv)
+IMPORT_KINDS = ('papers', 'strings')
+IMPORT_JSON_LINES_SUFFIXES = ('.jsonl', '.ndjson')
+
+## what can be exported to files, with the name and NumPy type of each column
+# "logs" has one row per log (with its cost and undelivered day bitmask), and "dates" has one row per undelivered date of a log
+# names are as long as the longest name, so their width is found when exporting
+EXPORT_COLUMNS = {
+    'logs': (('log_id', 'i8'), ('paper_id', 'i8'), ('month', 'i8'), ('year', 'i8'), ('timestamp', 'U32'), ('cost', 'f8'), ('undelivered_mask', 'i8')),
+    'dates': (('log_id', 'i8'), ('paper_id', 'i8'), ('date', 'U10')),
+    'papers': (('paper_id', 'i8'), ('name', 'U'), *((column, 'f8') for column in COST_COLUMNS), ('delivery_mask', 'i8'))
+}
+
+## the extensions of the files that can be exported to, and the size of the write buffer for text files
+EXPORT_SUFFIXES = ('.csv', *IMPORT_JSON_LINES_SUFFIXES, '.npy', '.npz')
+EXPORT_BUFFER_SIZE = 1024 * 1024
+
+## number of set bits in each possible byte, used to count bits across whole arrays
+BIT_COUNTS = numpy.array([bin(byte).count('1') for byte in range(256)], dtype=numpy.uint8)
+
+## number of (month, year) calendar contexts to keep in memory
+MONTH_CONTEXT_CACHE_SIZE = 128
 
+## number of parsed (undelivered string, month, year) combinations to keep in memory
+# this may be overridden by the environment, or at runtime using `configure_parse_cache`
+PARSE_CACHE_SIZE_VARIABLE = environ.get("NPBC_PARSE_CACHE_SIZE")
+PARSE_CACHE_SIZE = int(PARSE_CACHE_SIZE_VARIABLE) if PARSE_CACHE_SIZE_VARIABLE is not None else 4096
 
-def create_and_setup_DB() -> Path:
-    """ensure DB exists and it's set up with the schema"""
+
+@contextmanager
+def transaction(connection: Connection, name: str = "npbc") -> Generator[Connection, None, None]:
+    """run a block of statements as a single transaction
+    - uses a savepoint, so it works whether or not a transaction is already open
+    - if the block raises, every change made inside it is rolled back"""
+
+    connection.execute(f"SAVEPOINT {name};")
+
+    try:
+        yield connection
+
+    except BaseException:
+        connection.execute(f"ROLLBACK TO {name};")
+        connection.execute(f"RELEASE {name};")
+        raise
+
+    connection.execute(f"RELEASE {name};")
+
+
+def connect_to_DB(database_path: Path | str = DATABASE_PATH, profile: str | None = None, read_only: bool = False) -> Connection:
+    """open a connection to the DB, and apply a performance profile to it
+    - if no profile is given, the default (`PERFORMANCE_PROFILE`) is used
+    - read-only connections cannot change the journal mode, so that pragma is skipped for them (it is stored in the DB anyway)"""
+
+    profile = profile or PERFORMANCE_PROFILE
+
+    if profile not in PERFORMANCE_PROFILES:
+        raise npbc_exceptions.InvalidInput(f"Unknown performance profile \"{profile}\". Choose from: {', '.join(PERFORMANCE_PROFILES)}.")
+
+    if read_only:
+        connection = connect(f"{Path(database_path).resolve().as_uri()}?mode=ro", uri=True)
+
+    else:
+        connection = connect(database_path)
+
+    for pragma, value in PERFORMANCE_PROFILES[profile].items():
+        if not (read_only and pragma == 'journal_mode'):
+            connection.execute(f"PRAGMA {pragma} = {value};")
+
+    return connection
+
+
+def create_and_setup_DB(profile: str | None = None) -> Path:
+    """ensure DB exists and its schema is at the latest version
+    - if the DB is already up to date (every run after the first), this only reads its schema version
+    - otherwise, the DB is created or migrated, while other processes wait (see `npbc_migrations.migrate`)"""
+
+    if DATABASE_PATH.exists():
+        with connect_to_DB(DATABASE_PATH, profile) as connection:
+            version = npbc_migrations.get_schema_version(connection)
+
+        connection.close()
+
+        if version >= npbc_migrations.SCHEMA_VERSION:
+            return DATABASE_PATH
 
     DATABASE_DIR.mkdir(parents=True, exist_ok=True)
-    DATABASE_PATH.touch(exist_ok=True)
 
-    with connect(DATABASE_PATH) as connection:
-        connection.executescript(SCHEMA_PATH.read_text())
+    with connect_to_DB(DATABASE_PATH, profile) as connection:
+        connection.execute(f"PRAGMA busy_timeout = {SETUP_TIMEOUT * 1000};")
+        npbc_migrations.migrate(connection, SCHEMA_PATH.read_text())
 
     connection.close()
 
     return DATABASE_PATH
 
 
+@lru_cache(maxsize=MONTH_CONTEXT_CACHE_SIZE)
+def get_month_context(month: int, year: int) -> MonthContext:
+    """compute everything the parsing and calculation need to know about the calendar of a given month
+    - this is computed once per (month, year) and cached, so repeated use is a table lookup
+    - the per-weekday values will be in the same order as WEEKDAY_NAMES (so the first day should be Monday)
+    - fields:
+      - number_of_days: number of days in the month
+      - first_weekday: weekday of the first day of the month
+      - number_of_each_weekday: number of times each weekday occurs in the month
+      - weekday_masks: day bitmask for each weekday (bit n is set if day n + 1 of the month is that weekday)
+      - nth_weekday_days: for each weekday, the days of the month (in order) which are that weekday
+      - all_mask: day bitmask with every day of the month set
+      - weekday_of_each_day: array with the weekday of each day of the month (index 0 is the first day)
+      - weekday_matrix: one-hot matrix of shape (days in month, weekdays) mapping each day to its weekday"""
+
+    first_weekday, number_of_days = monthrange(year, month)
+    number_of_weekdays = len(WEEKDAY_NAMES)
+
+    nth_weekday_days = tuple(
+        tuple(range(1 + (weekday - first_weekday) % number_of_weekdays, number_of_days + 1, number_of_weekdays))
+        for weekday in range(number_of_weekdays)
+    )
+
+    weekday_masks = tuple(
+        sum(1 << (day - 1) for day in days)
+        for days in nth_weekday_days
+    )
+
+    weekday_of_each_day = ((numpy.arange(number_of_days) + first_weekday) % number_of_weekdays).astype(numpy.int8)
+    weekday_matrix = (weekday_of_each_day[:, numpy.newaxis] == numpy.arange(number_of_weekdays)).astype(numpy.int64)
+
+    # the context is shared between callers, so the arrays must not be modified
+    weekday_of_each_day.setflags(write=False)
+    weekday_matrix.setflags(write=False)
+
+    return MonthContext(
+        month=month,
+        year=year,
+        number_of_days=number_of_days,
+        first_weekday=first_weekday,
+        number_of_each_weekday=tuple(map(len, nth_weekday_days)),
+        weekday_masks=weekday_masks,
+        nth_weekday_days=nth_weekday_days,
+        all_mask=(1 << number_of_days) - 1,
+        weekday_of_each_day=weekday_of_each_day,
+        weekday_matrix=weekday_matrix
+    )
+
+
 def get_number_of_each_weekday(month: int, year: int) -> Generator[int, None, None]:
     """generate a list of number of times each weekday occurs in a given month (return a generator)
     - the list will be in the same order as WEEKDAY_NAMES (so the first day should be Monday)"""
 
-    # get the calendar for the month
-    main_calendar = monthcalendar(year, month)
+    yield from get_month_context(month, year).number_of_each_weekday
 
-    # get the number of weeks in that month from the calendar
-    number_of_weeks = len(main_calendar)
 
-    # iterate over each possible weekday
-    for weekday_index in range(len(WEEKDAY_NAMES)):
+def tokenize_undelivered_string(string: str) -> UndeliveredStringToken:
+    """classify an undelivered string and capture its operands, with a single regex match
+    - the kind is the name of the pattern that matched: number, range, weekday, nth_weekday or all
+    - the operands are integers (days of the month, or indices of WEEKDAY_NAMES), in the order they appear in the string"""
 
-        # assume that the weekday occurs once per week in the month
-        number_of_weekday: int = number_of_weeks
+    match = npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match(string)
 
-        # if the first week doesn't have the weekday, decrement its count
-        if main_calendar[0][weekday_index] == 0:
-            number_of_weekday -= 1
-        
-        # if the last week doesn't have the weekday, decrement its count
-        if main_calendar[-1][weekday_index] == 0:
-            number_of_weekday -= 1
+    if not match:
+        raise npbc_exceptions.InvalidUndeliveredString(f'{string} is not a valid undelivered string.')
+
+    kind = match.lastgroup
+
+    if kind == 'number':
+        operands = (int(match['day']),)
 
-        yield number_of_weekday
+    elif kind == 'range':
+        operands = (int(match['start']), int(match['end']))
 
+    elif kind == 'weekday':
+        operands = (WEEKDAY_NAMES.index(match['weekday_name'].capitalize()),)
 
-def validate_undelivered_string(*strings: str) -> None:
+    elif kind == 'nth_weekday':
+        operands = (int(match['n']), WEEKDAY_NAMES.index(match['nth_weekday_name'].capitalize()))
+
+    else:
+        operands = ()
+
+    return UndeliveredStringToken(kind, operands)
+
+
+def validate_undelivered_string(*strings: str) -> tuple[UndeliveredStringToken, ...]:
     """validate a string that specifies when a given paper was not delivered
-    - first check to see that it meets the comma-separated requirements
-    - then check against each of the other acceptable patterns in the regex dictionary"""
+    - each non-empty string must match one of the acceptable patterns
+    - the tokens of the strings are returned, so that they can be parsed without matching them again"""
 
     # check that the string matches one of the acceptable patterns
-    for string in strings:
-        if string and not any (
-            pattern.match(string) for pattern in (
-                npbc_regex.NUMBER_MATCH_REGEX,
-                npbc_regex.RANGE_MATCH_REGEX,
-                npbc_regex.DAYS_MATCH_REGEX,
-                npbc_regex.N_DAY_MATCH_REGEX,
-                npbc_regex.ALL_MATCH_REGEX
-            )
-        ):
+    return tuple(
+        tokenize_undelivered_string(string)
+        for string in strings
+        if string
+    )
 
-            raise npbc_exceptions.InvalidUndeliveredString(f'{string} is not a valid undelivered string.')
 
-    # if we get here, all strings passed the regex check
-    return
+def get_weekday_masks(month: int, year: int) -> tuple[int, ...]:
+    """get a day bitmask for each weekday in a given month
+    - bit n of a mask is set if day n + 1 of the month is that weekday
+    - the masks will be in the same order as WEEKDAY_NAMES"""
+
+    return get_month_context(month, year).weekday_masks
+
+
+def get_mask_from_dates(dates: set[date]) -> int:
+    """convert a set of dates (all in the same month) to a day bitmask"""
+
+    mask = 0
+
+    for day in dates:
+        mask |= 1 << (day.day - 1)
+
+    return mask
+
+
+def get_dates_from_mask(month: int, year: int, mask: int) -> set[date]:
+    """convert a day bitmask for a given month to a set of dates"""
+
+    return set(
+        date(year, month, day_index + 1)
+        for day_index in range(mask.bit_length())
+        if mask >> day_index & 1
+    )
+
+
+def get_date_strings_from_mask(month: int, year: int, mask: int) -> list[str]:
+    """convert a day bitmask for a given month to a list of dates formatted as YYYY-MM-DD (the format they are logged in)
+    - this skips creating date objects, which is much faster when logging many papers"""
+
+    prefix = f"{year:04d}-{month:02d}-"
+
+    return [
+        f"{prefix}{day_index + 1:02d}"
+        for day_index in range(mask.bit_length())
+        if mask >> day_index & 1
+    ]
 
-def extract_number(string: str, month: int, year: int) -> date:
-    """if the date is simply a number, it's a single day. so we just identify that date"""
 
-    day = int(string)
+def extract_number(day: int, month: int, year: int) -> int:
+    """if the date is simply a number, it's a single day. so we just identify that date (as a day bitmask)"""
 
     # if the date is valid for the given month
-    if 0 < day <= monthrange(year, month)[1]:
-        return date(year, month, day)
+    if 0 < day <= get_month_context(month, year).number_of_days:
+        return 1 << (day - 1)
 
     # if we reach here, the check failed and it's not a valid date
-    raise npbc_exceptions.InvalidUndeliveredString(f'{string} is not a valid date for {datetime(year=year, month=month, day=1):%B %Y}.')
+    raise npbc_exceptions.InvalidUndeliveredString(f'{day} is not a valid date for {datetime(year=year, month=month, day=1):%B %Y}.')
 
 
-def extract_range(string: str, month: int, year: int) -> Generator[date, None, None]:
-    """if the date is a range of numbers, it's a range of days. we identify all the dates in that range, bounds inclusive"""
-
-    start, end = map(int, npbc_regex.HYPHEN_SPLIT_REGEX.split(string))
+def extract_range(start: int, end: int, month: int, year: int) -> int:
+    """if the date is a range of numbers, it's a range of days. we identify all the dates in that range, bounds inclusive (as a day bitmask)"""
 
     # if the range is valid for the given month
-    if 0 < start <= end <= monthrange(year, month)[1]:
-        for day in range(start, end + 1):
-            yield date(year, month, day)
+    if 0 < start <= end <= get_month_context(month, year).number_of_days:
+        return ((1 << (end - start + 1)) - 1) << (start - 1)
 
-    else:
-        # if we reach here, the check failed and the month doesn't have that many days
-        raise npbc_exceptions.InvalidUndeliveredString(f'{datetime(year=year, month=month, day=1):%B %Y} does not have days between {start} and {end}.')
+    # if we reach here, the check failed and the month doesn't have that many days
+    raise npbc_exceptions.InvalidUndeliveredString(f'{datetime(year=year, month=month, day=1):%B %Y} does not have days between {start} and {end}.')
 
 
-def extract_weekday(string: str, month: int, year: int) -> Generator[date, None, None]:
-    """if the date is the plural of a weekday name, we identify all dates in that month which are the given weekday"""
+def extract_weekday(weekday: int, month: int, year: int) -> int:
+    """if the date is the plural of a weekday name, we identify all dates in that month which are the given weekday (as a day bitmask)"""
 
-    weekday = WEEKDAY_NAMES.index(string.capitalize().rstrip('s'))
+    return get_month_context(month, year).weekday_masks[weekday]
 
-    for day in range(1, monthrange(year, month)[1] + 1):
-        if date(year, month, day).weekday() == weekday:
-            yield date(year, month, day)
 
+def extract_nth_weekday(n: int, weekday: int, month: int, year: int) -> int:
+    """if the date is a number and a weekday name (singular), we identify the date that is the nth occurrence of the given weekday in the month (as a day bitmask)"""
 
-def extract_nth_weekday(string: str, month: int, year: int) -> date:
-    """if the date is a number and a weekday name (singular), we identify the date that is the nth occurrence of the given weekday in the month"""
+    # all the days in the month which are the given weekday
+    days = get_month_context(month, year).nth_weekday_days[weekday]
 
-    n, weekday_name = npbc_regex.HYPHEN_SPLIT_REGEX.split(string)
+    # if the day is valid for the given month, look up the nth occurrence of the given weekday
+    if 0 < n <= len(days):
+        return 1 << (days[n - 1] - 1)
 
-    n = int(n)
+    # if we reach here, the check failed and the weekday does not occur n times in the month
+    raise npbc_exceptions.InvalidUndeliveredString(f'{datetime(year=year, month=month, day=1):%B %Y} does not have {n} {WEEKDAY_NAMES[weekday]}s.')
 
-    # if the day is valid for the given month
-    if 0 < n <= list(get_number_of_each_weekday(month, year))[WEEKDAY_NAMES.index(weekday_name.capitalize())]:
-        
-        # record the "day_id" corresponding to the given weekday name
-        weekday = WEEKDAY_NAMES.index(weekday_name.capitalize())
-
-        # store all dates when the given weekday occurs in the given month
-        valid_dates = [
-            date(year, month, day)
-            for day in range(1, monthrange(year, month)[1] + 1)
-            if date(year, month, day).weekday() == weekday
-        ]
 
-        # return the date that is the nth occurrence of the given weekday in the month
-        return valid_dates[n - 1]
+def extract_all(month: int, year: int) -> int:
+    """if the text is "all", we identify all the dates in the month (as a day bitmask)"""
 
-    # if we reach here, the check failed and the weekday does not occur n times in the month
-    raise npbc_exceptions.InvalidUndeliveredString(f'{datetime(year=year, month=month, day=1):%B %Y} does not have {n} {weekday_name}s.')
+    return get_month_context(month, year).all_mask
 
-def extract_all(month: int, year: int) -> Generator[date, None, None]:
-    """if the text is "all", we identify all the dates in the month"""
 
-    for day in range(1, monthrange(year, month)[1] + 1):
-        yield date(year, month, day)
+## map each kind of token to the function that extracts its dates
+EXTRACTORS = {
+    'number': extract_number,
+    'range': extract_range,
+    'weekday': extract_weekday,
+    'nth_weekday': extract_nth_weekday,
+    'all': extract_all
+}
 
 
-def parse_undelivered_string(month: int, year: int, string: str) -> set[date]:
+def parse_undelivered_string_to_mask(month: int, year: int, string: str | UndeliveredStringToken) -> int:
+    """parse a section of the strings into a day bitmask
+    - each section is a string that specifies a set of dates
+    - a token returned by `tokenize_undelivered_string` (or `validate_undelivered_string`) may be given instead, to avoid matching the string again
+    - bit n of the returned mask is set if day n + 1 of the month is mentioned in the string"""
+
+    token = string if isinstance(string, UndeliveredStringToken) else tokenize_undelivered_string(string)
+
+    return EXTRACTORS[token.kind](*token.operands, month, year)
+
+
+def parse_undelivered_string(month: int, year: int, string: str | UndeliveredStringToken) -> set[date]:
     """parse a section of the strings
     - each section is a string that specifies a set of dates
     - this function will return a set of dates that uniquely identifies each date mentioned across the string"""
 
-    # initialize the set of dates
-    dates = set()
+    return get_dates_from_mask(month, year, parse_undelivered_string_to_mask(month, year, string))
 
-    # check for each of the patterns
-    if npbc_regex.NUMBER_MATCH_REGEX.match(string):
-        number_date = extract_number(string, month, year)
 
-        if number_date:
-            dates.add(number_date)
+def normalize_undelivered_string(string: str) -> str:
+    """normalize an undelivered string, so that different spellings of the same string share a parse cache entry
+    - spaces around hyphens are removed
+    - "all" is lowercased (it is the only pattern that is case-insensitive)"""
 
-    elif npbc_regex.RANGE_MATCH_REGEX.match(string):
-        dates.update(extract_range(string, month, year))
+    string = '-'.join(npbc_regex.HYPHEN_SPLIT_REGEX.split(string))
 
-    elif npbc_regex.DAYS_MATCH_REGEX.match(string):
-        dates.update(extract_weekday(string, month, year))
+    return 'all' if npbc_regex.ALL_MATCH_REGEX.match(string) else string
 
-    elif npbc_regex.N_DAY_MATCH_REGEX.match(string):
-        n_day_date = extract_nth_weekday(string, month, year)
 
-        if n_day_date:
-            dates.add(n_day_date)
+def configure_parse_cache(maxsize: int | None = PARSE_CACHE_SIZE) -> None:
+    """(re)create the parse cache for undelivered strings, with a given maximum size
+    - least recently used entries are evicted once the cache is full
+    - a size of None means the cache is unbounded, and 0 disables caching
+    - any existing entries and hit/miss counters are discarded"""
 
-    elif npbc_regex.ALL_MATCH_REGEX.match(string):
-        dates.update(extract_all(month, year))
+    global cached_parse_undelivered_string_to_mask
 
-    else:
-        raise npbc_exceptions.InvalidUndeliveredString(f'{string} is not a valid undelivered string.')
+    cached_parse_undelivered_string_to_mask = lru_cache(maxsize=maxsize)(
+        lambda string, month, year: parse_undelivered_string_to_mask(month, year, string)
+    )
 
-    return dates
 
-    
-def parse_undelivered_strings(month: int, year: int, *strings: str) -> set[date]:
-    """parse a string that specifies when a given paper was not delivered
+def clear_parse_cache() -> None:
+    """remove every entry from the parse cache for undelivered strings, and reset its hit/miss counters"""
+
+    cached_parse_undelivered_string_to_mask.cache_clear()
+
+
+def get_parse_cache_info() -> tuple[int, int, int | None, int]:
+    """get the hits, misses, maximum size and current size of the parse cache for undelivered strings"""
+
+    return cached_parse_undelivered_string_to_mask.cache_info()
+
+
+configure_parse_cache()
+
+
+def get_undelivered_string_mask(month: int, year: int, string: str) -> int:
+    """parse a section of the strings into a day bitmask, using the parse cache
+    - the cache is keyed on the normalized string, the month and the year
+    - invalid strings are not cached, and raise every time"""
+
+    return cached_parse_undelivered_string_to_mask(normalize_undelivered_string(string), month, year)
+
+
+def compile_undelivered_strings(month: int, year: int, *strings: str) -> list[int]:
+    """compile each undelivered string into its day bitmask for a given month, to be stored alongside it
+    - a string's meaning for a fixed month and year never changes, so it only needs to be parsed once
+    - unlike calculating, a string that is not valid for the month raises an error instead of being reported and ignored
+    - empty strings compile to an empty mask"""
+
+    return [
+        get_undelivered_string_mask(month, year, string) if string else 0
+        for string in strings
+    ]
+
+
+def parse_undelivered_strings_to_mask(month: int, year: int, *strings: str | UndeliveredStringToken) -> int:
+    """parse a string that specifies when a given paper was not delivered into a day bitmask
     - each section states some set of dates
-    - this function will return a set of dates that uniquely identifies each date mentioned across all the strings"""
-    
-    # initialize the set of dates
-    dates = set()
+    - the masks of all the sections are combined with a bitwise OR, so each date is counted once
+    - sections given as strings are looked up in the parse cache"""
+
+    # initialize the mask
+    mask = 0
 
     # check for each of the patterns
     for string in strings:
         if string:
             try:
-                dates.update(parse_undelivered_string(month, year, string))
+                mask |= parse_undelivered_string_to_mask(month, year, string) if isinstance(string, UndeliveredStringToken) else get_undelivered_string_mask(month, year, string)
 
             except npbc_exceptions.InvalidUndeliveredString as e:
-                print(
-                    f"""Congratulations! You broke the program!
-                    You managed to write a string that the program considers valid, but isn't actually.
-                    Please report it to the developer.
-                    \nThe string you wrote was: {string}
-                    This data has not been counted.\n
-                    Exact error message: {e}"""
-                )
+                report_invalid_undelivered_string(string, e)
+
+    return mask
+
+
+def parse_undelivered_strings_of_papers(month: int, year: int, undelivered_strings: dict[int | None, list[str | int]]) -> dict[int | None, int]:
+    """parse the strings of many papers at once, into a day bitmask for each paper
+    - strings that have already been compiled (see `compile_undelivered_strings`) may be given as their masks, which are used as they are
+    - each distinct string is parsed once and its mask is shared among all the papers that use it
+    - strings for every paper are given (and their mask is returned) under None"""
+
+    # parse each distinct string once
+    unique_masks: dict[str, int] = {}
+
+    for string in set(string for strings in undelivered_strings.values() for string in strings if isinstance(string, str) and string):
+        try:
+            unique_masks[string] = get_undelivered_string_mask(month, year, string)
+
+        except npbc_exceptions.InvalidUndeliveredString as e:
+            report_invalid_undelivered_string(string, e)
+            unique_masks[string] = 0
+
+    # combine the masks of each paper's strings
+    masks: dict[int | None, int] = {}
+
+    for paper_id, strings in undelivered_strings.items():
+        mask = 0
+
+        for string in strings:
+            if isinstance(string, int):
+                mask |= string
+
+            elif string:
+                mask |= unique_masks[string]
+
+        masks[paper_id] = mask
+
+    return masks
+
+
+def report_invalid_undelivered_string(string: str | UndeliveredStringToken, error: npbc_exceptions.InvalidUndeliveredString) -> None:
+    """tell the user about a string that passed validation, but could not be parsed for the given month"""
+
+    print(
+        f"""Congratulations! You broke the program!
+        You managed to write a string that the program considers valid, but isn't actually.
+        Please report it to the developer.
+        \nThe string you wrote was: {string}
+        This data has not been counted.\n
+        Exact error message: {error}"""
+    )
+
 
-    return dates
+def parse_undelivered_strings(month: int, year: int, *strings: str | UndeliveredStringToken) -> set[date]:
+    """parse a string that specifies when a given paper was not delivered
+    - each section states some set of dates
+    - this function will return a set of dates that uniquely identifies each date mentioned across all the strings"""
+
+    return get_dates_from_mask(month, year, parse_undelivered_strings_to_mask(month, year, *strings))
 
 
 def get_cost_and_delivery_data(paper_id: int, connection: Connection) -> tuple[numpy.typing.NDArray[numpy.floating], numpy.typing.NDArray[numpy.int8]]:
     """get the cost and delivery data for a given paper from the DB"""
-    
-    delivered_query = """
-        SELECT delivered FROM cost_and_delivery_data
-        WHERE paper_id = ?
-        ORDER BY day_id;
-    """
 
-    cost_query = """
-        SELECT cost FROM cost_and_delivery_data
-        WHERE paper_id = ?
-        ORDER BY day_id;
+    _, cost_matrix, delivery_matrix = build_cost_and_delivery_matrices(connection.execute(
+        f"SELECT paper_id, {', '.join(COST_COLUMNS)}, delivery_mask FROM papers WHERE paper_id = ?;",
+        (paper_id,)
+    ).fetchall())
+
+    # a paper that does not exist has no data
+    if not len(cost_matrix):
+        return numpy.zeros(0, dtype=numpy.float64), numpy.zeros(0, dtype=numpy.int8)
+
+    return cost_matrix[0], delivery_matrix[0]
+
+
+def get_cost_and_delivery_matrices(
+    connection: Connection,
+    first_paper_id: int | None = None,
+    last_paper_id: int | None = None
+) -> tuple[
+    numpy.typing.NDArray[numpy.int64],
+    numpy.typing.NDArray[numpy.float64],
+    numpy.typing.NDArray[numpy.int8]
+]:
+    """get the cost and delivery data for all papers from the DB, in one query
+    - optionally, only get papers with IDs between the first and last paper IDs (bounds inclusive)
+    - returns the paper IDs, and (N, 7) matrices of costs and delivery data
+    - row i of each matrix belongs to the paper at index i of the paper IDs
+    - columns are in the same order as WEEKDAY_NAMES"""
+
+    query = f"""
+        SELECT paper_id, {', '.join(COST_COLUMNS)}, delivery_mask
+        FROM papers
+        WHERE paper_id BETWEEN ? AND ?
+        ORDER BY paper_id;
     """
-    
-    delivery_data = numpy.array(connection.execute(delivered_query, (paper_id,)).fetchall())
-    cost_data = numpy.array(connection.execute(cost_query, (paper_id,)).fetchall())
 
-    return cost_data.reshape(len(cost_data)), delivery_data.reshape(len(delivery_data))
+    bounds = (
+        first_paper_id if first_paper_id is not None else -(1 << 63),
+        last_paper_id if last_paper_id is not None else (1 << 63) - 1
+    )
+
+    return build_cost_and_delivery_matrices(connection.execute(query, bounds).fetchall())
+
+
+def build_cost_and_delivery_matrices(raw_data: list[tuple[int | float, ...]]) -> tuple[
+    numpy.typing.NDArray[numpy.int64],
+    numpy.typing.NDArray[numpy.float64],
+    numpy.typing.NDArray[numpy.int8]
+]:
+    """build the matrices of cost and delivery data from rows of (paper_id, cost_0, ..., cost_6, delivery_mask)
+    - the delivery bitmask of each paper is unpacked into a row of 0s and 1s"""
+
+    number_of_weekdays = len(WEEKDAY_NAMES)
+
+    # without any papers, return empty matrices of the right shape
+    if not raw_data:
+        return (
+            numpy.zeros(0, dtype=numpy.int64),
+            numpy.zeros((0, number_of_weekdays), dtype=numpy.float64),
+            numpy.zeros((0, number_of_weekdays), dtype=numpy.int8)
+        )
+
+    paper_ids, *costs, delivery_masks = zip(*raw_data)
+    delivery_masks = numpy.array(delivery_masks, dtype=numpy.int64)
+
+    return (
+        numpy.array(paper_ids, dtype=numpy.int64),
+        numpy.array(costs, dtype=numpy.float64).T.copy(),
+        ((delivery_masks[:, numpy.newaxis] >> numpy.arange(number_of_weekdays)) & 1).astype(numpy.int8)
+    )
 
 
 def calculate_cost_of_one_paper(
         number_of_each_weekday: list[int],
-        undelivered_dates: set[date],
+        undelivered_dates: set[date] | int,
         cost_data: numpy.typing.NDArray[numpy.floating],
-        delivery_data: numpy.typing.NDArray[numpy.int8]
+        delivery_data: numpy.typing.NDArray[numpy.int8],
+        month: int | None = None,
+        year: int | None = None
     ) -> float:
     """calculate the cost of one paper for the full month
-    - any dates when it was not delivered will be removed"""
-    
-    # initialize counters corresponding to each weekday when the paper was not delivered
-    number_of_days_per_weekday_not_received = numpy.zeros(len(number_of_each_weekday), dtype=numpy.int8)
-    
-    # for each date that the paper was not delivered, we increment the counter for the corresponding weekday
-    for day in undelivered_dates:
-        number_of_days_per_weekday_not_received[day.weekday()] += 1
+    - any dates when it was not delivered will be removed
+    - the undelivered dates may be a set of dates, or a day bitmask (in which case the month and year must be given)"""
+
+    # if the dates are a bitmask, count the undelivered days of each weekday against the weekday masks
+    if isinstance(undelivered_dates, int):
+        if month is None or year is None:
+            raise ValueError("Month and year are required to calculate the cost from a day bitmask.")
+
+        number_of_days_per_weekday_not_received = numpy.array([
+            (undelivered_dates & weekday_mask).bit_count()
+            for weekday_mask in get_month_context(month, year).weekday_masks
+        ], dtype=numpy.int8)
+
+    else:
+
+        # initialize counters corresponding to each weekday when the paper was not delivered
+        number_of_days_per_weekday_not_received = numpy.zeros(len(number_of_each_weekday), dtype=numpy.int8)
+        
+        # for each date that the paper was not delivered, we increment the counter for the corresponding weekday
+        for day in undelivered_dates:
+            number_of_days_per_weekday_not_received[day.weekday()] += 1
 
     return float(numpy.sum(
         delivery_data * cost_data * (number_of_each_weekday - number_of_days_per_weekday_not_received)
     ))
 
 
-def calculate_cost_of_all_papers(connection: Connection, undelivered_strings: dict[int, list[str]], month: int, year: int) -> tuple[
+def get_weekday_of_each_day(month: int, year: int) -> numpy.typing.NDArray[numpy.int8]:
+    """get the weekday (as an index of WEEKDAY_NAMES) of each day in a given month
+    - index 0 of the returned array is the first day of the month
+    - the array is shared with the cached month context, so it is read-only"""
+
+    return get_month_context(month, year).weekday_of_each_day
+
+
+def get_undelivered_matrix(
+    paper_ids: numpy.typing.NDArray[numpy.int64],
+    undelivered_dates: dict[int, set[date] | int],
+    month: int,
+    year: int,
+    shared_mask: int = 0
+) -> numpy.typing.NDArray[numpy.bool_]:
+    """build a boolean matrix of shape (papers, days in month) marking days when a paper was not delivered
+    - the dates for each paper may be given as a set of dates or as a day bitmask
+    - the shared mask marks days when no paper was delivered, and is broadcast to every row
+    - row i belongs to the paper at index i of the paper IDs
+    - column j is day j + 1 of the month"""
+
+    # map each paper ID to its row in the matrix
+    rows = {
+        paper_id: index
+        for index, paper_id in enumerate(paper_ids.tolist())
+    }
+
+    masks = numpy.full(len(paper_ids), shared_mask, dtype=numpy.int64)
+
+    # papers that are not in the matrix (such as deleted papers) are ignored
+    for paper_id, dates in undelivered_dates.items():
+        if paper_id in rows:
+            masks[rows[paper_id]] |= dates if isinstance(dates, int) else get_mask_from_dates(dates)
+
+    # unpack the bits of each mask into the columns of the matrix
+    return ((masks[:, numpy.newaxis] >> numpy.arange(get_month_context(month, year).number_of_days)) & 1).astype(numpy.bool_)
+
+
+def calculate_cost_of_each_paper(
+    month: int,
+    year: int,
+    undelivered_matrix: numpy.typing.NDArray[numpy.bool_],
+    cost_matrix: numpy.typing.NDArray[numpy.floating],
+    delivery_matrix: numpy.typing.NDArray[numpy.int8]
+) -> tuple[numpy.typing.NDArray[numpy.float64], float]:
+    """calculate the cost of every paper for the full month at once
+    - the undelivered matrix masks out days when each paper was not delivered
+    - the delivered days of each paper are counted per weekday and multiplied against that weekday's cost
+    - returns the cost of each paper (in the same order as the rows of the matrices) and the total cost"""
+
+    # number of days per weekday when each paper was received, using the one-hot matrix mapping each day to its weekday
+    number_of_days_per_weekday_received = (~undelivered_matrix).astype(numpy.int64) @ get_month_context(month, year).weekday_matrix
+
+    costs = numpy.sum(delivery_matrix * cost_matrix * number_of_days_per_weekday_received, axis=1)
+
+    # sum in order, so that the total matches adding up the costs of each paper one by one
+    total = sum(costs.tolist())
+
+    return costs, total
+
+
+def calculate_cost_of_shard(
+    connection: Connection,
+    undelivered_strings: dict[int | None, list[str | int]],
+    month: int,
+    year: int,
+    first_paper_id: int | None = None,
+    last_paper_id: int | None = None
+) -> tuple[dict[int, float], dict[int, int]]:
+    """calculate the cost of a shard of papers (those with IDs between the first and last paper IDs, bounds inclusive) for the full month
+    - if no bounds are given, the shard contains every paper
+    - the undelivered strings must only belong to papers in the shard
+    - return the cost of each paper, and the days each paper was not delivered (as day bitmasks)"""
+
+    # get the data about cost and delivery for every paper in the shard at once
+    paper_ids, cost_matrix, delivery_matrix = get_cost_and_delivery_matrices(connection, first_paper_id, last_paper_id)
+
+    return calculate_cost_of_papers(paper_ids, cost_matrix, delivery_matrix, undelivered_strings, month, year)
+
+
+def calculate_cost_of_papers(
+    paper_ids: numpy.typing.NDArray[numpy.int64],
+    cost_matrix: numpy.typing.NDArray[numpy.float64],
+    delivery_matrix: numpy.typing.NDArray[numpy.int8],
+    undelivered_strings: dict[int | None, list[str | int]],
+    month: int,
+    year: int
+) -> tuple[dict[int, float], dict[int, int]]:
+    """calculate the cost of the given papers for the full month, from their cost and delivery matrices
+    - strings for every paper (under None) are parsed once, and their mask is shared by every paper
+    - return the cost of each paper, and the days each paper was not delivered (as day bitmasks)"""
+
+    # calculate the days when each paper was not delivered, as day bitmasks
+    undelivered_masks = parse_undelivered_strings_of_papers(month, year, undelivered_strings)
+    shared_mask = undelivered_masks.pop(None, 0)
+
+    # calculate the cost of each paper
+    cost_array, _ = calculate_cost_of_each_paper(
+        month,
+        year,
+        get_undelivered_matrix(paper_ids, undelivered_masks, month, year, shared_mask),
+        cost_matrix,
+        delivery_matrix
+    )
+
+    return (
+        dict(zip(paper_ids.tolist(), cost_array.tolist())),
+        {
+            paper_id: undelivered_masks.get(paper_id, 0) | shared_mask
+            for paper_id in paper_ids.tolist()
+        }
+    )
+
+
+def calculate_cost_of_shard_in_worker(
+    database_path: str,
+    undelivered_strings: dict[int | None, list[str | int]],
+    month: int,
+    year: int,
+    first_paper_id: int,
+    last_paper_id: int,
+    profile: str | None = None
+) -> tuple[dict[int, float], dict[int, int]]:
+    """calculate the cost of a shard of papers, in a worker process
+    - the worker opens its own read-only connection to the DB, with the given performance profile (or the default one)"""
+
+    connection = connect_to_DB(database_path, profile, read_only=True)
+
+    try:
+        return calculate_cost_of_shard(connection, undelivered_strings, month, year, first_paper_id, last_paper_id)
+
+    finally:
+        connection.close()
+
+
+def calculate_cost_and_masks_of_all_papers(
+    connection: Connection,
+    undelivered_strings: dict[int | None, list[str | int]],
+    month: int,
+    year: int,
+    workers: int | None = None,
+    shard_size: int = SHARD_SIZE,
+    profile: str | None = None
+) -> tuple[
     dict[int, float],
     float,
-    dict[int, set[date]]
+    dict[int, int]
 ]:
     """calculate the cost of all papers for the full month
-    - return data about the cost of each paper, the total cost, and dates when each paper was not delivered"""
+    - return data about the cost of each paper, the total cost, and days when each paper was not delivered (as day bitmasks)
+    - if more than one worker is requested, papers are split into shards of (at most) the given size, and each shard is calculated in a separate process
+    - workers read the DB through their own connections (with the given performance profile), so they only see changes that have been committed"""
 
-    NUMBER_OF_EACH_WEEKDAY = list(get_number_of_each_weekday(month, year))
-    cost_and_delivery_data = {}
+    if workers is not None and workers > 1:
+        costs, undelivered_masks = calculate_cost_of_all_papers_in_parallel(connection, undelivered_strings, month, year, workers, shard_size, profile)
 
-    # get the IDs of papers that exist
-    papers = connection.execute("SELECT paper_id FROM papers;").fetchall()
+    else:
+        costs, undelivered_masks = calculate_cost_of_shard(connection, undelivered_strings, month, year)
 
-    # get the data about cost and delivery for each paper
-    cost_and_delivery_data = [
-        get_cost_and_delivery_data(paper_id, connection)
-        for paper_id, in papers # type: ignore
-    ]
+    # calculate the total cost of all papers
+    total = sum(costs.values())
+
+    return costs, total, undelivered_masks
+
+
+def calculate_cost_of_all_papers(
+    connection: Connection,
+    undelivered_strings: dict[int | None, list[str | int]],
+    month: int,
+    year: int,
+    workers: int | None = None,
+    shard_size: int = SHARD_SIZE,
+    profile: str | None = None
+) -> tuple[
+    dict[int, float],
+    float,
+    dict[int, set[date]]
+]:
+    """calculate the cost of all papers for the full month
+    - return data about the cost of each paper, the total cost, and dates when each paper was not delivered
+    - see `calculate_cost_and_masks_of_all_papers` for calculating in parallel"""
 
+    costs, total, undelivered_masks = calculate_cost_and_masks_of_all_papers(connection, undelivered_strings, month, year, workers, shard_size, profile)
 
-    # initialize a "blank" dictionary that will eventually contain any dates when a paper was not delivered
+    # expand the masks to dates for each paper
     undelivered_dates: dict[int, set[date]] = {
-        int(paper_id): set()
-        for paper_id, in papers # type: ignore
+        paper_id: get_dates_from_mask(month, year, mask)
+        for paper_id, mask in undelivered_masks.items()
     }
 
-    # calculate the undelivered dates for each paper
+    return costs, total, undelivered_dates
+
+
+def calculate_cost_of_all_papers_in_parallel(
+    connection: Connection,
+    undelivered_strings: dict[int | None, list[str | int]],
+    month: int,
+    year: int,
+    workers: int,
+    shard_size: int = SHARD_SIZE,
+    profile: str | None = None
+) -> tuple[dict[int, float], dict[int, int]]:
+    """calculate the cost of all papers for the full month, using a pool of worker processes
+    - papers are split (in order of their IDs) into shards of (at most) the given size
+    - the results of each shard are merged in order, so they are identical to calculating every paper at once
+    - return the cost of each paper, and the days each paper was not delivered (as day bitmasks)"""
+
+    if shard_size < 1:
+        raise ValueError("Shard size must be at least 1.")
+
+    # the workers need a file to connect to
+    database_path = connection.execute("PRAGMA database_list;").fetchone()[2]
+
+    if not database_path:
+        raise ValueError("Papers can only be calculated in parallel for a DB stored in a file.")
+
+    paper_ids = [
+        paper_id
+        for paper_id, in connection.execute("SELECT paper_id FROM papers ORDER BY paper_id;")
+    ]
+
+    # identify each shard by its first and last paper IDs
+    bounds = [
+        (paper_ids[start], paper_ids[min(start + shard_size, len(paper_ids)) - 1])
+        for start in range(0, len(paper_ids), shard_size)
+    ]
+
+    # send the undelivered strings of each paper to the shard containing it, and strings for every paper to every shard
+    shard_strings: list[dict[int | None, list[str | int]]] = [{} for _ in bounds]
+    first_paper_ids = [first_paper_id for first_paper_id, _ in bounds]
+
     for paper_id, strings in undelivered_strings.items():
-        undelivered_dates[paper_id].update(
-            parse_undelivered_strings(month, year, *strings)
+        if paper_id is None:
+            for strings_of_shard in shard_strings:
+                strings_of_shard[None] = strings
+
+        else:
+            shard_strings[max(bisect_right(first_paper_ids, paper_id) - 1, 0)][paper_id] = strings
+
+    costs: dict[int, float] = {}
+    undelivered_masks: dict[int, int] = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            calculate_cost_of_shard_in_worker,
+            [database_path] * len(bounds),
+            shard_strings,
+            [month] * len(bounds),
+            [year] * len(bounds),
+            first_paper_ids,
+            [last_paper_id for _, last_paper_id in bounds],
+            [profile] * len(bounds)
         )
 
-    # calculate the cost of each paper
-    costs = {
-        paper_id: calculate_cost_of_one_paper(
-            NUMBER_OF_EACH_WEEKDAY,
-            undelivered_dates[paper_id],
-            *cost_and_delivery_data[index]
+        # merge the results of each shard, in order
+        for shard_costs, shard_masks in results:
+            costs.update(shard_costs)
+            undelivered_masks.update(shard_masks)
+
+    return costs, undelivered_masks
+
+
+def get_revisions(connection: Connection, month: int, year: int) -> tuple[int, int]:
+    """get the revisions of the data a bill for a given month depends on
+    - returns the revision of the paper and cost data, and the revision of the undelivered strings of the month
+    - revisions are bumped by triggers in the DB whenever the data changes"""
+
+    papers_revision = strings_revision = 0
+
+    for revision_month, revision in connection.execute(
+        "SELECT month, revision FROM revisions WHERE (month = 0 AND year = 0) OR (month = ? AND year = ?);",
+        (month, year)
+    ):
+        if revision_month == 0:
+            papers_revision = revision
+
+        else:
+            strings_revision = revision
+
+    return papers_revision, strings_revision
+
+
+def get_cached_bill(connection: Connection, month: int, year: int) -> tuple[dict[int, float], float, dict[int, int]] | None:
+    """get the bill for a given month from the cache, if the data it was calculated from has not changed since
+    - returns the cost of each paper, the total cost, and the days each paper was not delivered (as day bitmasks)
+    - returns None if there is no bill for the month, or if it is stale"""
+
+    cached = connection.execute(
+        "SELECT papers_revision, strings_revision, total FROM cached_bills WHERE month = ? AND year = ?;",
+        (month, year)
+    ).fetchone()
+
+    if cached is None or tuple(cached[:2]) != get_revisions(connection, month, year):
+        return None
+
+    costs: dict[int, float] = {}
+    undelivered_masks: dict[int, int] = {}
+
+    for paper_id, cost, undelivered_mask in connection.execute(
+        "SELECT paper_id, cost, undelivered_mask FROM cached_bill_costs WHERE month = ? AND year = ? ORDER BY paper_id;",
+        (month, year)
+    ):
+        costs[paper_id] = cost
+        undelivered_masks[paper_id] = undelivered_mask
+
+    return costs, cached[2], undelivered_masks
+
+
+def save_cached_bill(
+    connection: Connection,
+    month: int,
+    year: int,
+    revisions: tuple[int, int],
+    costs: dict[int, float],
+    total: float,
+    undelivered_masks: dict[int, int]
+) -> None:
+    """store the bill for a given month in the cache, replacing any previous bill for the month
+    - the revisions must be those of the data the bill was calculated from (see `get_revisions`)"""
+
+    with transaction(connection, "save_cached_bill"):
+        connection.execute("DELETE FROM cached_bill_costs WHERE month = ? AND year = ?;", (month, year))
+
+        connection.execute(
+            "INSERT OR REPLACE INTO cached_bills (month, year, papers_revision, strings_revision, total) VALUES (?, ?, ?, ?, ?);",
+            (month, year, *revisions, total)
         )
-        for index, (paper_id,) in enumerate(papers) # type: ignore
-    }
 
-    # calculate the total cost of all papers
-    total = sum(costs.values())
+        connection.executemany(
+            "INSERT INTO cached_bill_costs (month, year, paper_id, cost, undelivered_mask) VALUES (?, ?, ?, ?, ?);",
+            (
+                (month, year, paper_id, cost, undelivered_masks.get(paper_id, 0))
+                for paper_id, cost in costs.items()
+            )
+        )
+
+        # every paper was recalculated, so none of them are dirty any more
+        connection.execute("DELETE FROM dirty_papers WHERE month = ? AND year = ?;", (month, year))
+
+
+def calculate_cost_of_dirty_papers(connection: Connection, month: int, year: int) -> tuple[dict[int, float], dict[int, int]]:
+    """calculate the cost of only the papers marked as dirty for the given month
+    - dirty papers that no longer exist are left out
+    - return the cost of each paper, and the days each paper was not delivered (as day bitmasks)"""
+
+    # get the data about cost and delivery for every dirty paper at once
+    paper_ids, cost_matrix, delivery_matrix = build_cost_and_delivery_matrices(connection.execute(
+        f"""
+            SELECT paper_id, {', '.join(COST_COLUMNS)}, delivery_mask
+            FROM papers
+            WHERE paper_id IN (SELECT paper_id FROM dirty_papers WHERE month = ? AND year = ?)
+            ORDER BY paper_id;
+        """,
+        (month, year)
+    ).fetchall())
+
+    # get the undelivered strings of every dirty paper, and the strings for every paper (as their masks, if they have been compiled)
+    undelivered_strings: dict[int | None, list[str | int]] = {}
+
+    for paper_id, mask, string in connection.execute(
+        """
+            SELECT paper_id, mask, string
+            FROM undelivered_strings
+            WHERE month = ? AND year = ?
+            AND (paper_id IS NULL OR paper_id IN (SELECT paper_id FROM dirty_papers WHERE month = ? AND year = ?));
+        """,
+        (month, year, month, year)
+    ):
+        undelivered_strings.setdefault(paper_id, []).append(string if mask is None else mask)
+
+    return calculate_cost_of_papers(paper_ids, cost_matrix, delivery_matrix, undelivered_strings, month, year)
+
+
+def recalculate(connection: Connection, month: int, year: int) -> tuple[dict[int, float], float, dict[int, int]] | None:
+    """update the cached bill of a given month by recalculating only the papers marked as dirty
+    - papers are marked by the triggers that bump the revisions, so every change since the bill was saved is covered by the dirty papers
+    - the total is adjusted by the difference in the cost of the dirty papers
+    - returns the cost of each paper, the total cost, and the days each paper was not delivered (as day bitmasks)
+    - returns None if there is no cached bill for the month, or no paper is dirty (the whole month must then be recalculated)"""
+
+    cached = connection.execute(
+        "SELECT total FROM cached_bills WHERE month = ? AND year = ?;",
+        (month, year)
+    ).fetchone()
+
+    dirty_paper_ids = [
+        row[0]
+        for row in connection.execute(
+            "SELECT paper_id FROM dirty_papers WHERE month = ? AND year = ?;",
+            (month, year)
+        )
+    ]
+
+    if cached is None or not dirty_paper_ids:
+        return None
+
+    # record the revisions before calculating, so that any later change makes the cached bill stale
+    revisions = get_revisions(connection, month, year)
+
+    costs: dict[int, float] = {}
+    undelivered_masks: dict[int, int] = {}
+
+    for paper_id, cost, undelivered_mask in connection.execute(
+        "SELECT paper_id, cost, undelivered_mask FROM cached_bill_costs WHERE month = ? AND year = ?;",
+        (month, year)
+    ):
+        costs[paper_id] = cost
+        undelivered_masks[paper_id] = undelivered_mask
+
+    dirty_costs, dirty_masks = calculate_cost_of_dirty_papers(connection, month, year)
+    total = cached[0]
+
+    # take the old cost of each dirty paper out of the total, and put the new cost in
+    for paper_id in dirty_paper_ids:
+        total -= costs.pop(paper_id, 0)
+        undelivered_masks.pop(paper_id, None)
+
+    for paper_id, cost in dirty_costs.items():
+        total += cost
+        costs[paper_id] = cost
+        undelivered_masks[paper_id] = dirty_masks[paper_id]
+
+    with transaction(connection, "recalculate"):
+        connection.execute(
+            "DELETE FROM cached_bill_costs WHERE month = ? AND year = ? AND paper_id IN (SELECT paper_id FROM dirty_papers WHERE month = ? AND year = ?);",
+            (month, year, month, year)
+        )
+
+        connection.executemany(
+            "INSERT INTO cached_bill_costs (month, year, paper_id, cost, undelivered_mask) VALUES (?, ?, ?, ?, ?);",
+            (
+                (month, year, paper_id, cost, dirty_masks[paper_id])
+                for paper_id, cost in dirty_costs.items()
+            )
+        )
+
+        connection.execute(
+            "UPDATE cached_bills SET papers_revision = ?, strings_revision = ?, total = ? WHERE month = ? AND year = ?;",
+            (*revisions, total, month, year)
+        )
+
+        connection.execute("DELETE FROM dirty_papers WHERE month = ? AND year = ?;", (month, year))
+
+    return dict(sorted(costs.items())), total, dict(sorted(undelivered_masks.items()))
+
+
+def calculate_bill_with_cache(
+    connection: Connection,
+    month: int,
+    year: int,
+    workers: int | None = None,
+    shard_size: int = SHARD_SIZE,
+    profile: str | None = None
+) -> tuple[
+    dict[int, float],
+    float,
+    dict[int, set[date]]
+]:
+    """calculate the cost of all papers for the full month, using the undelivered strings stored in the DB
+    - if the bill for the month is cached and none of its data has changed, it is returned without parsing anything
+    - if only some papers have changed, only those are recalculated (see `recalculate`)
+    - otherwise, the bill is calculated (see `calculate_cost_and_masks_of_all_papers`) and cached
+    - return data about the cost of each paper, the total cost, and dates when each paper was not delivered"""
+
+    cached = get_cached_bill(connection, month, year)
+
+    if cached is None:
+        cached = recalculate(connection, month, year)
+
+    if cached is not None:
+        costs, total, undelivered_masks = cached
+
+    else:
+        # record the revisions before calculating, so that any later change makes the cached bill stale
+        revisions = get_revisions(connection, month, year)
+
+        costs, total, undelivered_masks = calculate_cost_and_masks_of_all_papers(
+            connection,
+            get_undelivered_strings_in_range(connection, [(month, year)])[(month, year)],
+            month,
+            year,
+            workers,
+            shard_size,
+            profile
+        )
+
+        save_cached_bill(connection, month, year, revisions, costs, total, undelivered_masks)
+
+    # expand the masks to dates for each paper
+    undelivered_dates: dict[int, set[date]] = {
+        paper_id: get_dates_from_mask(month, year, mask)
+        for paper_id, mask in undelivered_masks.items()
+    }
 
     return costs, total, undelivered_dates
 
 
+def get_months_in_range(start_month: int, start_year: int, end_month: int, end_year: int) -> list[tuple[int, int]]:
+    """get each (month, year) from a start month to an end month, bounds inclusive"""
+
+    return [
+        (index % 12 + 1, index // 12)
+        for index in range(start_year * 12 + start_month - 1, end_year * 12 + end_month)
+    ]
+
+
+def get_undelivered_strings_in_range(
+    connection: Connection,
+    months: list[tuple[int, int]]
+) -> dict[tuple[int, int], dict[int | None, list[str | int]]]:
+    """get the undelivered strings of every paper for a range of months, in one query
+    - the months must be consecutive, as returned by `get_months_in_range`
+    - strings that have been compiled are given as their masks, so that they are not parsed again
+    - returns a dictionary mapping each (month, year) to a dictionary of paper IDs and their strings (with strings for every paper under None)"""
+
+    undelivered_strings: dict[tuple[int, int], dict[int | None, list[str | int]]] = {
+        month_and_year: {}
+        for month_and_year in months
+    }
+
+    if not months:
+        return undelivered_strings
+
+    (start_month, start_year), (end_month, end_year) = months[0], months[-1]
+
+    query = """
+        SELECT paper_id, month, year, mask, string
+        FROM undelivered_strings
+        WHERE year BETWEEN ? AND ?
+        AND year * 12 + month BETWEEN ? AND ?;
+    """
+
+    for paper_id, month, year, mask, string in connection.execute(
+        query,
+        (start_year, end_year, start_year * 12 + start_month, end_year * 12 + end_month)
+    ):
+        undelivered_strings[(month, year)].setdefault(paper_id, []).append(string if mask is None else mask)
+
+    return undelivered_strings
+
+
+def count_set_bits(values: numpy.typing.NDArray[numpy.integer]) -> numpy.typing.NDArray[numpy.uint8]:
+    """count the bits set in each element of an array of day bitmasks (up to 32 bits each)
+    - numpy 2.0 and above can count bits natively; older versions look up the count of each byte"""
+
+    if hasattr(numpy, "bitwise_count"):
+        return numpy.bitwise_count(numpy.asarray(values, dtype=numpy.uint32))
+
+    as_bytes = numpy.ascontiguousarray(values, dtype=numpy.uint32).view(numpy.uint8)
+
+    return BIT_COUNTS[as_bytes].reshape(*numpy.shape(values), 4).sum(axis=-1, dtype=numpy.uint8)
+
+
+def calculate_cost_of_each_paper_in_range(
+    months: list[tuple[int, int]],
+    undelivered_masks: numpy.typing.NDArray[numpy.integer],
+    cost_matrix: numpy.typing.NDArray[numpy.floating],
+    delivery_matrix: numpy.typing.NDArray[numpy.int8]
+) -> tuple[numpy.typing.NDArray[numpy.float64], list[float]]:
+    """calculate the cost of every paper for every month in a range at once
+    - the undelivered masks are day bitmasks of shape (papers, months)
+    - the undelivered days of each paper are counted per weekday (against each month's weekday masks), and subtracted from the number of each weekday in the month
+    - returns a (papers, months) matrix of costs, and the total cost of each month"""
+
+    contexts = [get_month_context(month, year) for month, year in months]
+
+    weekday_masks = numpy.array([context.weekday_masks for context in contexts], dtype=numpy.uint32).reshape(len(months), len(WEEKDAY_NAMES))
+    number_of_each_weekday = numpy.array([context.number_of_each_weekday for context in contexts], dtype=numpy.int64).reshape(len(months), len(WEEKDAY_NAMES))
+
+    # number of days per weekday when each paper was received, in each month
+    number_of_days_per_weekday_received = number_of_each_weekday - count_set_bits(
+        numpy.asarray(undelivered_masks, dtype=numpy.uint32)[:, :, numpy.newaxis] & weekday_masks
+    )
+
+    costs = numpy.sum(
+        (delivery_matrix * cost_matrix)[:, numpy.newaxis, :] * number_of_days_per_weekday_received,
+        axis=2
+    )
+
+    # sum in order, so that the totals match adding up the costs of each paper one by one
+    totals = [sum(column) for column in costs.T.tolist()]
+
+    return costs, totals
+
+
+def calculate_cost_of_all_papers_in_range(
+    connection: Connection,
+    start_month: int,
+    start_year: int,
+    end_month: int,
+    end_year: int
+) -> RangeCosts:
+    """calculate the cost of all papers for every month in a range, bounds inclusive
+    - paper data and all undelivered strings for the range are loaded once
+    - returns the paper IDs, the (month, year) of each month, a (papers, months) matrix of costs, the total of each month, and a (papers, months) matrix of undelivered day bitmasks"""
+
+    months = get_months_in_range(start_month, start_year, end_month, end_year)
+
+    # get the data about cost and delivery for every paper at once
+    paper_ids, cost_matrix, delivery_matrix = get_cost_and_delivery_matrices(connection)
+
+    # map each paper ID to its row in the matrices
+    rows = {
+        paper_id: index
+        for index, paper_id in enumerate(paper_ids.tolist())
+    }
+
+    # calculate the days when each paper was not delivered in each month, as day bitmasks
+    undelivered_masks = numpy.zeros((len(paper_ids), len(months)), dtype=numpy.int64)
+
+    for column, ((month, year), undelivered_strings) in enumerate(get_undelivered_strings_in_range(connection, months).items()):
+        masks = parse_undelivered_strings_of_papers(month, year, undelivered_strings)
+
+        # the mask of the strings for every paper is broadcast to the whole column
+        shared_mask = masks.pop(None, 0)
+        undelivered_masks[:, column] = shared_mask
+
+        for paper_id, mask in masks.items():
+            if paper_id in rows:
+                undelivered_masks[rows[paper_id], column] = mask | shared_mask
+
+    costs, totals = calculate_cost_of_each_paper_in_range(months, undelivered_masks, cost_matrix, delivery_matrix)
+
+    return RangeCosts(paper_ids, months, costs, totals, undelivered_masks)
+
+
+def save_results_in_range(connection: Connection, range_costs: RangeCosts, custom_timestamp: datetime | None = None) -> None:
+    """save the results of calculating a range of months to the DB, in a single transaction
+    - each month is logged the same way as `save_results`"""
+
+    paper_ids = range_costs.paper_ids.tolist()
+
+    with transaction(connection, "save_results_in_range"):
+        for column, (month, year) in enumerate(range_costs.months):
+            save_results(
+                connection,
+                dict(zip(paper_ids, range_costs.costs[:, column].tolist())),
+                dict(zip(paper_ids, range_costs.undelivered_masks[:, column].tolist())),
+                month,
+                year,
+                custom_timestamp
+            )
+
+
+def get_batches(rows: Iterable, batch_size: int) -> Generator[list, None, None]:
+    """split rows into lists of at most the given size, without reading ahead more than one batch"""
+
+    rows = iter(rows)
+
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
+
 def save_results(
     connection: Connection,
     costs: dict[int, float],
-    undelivered_dates: dict[int, set[date]],
+    undelivered_dates: dict[int, set[date] | int],
     month: int,
     year: int,
-    custom_timestamp: datetime | None = None
+    custom_timestamp: datetime | None = None,
+    batch_size: int = SAVE_BATCH_SIZE
 ) -> None:
-    """save the results of undelivered dates to the DB
-    - save the dates any paper was not delivered
-    - save the final cost of each paper"""
+    """save the results of undelivered dates to the DB, in a single transaction
+    - save the dates any paper was not delivered (given as sets of dates, or as day bitmasks), as a day bitmask in each log
+    - save the final cost of each paper
+    - rows are written in batches of the given size, instead of one statement per row"""
 
-    timestamp = (custom_timestamp or datetime.now()).strftime(r'%d/%m/%Y %I:%M:%S %p')
+    if batch_size < 1:
+        raise ValueError("Batch size must be at least 1.")
 
-    # create log entries for each paper
-    log_ids = {
-        paper_id: connection.execute(
-            """
-            INSERT INTO logs (paper_id, month, year, timestamp)
-            VALUES (?, ?, ?, ?)
-            RETURNING logs.log_id;
-            """,
-            (paper_id, month, year, timestamp)
-        ).fetchone()[0]
-        for paper_id in costs.keys()
+    timestamp = (custom_timestamp or datetime.now()).strftime(TIMESTAMP_FORMAT)
+
+    # each log row needs 5 variables, so keep multi-row statements within SQLite's limit
+    rows_per_statement = min(batch_size, SQLITE_MAX_VARIABLES // 5)
+
+    # convert the undelivered dates of each paper to day bitmasks
+    undelivered_masks = {
+        paper_id: dates if isinstance(dates, int) else get_mask_from_dates(dates)
+        for paper_id, dates in undelivered_dates.items()
     }
 
-    # create cost entries for each paper
-    for paper_id, log_id in log_ids.items():
-        connection.execute(
-            """
-            INSERT INTO cost_logs (log_id, cost)
-            VALUES (?, ?);
-            """,
-            (log_id, costs[paper_id])
-        )
+    with transaction(connection, "save_results"):
 
-    # create undelivered date entries for each paper
-    for paper_id, dates in undelivered_dates.items():
-        for day in dates:
-            connection.execute(
-                """
-                INSERT INTO undelivered_dates_logs (log_id, date_not_delivered)
-                VALUES (?, ?);
-                """,
-                (log_ids[paper_id], day.strftime("%Y-%m-%d"))
-            )
+        # create log entries for each paper, a batch at a time
+        # the order of rows from RETURNING is not guaranteed, so map each log ID back using its paper ID
+        log_ids: dict[int, int] = {}
+
+        for batch in get_batches(costs.keys(), rows_per_statement):
+            values = ', '.join(['(?, ?, ?, ?, ?)'] * len(batch))
+
+            log_ids.update(connection.execute(
+                f"INSERT INTO logs (paper_id, month, year, timestamp, undelivered_mask) VALUES {values} RETURNING paper_id, log_id;",
+                [
+                    value
+                    for paper_id in batch
+                    for value in (paper_id, month, year, timestamp, undelivered_masks.get(paper_id, 0))
+                ]
+            ).fetchall())
+
+        # create cost entries for each paper
+        for batch in get_batches(((log_ids[paper_id], cost) for paper_id, cost in costs.items()), batch_size):
+            connection.executemany("INSERT INTO cost_logs (log_id, cost) VALUES (?, ?);", batch)
 
     return
 
@@ -395,6 +1417,38 @@ def format_output(connection: Connection, costs: dict[int, float], total: float,
         yield f"{papers[paper_id]}: {cost:.2f}"
 
 
+def format_output_of_range(connection: Connection, range_costs: RangeCosts) -> Generator[str, None, None]:
+    """format the output of calculating the cost of all papers for a range of months"""
+
+    papers = dict(connection.execute("SELECT paper_id, name FROM papers;").fetchall())
+    paper_ids = range_costs.paper_ids.tolist()
+
+    for column, ((month, year), total) in enumerate(zip(range_costs.months, range_costs.totals)):
+
+        # output the name of the month, and the total cost of all papers for that month
+        yield f"For {date(year=year, month=month, day=1).strftime(r'%B %Y')},\n"
+        yield f"*TOTAL*: {total:.2f}"
+
+        # output the cost of each paper with its name
+        for paper_id, cost in zip(paper_ids, range_costs.costs[:, column].tolist()):
+            yield f"{papers[paper_id]}: {cost:.2f}"
+
+        yield ""
+
+    # output the total cost of all papers across all months
+    yield f"*GRAND TOTAL*: {sum(range_costs.totals):.2f}"
+
+
+def get_delivery_mask(days_delivered: list[bool]) -> int:
+    """convert the delivered status of each day of the week to a bitmask (bit n is the nth day of the week)"""
+
+    return sum(
+        1 << day_id
+        for day_id, delivered in enumerate(days_delivered)
+        if delivered
+    )
+
+
 def add_new_paper(connection: Connection, name: str, days_delivered: list[bool], days_cost: list[float]) -> None:
     """add a new paper
     - do not allow if the paper already exists"""
@@ -406,18 +1460,11 @@ def add_new_paper(connection: Connection, name: str, days_delivered: list[bool],
         raise npbc_exceptions.PaperAlreadyExists(f"Paper \"{name}\" already exists."
     )
 
-    # insert the paper
-    paper_id = connection.execute(
-        "INSERT INTO papers (name) VALUES (?) RETURNING papers.paper_id;",
-        (name,)
-    ).fetchone()[0]
-
-    # create cost and delivered entries for each day
-    for day_id, (delivered, cost) in enumerate(zip(days_delivered, days_cost)):
-        connection.execute(
-            "INSERT INTO cost_and_delivery_data (paper_id, day_id, delivered, cost) VALUES (?, ?, ?, ?);",
-            (paper_id, day_id, delivered, cost)
-        )
+    # insert the paper, with its cost on each day and the days it is delivered
+    connection.execute(
+        f"INSERT INTO papers (name, {', '.join(COST_COLUMNS)}, delivery_mask) VALUES (?, {', '.join('?' * len(COST_COLUMNS))}, ?);",
+        (name, *days_cost, get_delivery_mask(days_delivered))
+    )
 
     return
 
@@ -439,28 +1486,31 @@ def edit_existing_paper(
         raise npbc_exceptions.PaperNotExists(f"Paper with ID {paper_id} does not exist."
     )
 
+    # collect the columns to update
+    columns = []
+    values = []
+
     # update the paper name
-    if name is not None:
-        connection.execute(
-            "UPDATE papers SET name = ? WHERE paper_id = ?;",
-            (name, paper_id)
-        )
+    if name is not None:
+        columns.append("name")
+        values.append(name)
 
     # update the costs of each day
     if days_cost is not None:
-        for day_id, cost in enumerate(days_cost):
-            connection.execute(
-                "UPDATE cost_and_delivery_data SET cost = ? WHERE paper_id = ? AND day_id = ?;",
-                (cost, paper_id, day_id)
-            )
+        columns.extend(COST_COLUMNS)
+        values.extend(days_cost)
 
     # update the delivered status of each day
     if days_delivered is not None:
-        for day_id, delivered in enumerate(days_delivered):
-            connection.execute(
-                "UPDATE cost_and_delivery_data SET delivered = ? WHERE paper_id = ? AND day_id = ?;",
-                (delivered, paper_id, day_id)
-            )
+        columns.append("delivery_mask")
+        values.append(get_delivery_mask(days_delivered))
+
+    # update everything in one statement
+    if columns:
+        connection.execute(
+            f"UPDATE papers SET {', '.join(f'{column} = ?' for column in columns)} WHERE paper_id = ?;",
+            (*values, paper_id)
+        )
 
     return
 
@@ -476,27 +1526,171 @@ def delete_existing_paper(connection: Connection, paper_id: int) -> None:
     ).fetchone()[0]:
         raise npbc_exceptions.PaperNotExists(f"Paper with ID {paper_id} does not exist.")
 
-    # delete the paper
+    # delete the paper (its cost and delivery data are stored with it)
     connection.execute(
         "DELETE FROM papers WHERE paper_id = ?;",
         (paper_id,)
     )
 
-    # delete the costs and delivery data for the paper
-    connection.execute(
-        "DELETE FROM cost_and_delivery_data WHERE paper_id = ?;",
-        (paper_id,)
+    return
+
+
+def validate_paper_definition(paper: PaperDefinition) -> PaperDefinition:
+    """validate the definition of a paper for bulk changes
+    - the name must not be empty, the delivery mask must have at most 7 bits, and there must be a non-negative cost for each day of the week
+    - returns the definition with its costs converted to floats"""
+
+    if not isinstance(paper.name, str) or not paper.name.strip():
+        raise npbc_exceptions.InvalidInput("Paper name must not be empty.")
+
+    if isinstance(paper.delivery_mask, bool) or not isinstance(paper.delivery_mask, int) or not (0 <= paper.delivery_mask < (1 << len(WEEKDAY_NAMES))):
+        raise npbc_exceptions.InvalidInput(f"Invalid delivery days. The delivery mask must be an integer between 0 and {(1 << len(WEEKDAY_NAMES)) - 1}.")
+
+    if isinstance(paper.costs, str):
+        raise npbc_exceptions.InvalidInput("Costs must be a list of numbers.")
+
+    try:
+        costs = tuple(map(float, paper.costs))
+
+    except (TypeError, ValueError):
+        raise npbc_exceptions.InvalidInput("Costs must be numbers.")
+
+    if len(costs) != len(WEEKDAY_NAMES):
+        raise npbc_exceptions.InvalidInput(f"There must be a cost for each of the {len(WEEKDAY_NAMES)} days of the week.")
+
+    if min(costs) < 0:
+        raise npbc_exceptions.InvalidInput("Costs must not be negative.")
+
+    return PaperDefinition(paper.name, paper.delivery_mask, costs)
+
+
+def get_existing_paper_names(connection: Connection, names: Iterable[str]) -> set[str]:
+    """get which of the given names belong to papers in the DB, checking a batch of names per query"""
+
+    existing = set()
+
+    for batch in get_batches(names, SQLITE_MAX_VARIABLES):
+        existing.update(
+            row[0]
+            for row in connection.execute(
+                f"SELECT name FROM papers WHERE name IN ({', '.join('?' * len(batch))});",
+                batch
+            )
+        )
+
+    return existing
+
+
+def write_papers(connection: Connection, papers: list[PaperDefinition]) -> None:
+    """add or edit (matched by name) a batch of papers that have already been validated"""
+
+    connection.executemany(
+        f"""
+            INSERT INTO papers (name, {', '.join(COST_COLUMNS)}, delivery_mask)
+            VALUES (?, {', '.join('?' * len(COST_COLUMNS))}, ?)
+            ON CONFLICT (name) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in COST_COLUMNS)}, delivery_mask = excluded.delivery_mask;
+        """,
+        (
+            (paper.name, *paper.costs, paper.delivery_mask)
+            for paper in papers
+        )
     )
 
-    return
+
+def get_existing_paper_ids(connection: Connection, paper_ids: Iterable[int]) -> set[int]:
+    """get which of the given IDs belong to papers in the DB, checking a batch of IDs per query"""
+
+    existing = set()
+
+    for batch in get_batches(paper_ids, SQLITE_MAX_VARIABLES):
+        existing.update(
+            row[0]
+            for row in connection.execute(
+                f"SELECT paper_id FROM papers WHERE paper_id IN ({', '.join('?' * len(batch))});",
+                batch
+            )
+        )
+
+    return existing
+
+
+def upsert_papers(connection: Connection, papers: Iterable[PaperDefinition], batch_size: int = SAVE_BATCH_SIZE) -> BulkReport:
+    """add papers, or edit the costs and delivery days of papers that already exist (matched by name), in bulk
+    - every definition is validated first, and invalid ones (or names given more than once) are skipped
+    - the valid ones are written in batches of the given size, in a single transaction
+    - returns the number of papers added or edited, and a list of (index, error message) for each skipped definition"""
+
+    valid: list[PaperDefinition] = []
+    errors: list[tuple[int, str]] = []
+    seen_names: set[str] = set()
+
+    # validate every definition before writing anything
+    for index, paper in enumerate(papers):
+        try:
+            paper = validate_paper_definition(PaperDefinition(*paper))
+
+        except npbc_exceptions.InvalidInput as e:
+            errors.append((index, str(e)))
+            continue
+
+        # definitions that are not made of a name, a delivery mask and costs
+        except (TypeError, ValueError):
+            errors.append((index, "Paper must have a name, a delivery mask, and costs."))
+            continue
+
+        if paper.name in seen_names:
+            errors.append((index, f"Paper \"{paper.name}\" is given more than once."))
+            continue
+
+        seen_names.add(paper.name)
+        valid.append(paper)
+
+    with transaction(connection, "upsert_papers"):
+        for batch in get_batches(valid, batch_size):
+            write_papers(connection, batch)
+
+    return BulkReport(len(valid), errors)
+
+
+def delete_papers(connection: Connection, names: Iterable[str], batch_size: int = SAVE_BATCH_SIZE) -> BulkReport:
+    """delete papers by name, in bulk
+    - names that do not belong to a paper (or are given more than once) are skipped
+    - the rest are deleted in batches of the given size, in a single transaction
+    - returns the number of papers deleted, and a list of (index, error message) for each skipped name"""
+
+    names = list(names)
+    existing = get_existing_paper_names(connection, names)
+
+    valid: list[str] = []
+    errors: list[tuple[int, str]] = []
+    seen_names: set[str] = set()
+
+    for index, name in enumerate(names):
+        if name not in existing:
+            errors.append((index, f"Paper \"{name}\" does not exist."))
+
+        elif name in seen_names:
+            errors.append((index, f"Paper \"{name}\" is given more than once."))
+
+        else:
+            seen_names.add(name)
+            valid.append(name)
+
+    with transaction(connection, "delete_papers"):
+        for batch in get_batches(((name,) for name in valid), batch_size):
+            connection.executemany("DELETE FROM papers WHERE name = ?;", batch)
+
+    return BulkReport(len(valid), errors)
 
 
 def add_undelivered_string(connection: Connection, month: int, year: int, paper_id: int | None = None, *undelivered_strings: str) -> None:
     """record strings for date(s) paper(s) were not delivered
-    - if no paper ID is specified, all papers are assumed"""
+    - if no paper ID is specified, all papers are assumed
+    - strings for all papers are stored once (without a paper ID), and apply to every paper, including ones added later
+    - each string is stored with its mask for the month, so that it is never parsed again"""
 
-    # validate the strings
-    validate_undelivered_string(*undelivered_strings)
+    # validate the strings, and compile them for the month
+    masks = compile_undelivered_strings(month, year, *undelivered_strings)
 
     # if a paper ID is given
     if paper_id:
@@ -510,30 +1704,21 @@ def add_undelivered_string(connection: Connection, month: int, year: int, paper_
     
         # add the string(s)
         params = [
-            (month, year, paper_id, string)
-            for string in undelivered_strings
+            (month, year, paper_id, string, mask)
+            for string, mask in zip(undelivered_strings, masks)
         ]
 
-        connection.executemany("INSERT INTO undelivered_strings (month, year, paper_id, string) VALUES (?, ?, ?, ?);", params)
+        connection.executemany("INSERT INTO undelivered_strings (month, year, paper_id, string, mask) VALUES (?, ?, ?, ?, ?);", params)
 
     else:
 
-        # get the IDs of all papers
-        paper_ids = [
-            row[0]
-            for row in connection.execute(
-                "SELECT paper_id FROM papers;"
-            )
-        ]
-
-        # add the string(s)
+        # add the string(s), once each
         params = [
-            (month, year, paper_id, string)
-            for paper_id in paper_ids
-            for string in undelivered_strings
+            (month, year, string, mask)
+            for string, mask in zip(undelivered_strings, masks)
         ]
 
-        connection.executemany("INSERT INTO undelivered_strings (month, year, paper_id, string) VALUES (?, ?, ?, ?);", params)
+        connection.executemany("INSERT INTO undelivered_strings (month, year, paper_id, string, mask) VALUES (?, ?, NULL, ?, ?);", params)
 
     return
 
@@ -544,34 +1729,39 @@ def delete_undelivered_string(
     string: str | None = None,
     paper_id: int | None = None,
     month: int | None = None,
-    year: int | None = None
+    year: int | None = None,
+    all_papers: bool = False
 ) -> None:
     """delete an existing undelivered string
-    - do not allow if the string does not exist"""
+    - do not allow if the string does not exist
+    - a paper ID only matches the strings of that paper, and all_papers only matches the strings for every paper"""
 
-    # initialize parameters for the WHERE clause of the SQL query
+    # initialize conditions for the WHERE clause of the SQL query
     parameters = []
     values = []
 
     # check each parameter and add it to the WHERE clause if it is given
     if string_id:
-        parameters.append("string_id")
+        parameters.append("string_id = ?")
         values.append(string_id)
 
     if string:
-        parameters.append("string")
+        parameters.append("string = ?")
         values.append(string)
 
     if paper_id:
-        parameters.append("paper_id")
+        parameters.append("paper_id = ?")
         values.append(paper_id)
 
+    if all_papers:
+        parameters.append("paper_id IS NULL")
+
     if month:
-        parameters.append("month")
+        parameters.append("month = ?")
         values.append(month)
 
     if year:
-        parameters.append("year")
+        parameters.append("year = ?")
         values.append(year)
 
     # if no parameters are given, raise an error
@@ -581,10 +1771,7 @@ def delete_undelivered_string(
     # check if the string exists
     check_query = "SELECT EXISTS (SELECT 1 FROM undelivered_strings"
 
-    conditions = ' AND '.join(
-        f"{parameter} = ?"
-        for parameter in parameters
-    )
+    conditions = ' AND '.join(parameters)
 
     if (1,) not in connection.execute(f"{check_query} WHERE {conditions});", values).fetchall():
         raise npbc_exceptions.StringNotExists("String with given parameters does not exist.")
@@ -597,6 +1784,220 @@ def delete_undelivered_string(
     return
 
 
+def backfill_undelivered_string_masks(connection: Connection, batch_size: int = SAVE_BATCH_SIZE) -> tuple[int, int]:
+    """compile the masks of stored undelivered strings that do not have one yet (such as those added before masks were stored), in a single transaction
+    - strings are read and updated in batches of the given size, in order of their IDs
+    - a string that cannot be compiled for its month is left without a mask, so that it is still reported when calculating
+    - compiling a mask does not change what a string means, so cached bills stay valid
+    - returns the number of strings compiled, and the number that could not be"""
+
+    if batch_size < 1:
+        raise ValueError("Batch size must be at least 1.")
+
+    compiled = 0
+    failed = 0
+    last_string_id = 0
+
+    with transaction(connection, "backfill_undelivered_string_masks"):
+        while rows := connection.execute(
+            "SELECT string_id, month, year, string FROM undelivered_strings WHERE mask IS NULL AND string_id > ? ORDER BY string_id LIMIT ?;",
+            (last_string_id, batch_size)
+        ).fetchall():
+            last_string_id = rows[-1][0]
+            masks = []
+
+            for string_id, month, year, string in rows:
+                try:
+                    masks.append((compile_undelivered_strings(month, year, string)[0], string_id))
+
+                except npbc_exceptions.InvalidUndeliveredString:
+                    failed += 1
+
+            connection.executemany("UPDATE undelivered_strings SET mask = ? WHERE string_id = ?;", masks)
+            compiled += len(masks)
+
+    return compiled, failed
+
+
+def read_records(path: Path | str) -> Generator[tuple[int, dict | None, str | None], None, None]:
+    """read the records of a CSV (with a header row) or JSON Lines file, one at a time
+    - the format is chosen by the extension of the file: .csv, or .jsonl/.ndjson
+    - yields (line number, record, None) for each record, or (line number, None, error message) for each line that cannot be read
+    - blank lines are skipped"""
+
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == '.csv':
+        with open(path, 'r', encoding='utf-8', newline='') as input_file:
+            reader = DictReader(input_file)
+
+            for record in reader:
+                if None in record:
+                    yield reader.line_num, None, "Row has more fields than the header."
+
+                else:
+                    yield reader.line_num, record, None
+
+    elif suffix in IMPORT_JSON_LINES_SUFFIXES:
+        with open(path, 'r', encoding='utf-8') as input_file:
+            for line_number, line in enumerate(input_file, start=1):
+                if not line.strip():
+                    continue
+
+                try:
+                    record = loads(line)
+
+                except JSONDecodeError as e:
+                    yield line_number, None, f"Invalid JSON: {e}"
+                    continue
+
+                if isinstance(record, dict):
+                    yield line_number, record, None
+
+                else:
+                    yield line_number, None, "Each line must be a JSON object."
+
+    else:
+        raise npbc_exceptions.InvalidInput(f"Cannot import {path.name}. Only .csv and {'/'.join(IMPORT_JSON_LINES_SUFFIXES)} files are supported.")
+
+
+def parse_paper_record(record: dict) -> PaperDefinition:
+    """convert an imported record to a valid paper definition
+    - the record needs a "name", the "delivered" days (as /[YN]{7}/ or as a bitmask), and the daywise costs (as a "costs" list, or as "cost_0" to "cost_6")"""
+
+    delivered = record.get('delivered')
+
+    if isinstance(delivered, str):
+        delivered = delivered.strip()
+
+        # the first day is the lowest bit, so the string is read as binary backwards
+        if npbc_regex.DELIVERY_MATCH_REGEX.match(delivered):
+            delivered = int(delivered[::-1].replace('Y', '1').replace('N', '0'), 2)
+
+        elif delivered.isdigit():
+            delivered = int(delivered)
+
+    costs = record.get('costs')
+
+    if costs is None:
+        costs = [record.get(column) for column in COST_COLUMNS]
+
+    return validate_paper_definition(PaperDefinition(record.get('name'), delivered, costs))
+
+
+def parse_undelivered_string_record(record: dict) -> tuple[int, int, int | None, str, int]:
+    """convert an imported record to a valid (month, year, paper ID, string, mask) to be added
+    - the record needs a "month", a "year", and the undelivered "string" itself
+    - strings without a "paper_id" (or with an empty one) are for every paper
+    - the string is compiled into its mask for the month, so a string that is not valid for the month is rejected"""
+
+    paper_id = record.get('paper_id')
+
+    try:
+        month, year = (int(record[key]) for key in ('month', 'year'))
+        paper_id = int(paper_id) if paper_id not in (None, '') else None
+
+    except KeyError as e:
+        raise npbc_exceptions.InvalidInput(f"Missing {e}.")
+
+    except (TypeError, ValueError):
+        raise npbc_exceptions.InvalidInput("Paper ID, month, and year must be integers.")
+
+    validate_month_and_year(month, year)
+
+    string = record.get('string')
+
+    if not isinstance(string, str) or not string.strip():
+        raise npbc_exceptions.InvalidUndeliveredString("Undelivered string must not be empty.")
+
+    string = string.strip()
+    mask, = compile_undelivered_strings(month, year, string)
+
+    return month, year, paper_id, string, mask
+
+
+def write_undelivered_strings(connection: Connection, undelivered_strings: list[tuple[int, int, int | None, str, int]]) -> None:
+    """add a batch of (month, year, paper ID, string, mask) that have already been validated and compiled
+    - strings without a paper ID are for every paper"""
+
+    connection.executemany("INSERT INTO undelivered_strings (month, year, paper_id, string, mask) VALUES (?, ?, ?, ?, ?);", undelivered_strings)
+
+
+def import_records(
+    connection: Connection,
+    kind: str,
+    path: Path | str,
+    reject_path: Path | str | None = None,
+    batch_size: int = SAVE_BATCH_SIZE
+) -> ImportReport:
+    """import papers or undelivered strings from a CSV or JSON Lines file (see `read_records`), in a single transaction
+    - kind is either "papers" or "strings"
+    - the file is streamed in chunks of the given size, and each chunk is validated and then written with one batch of inserts, so memory use does not grow with the file
+    - papers that already exist (by name) are edited, and strings must belong to papers that exist (or to every paper, without a paper ID)
+    - records that cannot be imported are skipped, and written to the reject file (if given) as JSON Lines of their line number, error, and record
+    - returns the number of records imported and rejected"""
+
+    if kind not in IMPORT_KINDS:
+        raise npbc_exceptions.InvalidInput(f"Cannot import {kind}. Only {' and '.join(IMPORT_KINDS)} can be imported.")
+
+    if batch_size < 1:
+        raise ValueError("Batch size must be at least 1.")
+
+    records = read_records(path)
+    imported = 0
+    rejected = 0
+
+    with ExitStack() as stack:
+        reject_file = stack.enter_context(open(reject_path, 'w', encoding='utf-8')) if reject_path is not None else None
+        stack.enter_context(transaction(connection, "import_records"))
+
+        for chunk in get_batches(records, batch_size):
+            valid = []
+            rejects = []
+
+            # validate the whole chunk before writing any of it
+            for line_number, record, error in chunk:
+                if error is None:
+                    try:
+                        valid.append((line_number, record, parse_paper_record(record) if kind == 'papers' else parse_undelivered_string_record(record)))
+                        continue
+
+                    except npbc_exceptions.InvalidInput as e:
+                        error = str(e)
+
+                rejects.append((line_number, record, error))
+
+            # strings can only be added to papers that exist, which are checked for the whole chunk at once
+            if kind == 'strings' and valid:
+                existing = get_existing_paper_ids(connection, {values[2] for _, _, values in valid if values[2] is not None})
+                existing.add(None)
+
+                rejects.extend(
+                    (line_number, record, f"Paper with ID {values[2]} does not exist.")
+                    for line_number, record, values in valid
+                    if values[2] not in existing
+                )
+
+                valid = [
+                    (line_number, record, values)
+                    for line_number, record, values in valid
+                    if values[2] in existing
+                ]
+
+            if valid:
+                (write_papers if kind == 'papers' else write_undelivered_strings)(connection, [values for _, _, values in valid])
+
+            if reject_file is not None:
+                for line_number, record, error in sorted(rejects, key=lambda reject: reject[0]):
+                    reject_file.write(dumps({'line': line_number, 'error': error, 'record': record}) + '\n')
+
+            imported += len(valid)
+            rejected += len(rejects)
+
+    return ImportReport(imported, rejected)
+
+
 def get_papers(connection: Connection) -> tuple[Papers]:
     """get all papers
     - returns a list of tuples containing the following fields:
@@ -619,44 +2020,83 @@ def get_papers(connection: Connection) -> tuple[Papers]:
     ))
 
 
+def get_paper_columns(connection: Connection, paper_id: int | None = None) -> PaperColumns:
+    """get all papers (or only the one with the given ID) as columns, in one query
+    - returns the paper IDs, their names, and (N, 7) matrices of costs and delivery data
+    - row i of each matrix (and name i) belongs to the paper at index i of the paper IDs, in order of paper ID
+    - columns of the matrices are in the same order as WEEKDAY_NAMES"""
+
+    query = f"SELECT paper_id, name, {', '.join(COST_COLUMNS)}, delivery_mask FROM papers"
+
+    if paper_id is not None:
+        raw_data = connection.execute(f"{query} WHERE paper_id = ?;", (paper_id,)).fetchall()
+
+    else:
+        raw_data = connection.execute(f"{query} ORDER BY paper_id;").fetchall()
+
+    paper_ids, costs, delivered = build_cost_and_delivery_matrices([
+        (row[0], *row[2:])
+        for row in raw_data
+    ])
+
+    return PaperColumns(paper_ids, tuple(row[1] for row in raw_data), costs, delivered)
+
+
+def get_paper(connection: Connection, paper_id: int) -> Paper:
+    """get a single paper by its ID, with its costs and delivery data as arrays of 7 (in the same order as WEEKDAY_NAMES)
+    - do not allow if the paper does not exist"""
+
+    columns = get_paper_columns(connection, paper_id)
+
+    if not len(columns.paper_ids):
+        raise npbc_exceptions.PaperNotExists(f"Paper with ID {paper_id} does not exist.")
+
+    return Paper(paper_id, columns.names[0], columns.costs[0], columns.delivered[0])
+
+
 def get_undelivered_strings(
     connection: Connection,
     string_id: int | None = None,
     month: int | None = None,
     year: int | None = None,
     paper_id: int | None = None,
-    string: str | None = None
+    string: str | None = None,
+    all_papers: bool = False
 ) -> tuple[UndeliveredStrings]:
     """get undelivered strings
     - the user may specify as many as they want parameters
-    - available parameters: string_id, month, year, paper_id, string
+    - available parameters: string_id, month, year, paper_id, string, all_papers
+    - a paper ID only matches the strings of that paper, and all_papers only matches the strings for every paper
     - returns a tuple of tuples containing the following fields:
-      string_id, paper_id, year, month, string"""
+      string_id, paper_id (None for strings for every paper), year, month, string"""
 
-    # initialize parameters for the WHERE clause of the SQL query
+    # initialize conditions for the WHERE clause of the SQL query
     parameters = []
     values = []
     data = []
 
     # check each parameter and add it to the WHERE clause if it is given
     if string_id:
-        parameters.append("string_id")
+        parameters.append("string_id = ?")
         values.append(string_id)
 
     if month:
-        parameters.append("month")
+        parameters.append("month = ?")
         values.append(month)
 
     if year:
-        parameters.append("year")
+        parameters.append("year = ?")
         values.append(year)
 
     if paper_id:
-        parameters.append("paper_id")
+        parameters.append("paper_id = ?")
         values.append(paper_id)
 
+    if all_papers:
+        parameters.append("paper_id IS NULL")
+
     if string:
-        parameters.append("string")
+        parameters.append("string = ?")
         values.append(string)
 
 
@@ -667,10 +2107,7 @@ def get_undelivered_strings(
         query = f"{main_query};"
 
     else:
-        conditions = ' AND '.join(
-            f"{parameter} = ?"
-            for parameter in parameters
-        )
+        conditions = ' AND '.join(parameters)
 
         query = f"{main_query} WHERE {conditions};"
 
@@ -686,79 +2123,437 @@ def get_undelivered_strings(
     ))
 
 
+def get_archive_path(year: int, archive_dir: Path = ARCHIVE_DIR) -> Path:
+    """get the path of the archive for the logs of a year"""
+
+    return archive_dir / f"{ARCHIVE_PREFIX}{year}.sqlite"
+
+
+def get_archive_paths(start_year: int | None = None, end_year: int | None = None, archive_dir: Path = ARCHIVE_DIR) -> list[Path]:
+    """get the paths of the archives of every year in a range (bounds inclusive, either of which may be left open), in order of year"""
+
+    archives = []
+
+    for path in archive_dir.glob(f"{ARCHIVE_PREFIX}*.sqlite"):
+        year = path.stem.removeprefix(ARCHIVE_PREFIX)
+
+        if year.isdigit() and (start_year is None or int(year) >= start_year) and (end_year is None or int(year) <= end_year):
+            archives.append((int(year), path))
+
+    return [path for _, path in sorted(archives)]
+
+
+@contextmanager
+def open_archives(start_year: int | None = None, end_year: int | None = None, archive_dir: Path = ARCHIVE_DIR) -> Generator[list[Connection], None, None]:
+    """open a read-only connection to the archive of every year in a range (see `get_archive_paths`), and close them afterwards
+    - each archive gets its own connection instead of being attached to the main one, since SQLite can only attach a few DBs at a time"""
+
+    archives = []
+
+    try:
+        for path in get_archive_paths(start_year, end_year, archive_dir):
+            archives.append(connect_to_DB(path, read_only=True))
+
+        yield archives
+
+    finally:
+        for archive in archives:
+            archive.close()
+
+
+def archive_logs(connection: Connection, year: int, archive_dir: Path = ARCHIVE_DIR, profile: str | None = None) -> int:
+    """move the logs (and their costs) of a year out of the main DB, into the archive for that year
+    - only years before the current one can be archived, since logs may still be added to the current one
+    - the archive is attached to the main DB, so that the logs are moved with a few statements in a single transaction
+    - logs keep their IDs, and ones already in the archive are skipped, so archiving a year again moves any logs added to it since
+    - the archive is created with the given performance profile (see `connect_to_DB`), and only if there are logs to move
+    - this must not be called inside a transaction, since SQLite cannot attach a DB inside one
+    - returns the number of logs moved"""
+
+    validate_month_and_year(year=year)
+
+    if year >= date.today().year:
+        raise npbc_exceptions.InvalidInput("Only years before the current year can be archived.")
+
+    if not connection.execute("SELECT EXISTS (SELECT 1 FROM logs WHERE year = ?);", (year,)).fetchone()[0]:
+        return 0
+
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    archive_path = get_archive_path(year, archive_dir)
+
+    # create the archive, if it doesn't exist
+    archive = connect_to_DB(archive_path, profile)
+    archive.executescript(ARCHIVE_SCHEMA)
+    archive.close()
+
+    connection.execute("ATTACH DATABASE ? AS archive;", (str(archive_path),))
+
+    try:
+        with transaction(connection, "archive_logs"):
+            connection.execute(
+                """
+                    INSERT OR IGNORE INTO archive.logs (log_id, paper_id, timestamp, month, year, undelivered_mask)
+                    SELECT log_id, paper_id, timestamp, month, year, undelivered_mask FROM main.logs WHERE year = ?;
+                """,
+                (year,)
+            )
+
+            connection.execute(
+                """
+                    INSERT OR IGNORE INTO archive.cost_logs (cost_log_id, log_id, cost)
+                    SELECT cost_logs.cost_log_id, cost_logs.log_id, cost_logs.cost
+                    FROM main.cost_logs
+                    INNER JOIN main.logs ON logs.log_id = cost_logs.log_id
+                    WHERE logs.year = ?;
+                """,
+                (year,)
+            )
+
+            connection.execute("DELETE FROM main.cost_logs WHERE log_id IN (SELECT log_id FROM main.logs WHERE year = ?);", (year,))
+            moved = connection.execute("DELETE FROM main.logs WHERE year = ?;", (year,)).rowcount
+
+    finally:
+        connection.execute("DETACH DATABASE archive;")
+
+    return moved
+
+
+def get_rows(connection: Connection, query: str, values: tuple, chunk_size: int = LOG_FETCH_SIZE) -> Generator[tuple, None, None]:
+    """stream the rows of a query, fetching a chunk of rows from the DB at a time"""
+
+    cursor = connection.execute(query, values)
+
+    while rows := cursor.fetchmany(chunk_size):
+        yield from rows
+
+
 def get_logged_data(
     connection: Connection,
     query_paper_id: int | None = None,
     query_log_id: int | None = None,
     query_month: int | None = None,
     query_year: int | None = None,
-    query_timestamp: date | None = None
-) -> Generator[tuple[int, int, int, int, str, str | float], None, None]:
+    query_timestamp: datetime | None = None,
+    query_since: datetime | None = None,
+    query_until: datetime | None = None,
+    expand_dates: bool = True,
+    archive_dir: Path = ARCHIVE_DIR
+) -> Generator[tuple[int, int, int, str, str | float | int], None, None]:
     """get logged data
     - the user may specify as parameters many as they want
-    - available parameters: paper_id, log_id, month, year, timestamp
+    - available parameters: paper_id, log_id, month, year, timestamp, and a range of timestamps (since and/or until, bounds inclusive)
     - yields: tuples containing the following fields:
-      log_id, paper_id, month, year, timestamp, date | cost."""
-
-    # initialize parameters for the WHERE clause of the SQL query
-    parameters = []
+      paper_id, month, year, timestamp, date | cost.
+    - rows are yielded log by log (in order of log ID): first the undelivered dates of the log, then its cost
+    - undelivered dates are stored as a day bitmask for each log, and are only expanded to dates (YYYY-MM-DD) as they are yielded
+    - if dates are not expanded, each log with undelivered dates yields a single row with the (integer) day bitmask in place of a date
+    - archived logs are included, but only the archive of the given year is read if a year is given"""
+
+    # initialize conditions for the WHERE clause of the SQL query
+    conditions = []
     values = ()
 
     # check each parameter and add it to the WHERE clause if it is given
     if query_paper_id:
-        parameters.append("paper_id")
+        conditions.append("logs.paper_id = ?")
         values += (query_paper_id,)
 
     if query_log_id:
-        parameters.append("log_id")
+        conditions.append("logs.log_id = ?")
         values += (query_log_id,)
 
     if query_month:
-        parameters.append("month")
+        conditions.append("logs.month = ?")
         values += (query_month,)
 
     if query_year:
-        parameters.append("year")
+        conditions.append("logs.year = ?")
         values += (query_year,)
 
     if query_timestamp:
-        parameters.append("timestamp")
-        values += (query_timestamp.strftime(r'%d/%m/%Y %I:%M:%S %p'),)
+        conditions.append("logs.timestamp = ?")
+        values += (query_timestamp.strftime(TIMESTAMP_FORMAT),)
 
-    # generate the SQL query
+    # timestamps sort in order of time, so a range of them is a range scan of the index on them
+    if query_since:
+        conditions.append("logs.timestamp >= ?")
+        values += (query_since.strftime(TIMESTAMP_FORMAT),)
+
+    if query_until:
+        conditions.append("logs.timestamp <= ?")
+        values += (query_until.strftime(TIMESTAMP_FORMAT),)
+
+    # generate the SQL query, filtering the logs first and joining their costs to them
     logs_base_query = """
-        SELECT log_id, paper_id, timestamp, month, year
+        SELECT logs.log_id, logs.paper_id, logs.month, logs.year, logs.timestamp, logs.undelivered_mask, cost_logs.cost
         FROM logs
-        ORDER BY log_id, paper_id   
+        LEFT JOIN cost_logs ON cost_logs.log_id = logs.log_id
     """
 
-    if parameters:
-        conditions = ' AND '.join(
-            f"{parameter} = ?"
-            for parameter in parameters
-        )
+    # with a range of timestamps, SQLite would rather scan every log in order of ID than sort the ones it finds through the index
+    # the unary plus stops the ID order from being used, so the range is scanned through the index instead
+    order = "+logs.log_id" if query_since or query_until else "logs.log_id"
 
-        logs_query = f"{logs_base_query} WHERE {conditions};"
+    if conditions:
+        logs_query = f"{logs_base_query} WHERE {' AND '.join(conditions)} ORDER BY {order};"
 
     else:
-        logs_query = f"{logs_base_query};"
+        logs_query = f"{logs_base_query} ORDER BY {order};"
 
-    dates_query = "SELECT log_id, date_not_delivered FROM undelivered_dates_logs;"
-    costs_query = "SELECT log_id, cost FROM cost_logs;"
+    with open_archives(query_year or None, query_year or None, archive_dir) as archives:
+        previous_log_id = None
 
-    logs = {
-        log_id: [paper_id, month, year, timestamp]
-        for log_id, paper_id, timestamp, month, year in connection.execute(logs_query, values).fetchall()
-    }
+        # stream the matching rows of the main DB and each archive in chunks, so memory does not grow with the number of logs
+        # each of them is already in order of log ID, so they only need to be merged (if there is more than one)
+        streams = [get_rows(source, logs_query, values) for source in (connection, *archives)]
+        rows = merge(*streams, key=lambda row: row[0]) if len(streams) > 1 else streams[0]
+
+        for log_id, paper_id, month, year, timestamp, undelivered_mask, cost in rows:
+
+            # the dates of a log are only yielded once, even if it has more than one cost
+            if log_id != previous_log_id and undelivered_mask:
+                if expand_dates:
+                    for date_undelivered in get_date_strings_from_mask(month, year, undelivered_mask):
+                        yield (paper_id, month, year, timestamp, date_undelivered)
+
+                else:
+                    yield (paper_id, month, year, timestamp, undelivered_mask)
+
+            if cost is not None:
+                yield (paper_id, month, year, timestamp, float(cost))
+
+            previous_log_id = log_id
+
+
+def get_export_query(
+    kind: str,
+    paper_id: int | None = None,
+    start_month: int | None = None,
+    start_year: int | None = None,
+    end_month: int | None = None,
+    end_year: int | None = None
+) -> tuple[str, tuple]:
+    """get the SQL query (and its values) for the rows of an export
+    - logs (and dates) can be filtered by paper, and by a range of months (bounds inclusive, either of which may be left open)
+    - papers can only be filtered by paper
+    - dates are selected as the day bitmask of each log, to be expanded as they are read"""
+
+    conditions = []
+    values = ()
+
+    if paper_id:
+        conditions.append(f"{'papers' if kind == 'papers' else 'logs'}.paper_id = ?")
+        values += (paper_id,)
+
+    if kind == 'papers':
+        query = f"SELECT paper_id, name, {', '.join(COST_COLUMNS)}, delivery_mask FROM papers"
+        order = "papers.paper_id"
+
+    else:
+        if start_month and start_year:
+            conditions.append("(logs.year, logs.month) >= (?, ?)")
+            values += (start_year, start_month)
+
+        if end_month and end_year:
+            conditions.append("(logs.year, logs.month) <= (?, ?)")
+            values += (end_year, end_month)
+
+        if kind == 'logs':
+            query = """
+                SELECT logs.log_id, logs.paper_id, logs.month, logs.year, logs.timestamp, cost_logs.cost, logs.undelivered_mask
+                FROM logs
+                LEFT JOIN cost_logs ON cost_logs.log_id = logs.log_id
+            """
+
+        else:
+            query = "SELECT logs.log_id, logs.paper_id, logs.month, logs.year, logs.undelivered_mask FROM logs"
+            conditions.append("logs.undelivered_mask != 0")
+
+        order = "logs.log_id"
+
+    if conditions:
+        query = f"{query} WHERE {' AND '.join(conditions)}"
+
+    return f"{query} ORDER BY {order}", values
+
+
+def get_export_chunks(sources: Iterable[Connection], kind: str, query: str, values: tuple, chunk_size: int = LOG_FETCH_SIZE) -> Generator[list[tuple], None, None]:
+    """stream the rows of an export in chunks, fetching a chunk of rows from each source (the main DB, and any archives) at a time
+    - the rows of every source are already in order of their first column (a log or paper ID), so they are merged in that order
+    - the day bitmask of each log is expanded to one row per date for date exports, so those chunks may be larger"""
+
+    streams = [get_rows(source, query, values, chunk_size) for source in sources]
+
+    # with a single source, there is nothing to merge
+    rows = merge(*streams, key=lambda row: row[0]) if len(streams) > 1 else streams[0]
+
+    for chunk in get_batches(rows, chunk_size):
+        if kind == 'dates':
+            yield [
+                (log_id, paper_id, date_undelivered)
+                for log_id, paper_id, month, year, undelivered_mask in chunk
+                for date_undelivered in get_date_strings_from_mask(month, year, undelivered_mask)
+            ]
+
+        else:
+            yield chunk
+
+
+def get_export_dtype(connection: Connection, kind: str) -> numpy.dtype:
+    """get the NumPy (structured) type of the rows of an export"""
+
+    columns = []
+
+    for name, column_type in EXPORT_COLUMNS[kind]:
+
+        # strings without a width are as wide as the longest one in the DB
+        if column_type == 'U':
+            column_type = f"U{connection.execute(f'SELECT MAX(LENGTH({name})) FROM papers;').fetchone()[0] or 1}"
+
+        columns.append((name, column_type))
+
+    return numpy.dtype(columns)
+
+
+def write_export_to_npy(
+    connection: Connection,
+    sources: list[Connection],
+    kind: str,
+    query: str,
+    values: tuple,
+    paths: dict[str | None, Path],
+    chunk_size: int
+) -> int:
+    """write the rows of an export to .npy files, a chunk at a time
+    - the number of rows is counted first, so that the header of each file can be written before its data
+    - with a path for `None`, all the columns are written to it as one structured array
+    - otherwise, each column is written as a plain array to the path for its name
+    - returns the number of rows written"""
+
+    dtype = get_export_dtype(connection, kind)
+
+    # each log has as many dates as there are bits set in its bitmask
+    if kind == 'dates':
+        count = sum(
+            mask.bit_count()
+            for source in sources
+            for (mask,) in source.execute(f"SELECT undelivered_mask FROM ({query});", values)
+        )
+
+    else:
+        count = sum(
+            source.execute(f"SELECT COUNT(*) FROM ({query});", values).fetchone()[0]
+            for source in sources
+        )
+
+    written = 0
+
+    with ExitStack() as stack:
+        output_files = {
+            name: stack.enter_context(open(path, 'wb', buffering=EXPORT_BUFFER_SIZE))
+            for name, path in paths.items()
+        }
+
+        for name, output_file in output_files.items():
+            numpy.lib.format.write_array_header_1_0(output_file, {
+                'descr': numpy.lib.format.dtype_to_descr(dtype if name is None else dtype[name]),
+                'fortran_order': False,
+                'shape': (count,)
+            })
+
+        for chunk in get_export_chunks(sources, kind, query, values, chunk_size):
+            rows = numpy.array(chunk, dtype=dtype)
+
+            for name, output_file in output_files.items():
+                output_file.write((rows if name is None else numpy.ascontiguousarray(rows[name])).tobytes())
+
+            written += len(rows)
+
+    return written
+
+
+def export_records(
+    connection: Connection,
+    kind: str,
+    path: Path | str,
+    paper_id: int | None = None,
+    start_month: int | None = None,
+    start_year: int | None = None,
+    end_month: int | None = None,
+    end_year: int | None = None,
+    chunk_size: int = LOG_FETCH_SIZE,
+    archive_dir: Path = ARCHIVE_DIR
+) -> int:
+    """export logs, undelivered dates, or papers (see EXPORT_COLUMNS) to a file, streaming them a chunk at a time
+    - the format is chosen by the extension of the file: .csv (with a header row), .jsonl/.ndjson, .npy (a structured array), or .npz (an array for each column)
+    - logs and dates can be filtered by paper and by a range of months, and papers by paper (see `get_export_query`)
+    - archived logs are included, but only the archives of the years in the range are read
+    - the rows are read in a single transaction, so the export is consistent even if the DB is written to at the same time
+    - returns the number of rows exported"""
+
+    if kind not in EXPORT_COLUMNS:
+        raise npbc_exceptions.InvalidInput(f"Cannot export {kind}. Only {', '.join(EXPORT_COLUMNS)} can be exported.")
+
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix not in EXPORT_SUFFIXES:
+        raise npbc_exceptions.InvalidInput(f"Cannot export to {path.name}. Only {'/'.join(EXPORT_SUFFIXES)} files are supported.")
+
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be at least 1.")
+
+    query, values = get_export_query(kind, paper_id, start_month, start_year, end_month, end_year)
+    column_names = [name for name, _ in EXPORT_COLUMNS[kind]]
+
+    with ExitStack() as stack:
+        stack.enter_context(transaction(connection, "export_records"))
+
+        # papers are never archived
+        archives = stack.enter_context(open_archives(start_year or None, end_year or None, archive_dir)) if kind != 'papers' else []
+        sources = [connection, *archives]
+
+        if suffix == '.npy':
+            return write_export_to_npy(connection, sources, kind, query, values, {None: path}, chunk_size)
+
+        if suffix == '.npz':
+
+            # each column is written to its own .npy file first, and then stored (uncompressed, as by numpy.savez) in the archive
+            with TemporaryDirectory(dir=path.parent) as temporary_directory:
+                paths = {
+                    name: Path(temporary_directory) / f"{name}.npy"
+                    for name in column_names
+                }
+
+                written = write_export_to_npy(connection, sources, kind, query, values, paths, chunk_size)
+
+                with ZipFile(path, 'w', compression=ZIP_STORED, allowZip64=True) as archive:
+                    for name, column_path in paths.items():
+                        archive.write(column_path, column_path.name)
+
+            return written
+
+        written = 0
+
+        with open(path, 'w', encoding='utf-8', newline='', buffering=EXPORT_BUFFER_SIZE) as output_file:
+            if suffix == '.csv':
+                writer = csv_writer(output_file)
+                writer.writerow(column_names)
+
+                for chunk in get_export_chunks(sources, kind, query, values, chunk_size):
+                    writer.writerows(chunk)
+                    written += len(chunk)
 
-    dates = connection.execute(dates_query).fetchall()
-    costs = connection.execute(costs_query).fetchall()
+            else:
+                for chunk in get_export_chunks(sources, kind, query, values, chunk_size):
+                    output_file.writelines(
+                        dumps(dict(zip(column_names, row))) + '\n'
+                        for row in chunk
+                    )
 
-    for log_id, date_undelivered in dates:
-        yield tuple(logs[log_id] + [date_undelivered])
+                    written += len(chunk)
 
-    for log_id, cost in costs:
-        yield tuple(logs[log_id] + [float(cost)])
+        return written
 
 
 def get_previous_month() -> date:
@@ -0,0 +1,582 @@
+"""
+versioned migrations of the DB schema
+- the schema version of a DB is stored in its `user_version` pragma
+- `MIGRATIONS[n]` upgrades a DB from version n to version n + 1, so the latest version is the number of migrations
+- a new DB is created directly from the schema (`data/schema.sql`) instead, which must always match the result of running every migration (including the version it sets)
+- migrations are frozen: once released, never edit one. add a new migration (and update the schema to match) instead
+- DBs created before versioning are at version 0 whatever their actual schema, so the migrations up to version 5 must be safe to run on a DB that already has their changes
+"""
+
+from collections.abc import Callable, Generator
+from sqlite3 import Connection, complete_statement
+
+
+## version 0 -> 1: the schema as it was before versioning
+BASELINE = """
+CREATE TABLE IF NOT EXISTS papers (
+    paper_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    CONSTRAINT unique_paper_name UNIQUE (name)
+);
+
+CREATE TABLE IF NOT EXISTS cost_and_delivery_data (
+    paper_day_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    paper_id INTEGER NOT NULL REFERENCES papers(paper_id),
+    day_id INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    delivered INTEGER NOT NULL,
+    CONSTRAINT unique_paper_day UNIQUE (paper_id, day_id)
+);
+
+CREATE TABLE IF NOT EXISTS undelivered_strings (
+    string_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    year INTEGER NOT NULL CHECK (year >= 0),
+    month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
+    paper_id INTEGER NOT NULL REFERENCES papers(paper_id),
+    string TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS logs (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    paper_id INTEGER NOT NULL REFERENCES papers(paper_id),
+    timestamp TEXT NOT NULL,
+    month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
+    year INTEGER NOT NULL CHECK (year >= 0),
+    CONSTRAINT unique_log UNIQUE (timestamp, paper_id, month, year)
+);
+
+CREATE TABLE IF NOT EXISTS undelivered_dates_logs (
+    undelivered_dates_log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_id INTEGER NOT NULL REFERENCES logs(log_id),
+    date_not_delivered TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS cost_logs (
+    cost_log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_id INTEGER NOT NULL REFERENCES logs(log_id),
+    cost REAL NOT NULL
+);
+"""
+
+
+## version 1 -> 2: revision counters and the bill cache
+BILL_CACHE = """
+-- revision counters, bumped by the triggers below whenever data that affects a bill changes
+-- paper and cost data affect every month, and are counted under month 0 and year 0
+-- undelivered strings only affect their own month, and are counted under that month and year
+CREATE TABLE IF NOT EXISTS revisions (
+    month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
+    year INTEGER NOT NULL CHECK (year >= 0),
+    revision INTEGER NOT NULL,
+    PRIMARY KEY (month, year)
+);
+
+CREATE TRIGGER IF NOT EXISTS papers_insert_revision AFTER INSERT ON papers
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS papers_delete_revision AFTER DELETE ON papers
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_insert_revision AFTER INSERT ON cost_and_delivery_data
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_update_revision AFTER UPDATE ON cost_and_delivery_data
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_delete_revision AFTER DELETE ON cost_and_delivery_data
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_insert_revision AFTER INSERT ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_update_revision AFTER UPDATE ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_delete_revision AFTER DELETE ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+END;
+
+-- the last bill calculated for each month, and the revisions of the data it was calculated from
+CREATE TABLE IF NOT EXISTS cached_bills (
+    month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
+    year INTEGER NOT NULL CHECK (year >= 0),
+    papers_revision INTEGER NOT NULL,
+    strings_revision INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (month, year)
+);
+
+CREATE TABLE IF NOT EXISTS cached_bill_costs (
+    month INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    paper_id INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    undelivered_mask INTEGER NOT NULL,
+    PRIMARY KEY (month, year, paper_id),
+    FOREIGN KEY (month, year) REFERENCES cached_bills(month, year)
+);
+"""
+
+
+## version 2 -> 3: dirty tracking of papers in cached bills
+# the revision triggers are recreated to mark the papers they affect as dirty, so that every write (through the core or not) is tracked
+DIRTY_PAPERS = """
+-- papers whose cached bills are out of date, marked by the revision triggers whenever their data changes
+-- these are recalculated on their own, instead of recalculating the whole month
+CREATE TABLE IF NOT EXISTS dirty_papers (
+    month INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    paper_id INTEGER NOT NULL,
+    PRIMARY KEY (month, year, paper_id)
+);
+
+DROP TRIGGER IF EXISTS papers_insert_revision;
+DROP TRIGGER IF EXISTS papers_delete_revision;
+DROP TRIGGER IF EXISTS cost_and_delivery_data_insert_revision;
+DROP TRIGGER IF EXISTS cost_and_delivery_data_update_revision;
+DROP TRIGGER IF EXISTS cost_and_delivery_data_delete_revision;
+DROP TRIGGER IF EXISTS undelivered_strings_insert_revision;
+DROP TRIGGER IF EXISTS undelivered_strings_update_revision;
+DROP TRIGGER IF EXISTS undelivered_strings_delete_revision;
+
+CREATE TRIGGER IF NOT EXISTS papers_insert_revision AFTER INSERT ON papers
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills;
+END;
+
+CREATE TRIGGER IF NOT EXISTS papers_delete_revision AFTER DELETE ON papers
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_insert_revision AFTER INSERT ON cost_and_delivery_data
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_update_revision AFTER UPDATE ON cost_and_delivery_data
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_delete_revision AFTER DELETE ON cost_and_delivery_data
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_insert_revision AFTER INSERT ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills
+    WHERE month = NEW.month AND year = NEW.year;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_update_revision AFTER UPDATE ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills
+    WHERE month = OLD.month AND year = OLD.year;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills
+    WHERE month = NEW.month AND year = NEW.year;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_delete_revision AFTER DELETE ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills
+    WHERE month = OLD.month AND year = OLD.year;
+END;
+
+-- dropping a cached bill drops its costs and dirty papers with it
+CREATE TRIGGER IF NOT EXISTS cached_bills_delete AFTER DELETE ON cached_bills
+BEGIN
+    DELETE FROM cached_bill_costs WHERE month = OLD.month AND year = OLD.year;
+    DELETE FROM dirty_papers WHERE month = OLD.month AND year = OLD.year;
+END;
+"""
+
+
+## version 3 -> 4: logged undelivered dates as day bitmasks
+def migrate_undelivered_dates_logs(connection: Connection) -> None:
+    """move logged undelivered dates from the legacy format (one row per date) to day bitmasks stored with each log
+    - adds the `undelivered_mask` column to `logs` if it does not exist yet
+    - this is safe to run repeatedly, and does nothing once there are no legacy rows left"""
+
+    if 'undelivered_mask' not in (row[1] for row in connection.execute("PRAGMA table_info(logs);")):
+        connection.execute("ALTER TABLE logs ADD COLUMN undelivered_mask INTEGER NOT NULL DEFAULT 0;")
+
+    # dates are stored as YYYY-MM-DD, so the day is the last 2 characters
+    # DISTINCT ignores duplicate dates, so that the sum of the bits is the same as OR-ing them
+    connection.execute("""
+        UPDATE logs
+        SET undelivered_mask = undelivered_mask | (
+            SELECT SUM(DISTINCT 1 << (CAST(substr(date_not_delivered, 9, 2) AS INTEGER) - 1))
+            FROM undelivered_dates_logs
+            WHERE undelivered_dates_logs.log_id = logs.log_id
+        )
+        WHERE log_id IN (SELECT log_id FROM undelivered_dates_logs);
+    """)
+
+    connection.execute("DELETE FROM undelivered_dates_logs;")
+
+
+## version 4 -> 5: indexes for hot lookups
+INDEXES = """
+-- indexes for the lookups the core does most often
+-- undelivered strings are read by month, and the string itself is included so that those reads never touch the table
+CREATE INDEX IF NOT EXISTS undelivered_strings_by_month ON undelivered_strings (year, month, paper_id, string);
+CREATE INDEX IF NOT EXISTS logs_by_paper ON logs (paper_id, year, month);
+CREATE INDEX IF NOT EXISTS cost_logs_by_log ON cost_logs (log_id, cost);
+CREATE INDEX IF NOT EXISTS undelivered_dates_logs_by_log ON undelivered_dates_logs (log_id);
+"""
+
+
+## version 5 -> 6: cost and delivery data packed into one row per paper, with a compatibility view in place of the old table
+PACKED_RATES = """
+ALTER TABLE papers ADD COLUMN cost_0 REAL NOT NULL DEFAULT 0;
+ALTER TABLE papers ADD COLUMN cost_1 REAL NOT NULL DEFAULT 0;
+ALTER TABLE papers ADD COLUMN cost_2 REAL NOT NULL DEFAULT 0;
+ALTER TABLE papers ADD COLUMN cost_3 REAL NOT NULL DEFAULT 0;
+ALTER TABLE papers ADD COLUMN cost_4 REAL NOT NULL DEFAULT 0;
+ALTER TABLE papers ADD COLUMN cost_5 REAL NOT NULL DEFAULT 0;
+ALTER TABLE papers ADD COLUMN cost_6 REAL NOT NULL DEFAULT 0;
+ALTER TABLE papers ADD COLUMN delivery_mask INTEGER NOT NULL DEFAULT 0 CHECK (delivery_mask >= 0 AND delivery_mask < 128);
+
+UPDATE papers SET
+    cost_0 = COALESCE((SELECT cost FROM cost_and_delivery_data WHERE cost_and_delivery_data.paper_id = papers.paper_id AND day_id = 0), 0),
+    cost_1 = COALESCE((SELECT cost FROM cost_and_delivery_data WHERE cost_and_delivery_data.paper_id = papers.paper_id AND day_id = 1), 0),
+    cost_2 = COALESCE((SELECT cost FROM cost_and_delivery_data WHERE cost_and_delivery_data.paper_id = papers.paper_id AND day_id = 2), 0),
+    cost_3 = COALESCE((SELECT cost FROM cost_and_delivery_data WHERE cost_and_delivery_data.paper_id = papers.paper_id AND day_id = 3), 0),
+    cost_4 = COALESCE((SELECT cost FROM cost_and_delivery_data WHERE cost_and_delivery_data.paper_id = papers.paper_id AND day_id = 4), 0),
+    cost_5 = COALESCE((SELECT cost FROM cost_and_delivery_data WHERE cost_and_delivery_data.paper_id = papers.paper_id AND day_id = 5), 0),
+    cost_6 = COALESCE((SELECT cost FROM cost_and_delivery_data WHERE cost_and_delivery_data.paper_id = papers.paper_id AND day_id = 6), 0),
+    delivery_mask = COALESCE((SELECT SUM(DISTINCT (delivered != 0) << day_id) FROM cost_and_delivery_data WHERE cost_and_delivery_data.paper_id = papers.paper_id), 0);
+
+DROP TRIGGER IF EXISTS cost_and_delivery_data_insert_revision;
+DROP TRIGGER IF EXISTS cost_and_delivery_data_update_revision;
+DROP TRIGGER IF EXISTS cost_and_delivery_data_delete_revision;
+DROP TABLE cost_and_delivery_data;
+
+-- compatibility view over the packed cost and delivery data of each paper, with one row for each day of each paper (as it was stored before)
+-- writes to the view are applied to `papers` by the triggers below
+CREATE VIEW IF NOT EXISTS cost_and_delivery_data (paper_day_id, paper_id, day_id, cost, delivered) AS
+WITH days (day_id) AS (VALUES (0), (1), (2), (3), (4), (5), (6))
+SELECT
+    papers.paper_id * 7 + days.day_id,
+    papers.paper_id,
+    days.day_id,
+    CASE days.day_id WHEN 0 THEN papers.cost_0 WHEN 1 THEN papers.cost_1 WHEN 2 THEN papers.cost_2 WHEN 3 THEN papers.cost_3 WHEN 4 THEN papers.cost_4 WHEN 5 THEN papers.cost_5 WHEN 6 THEN papers.cost_6 END,
+    (papers.delivery_mask >> days.day_id) & 1
+FROM papers
+CROSS JOIN days;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_insert INSTEAD OF INSERT ON cost_and_delivery_data
+BEGIN
+    UPDATE papers SET
+        cost_0 = CASE NEW.day_id WHEN 0 THEN NEW.cost ELSE cost_0 END,
+        cost_1 = CASE NEW.day_id WHEN 1 THEN NEW.cost ELSE cost_1 END,
+        cost_2 = CASE NEW.day_id WHEN 2 THEN NEW.cost ELSE cost_2 END,
+        cost_3 = CASE NEW.day_id WHEN 3 THEN NEW.cost ELSE cost_3 END,
+        cost_4 = CASE NEW.day_id WHEN 4 THEN NEW.cost ELSE cost_4 END,
+        cost_5 = CASE NEW.day_id WHEN 5 THEN NEW.cost ELSE cost_5 END,
+        cost_6 = CASE NEW.day_id WHEN 6 THEN NEW.cost ELSE cost_6 END,
+        delivery_mask = (delivery_mask & ~(1 << NEW.day_id)) | ((NEW.delivered != 0) << NEW.day_id)
+    WHERE paper_id = NEW.paper_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_update INSTEAD OF UPDATE ON cost_and_delivery_data
+BEGIN
+    UPDATE papers SET
+        cost_0 = CASE NEW.day_id WHEN 0 THEN NEW.cost ELSE cost_0 END,
+        cost_1 = CASE NEW.day_id WHEN 1 THEN NEW.cost ELSE cost_1 END,
+        cost_2 = CASE NEW.day_id WHEN 2 THEN NEW.cost ELSE cost_2 END,
+        cost_3 = CASE NEW.day_id WHEN 3 THEN NEW.cost ELSE cost_3 END,
+        cost_4 = CASE NEW.day_id WHEN 4 THEN NEW.cost ELSE cost_4 END,
+        cost_5 = CASE NEW.day_id WHEN 5 THEN NEW.cost ELSE cost_5 END,
+        cost_6 = CASE NEW.day_id WHEN 6 THEN NEW.cost ELSE cost_6 END,
+        delivery_mask = (delivery_mask & ~(1 << NEW.day_id)) | ((NEW.delivered != 0) << NEW.day_id)
+    WHERE paper_id = NEW.paper_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cost_and_delivery_data_delete INSTEAD OF DELETE ON cost_and_delivery_data
+BEGIN
+    UPDATE papers SET
+        cost_0 = CASE OLD.day_id WHEN 0 THEN 0 ELSE cost_0 END,
+        cost_1 = CASE OLD.day_id WHEN 1 THEN 0 ELSE cost_1 END,
+        cost_2 = CASE OLD.day_id WHEN 2 THEN 0 ELSE cost_2 END,
+        cost_3 = CASE OLD.day_id WHEN 3 THEN 0 ELSE cost_3 END,
+        cost_4 = CASE OLD.day_id WHEN 4 THEN 0 ELSE cost_4 END,
+        cost_5 = CASE OLD.day_id WHEN 5 THEN 0 ELSE cost_5 END,
+        cost_6 = CASE OLD.day_id WHEN 6 THEN 0 ELSE cost_6 END,
+        delivery_mask = delivery_mask & ~(1 << OLD.day_id)
+    WHERE paper_id = OLD.paper_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS papers_update_revision AFTER UPDATE OF cost_0, cost_1, cost_2, cost_3, cost_4, cost_5, cost_6, delivery_mask ON papers
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (0, 0, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills;
+END;
+"""
+
+
+## version 6 -> 7: log timestamps as sortable ISO 8601 strings (YYYY-MM-DD HH:MM:SS), from dd/mm/YYYY hh:mm:ss AM/PM
+# the unique constraint on logs already indexes the timestamp first, so range scans need no other index
+ISO_TIMESTAMPS = """
+UPDATE logs SET timestamp =
+    substr(timestamp, 7, 4) || '-' || substr(timestamp, 4, 2) || '-' || substr(timestamp, 1, 2) || ' ' ||
+    printf('%02d', CAST(substr(timestamp, 12, 2) AS INTEGER) % 12 + CASE substr(timestamp, 21, 2) WHEN 'PM' THEN 12 ELSE 0 END) ||
+    substr(timestamp, 14, 6)
+WHERE timestamp GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9] [AP]M';
+"""
+
+
+## version 7 -> 8: undelivered strings for every paper stored once, with no paper ID
+# SQLite cannot drop a NOT NULL constraint, so the table is rebuilt (keeping its IDs and its AUTOINCREMENT counter), along with its index and triggers
+GLOBAL_STRINGS = """
+CREATE TABLE undelivered_strings_new (
+    string_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    year INTEGER NOT NULL CHECK (year >= 0),
+    month INTEGER NOT NULL CHECK (month >= 0 AND month <= 12),
+    paper_id INTEGER REFERENCES papers(paper_id),
+    string TEXT NOT NULL
+);
+
+INSERT INTO undelivered_strings_new (string_id, year, month, paper_id, string)
+SELECT string_id, year, month, paper_id, string FROM undelivered_strings;
+
+DELETE FROM sqlite_sequence WHERE name = 'undelivered_strings_new';
+
+INSERT INTO sqlite_sequence (name, seq)
+SELECT 'undelivered_strings_new', seq FROM sqlite_sequence WHERE name = 'undelivered_strings';
+
+DROP TABLE undelivered_strings;
+
+ALTER TABLE undelivered_strings_new RENAME TO undelivered_strings;
+
+CREATE INDEX IF NOT EXISTS undelivered_strings_by_month ON undelivered_strings (year, month, paper_id, string);
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_insert_revision AFTER INSERT ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills
+    WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NOT NULL;
+
+    DELETE FROM cached_bills WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_update_revision AFTER UPDATE ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills
+    WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NOT NULL;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills
+    WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NOT NULL;
+
+    DELETE FROM cached_bills WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NULL;
+    DELETE FROM cached_bills WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_delete_revision AFTER DELETE ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills
+    WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NOT NULL;
+
+    DELETE FROM cached_bills WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NULL;
+END;
+"""
+
+
+## version 8 -> 9: the day bitmask of each undelivered string, compiled when it is added
+# existing strings are left uncompiled (NULL), and are parsed as before until they are backfilled
+# the index covers the mask, and backfilling a mask must not make cached bills stale, so the update trigger only watches the other columns
+STORED_MASKS = """
+ALTER TABLE undelivered_strings ADD COLUMN mask INTEGER;
+
+DROP INDEX IF EXISTS undelivered_strings_by_month;
+
+CREATE INDEX IF NOT EXISTS undelivered_strings_by_month ON undelivered_strings (year, month, paper_id, mask, string);
+
+DROP TRIGGER IF EXISTS undelivered_strings_update_revision;
+
+CREATE TRIGGER IF NOT EXISTS undelivered_strings_update_revision AFTER UPDATE OF year, month, paper_id, string ON undelivered_strings
+BEGIN
+    INSERT INTO revisions (month, year, revision) VALUES (OLD.month, OLD.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT INTO revisions (month, year, revision) VALUES (NEW.month, NEW.year, 1)
+    ON CONFLICT (month, year) DO UPDATE SET revision = revision + 1;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, OLD.paper_id FROM cached_bills
+    WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NOT NULL;
+
+    INSERT OR IGNORE INTO dirty_papers (month, year, paper_id)
+    SELECT month, year, NEW.paper_id FROM cached_bills
+    WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NOT NULL;
+
+    DELETE FROM cached_bills WHERE month = OLD.month AND year = OLD.year AND OLD.paper_id IS NULL;
+    DELETE FROM cached_bills WHERE month = NEW.month AND year = NEW.year AND NEW.paper_id IS NULL;
+END;
+"""
+
+
+## every migration, in order
+MIGRATIONS: tuple[str | Callable[[Connection], None], ...] = (
+    BASELINE,
+    BILL_CACHE,
+    DIRTY_PAPERS,
+    migrate_undelivered_dates_logs,
+    INDEXES,
+    PACKED_RATES,
+    ISO_TIMESTAMPS,
+    GLOBAL_STRINGS,
+    STORED_MASKS
+)
+
+## the latest version of the schema
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_statements(script: str) -> Generator[str, None, None]:
+    """split an SQL script into its statements
+    - statements may span lines, and may contain semicolons themselves (such as triggers)
+    - unlike `executescript`, this lets a script run inside a transaction that is already open"""
+
+    statement = ''
+
+    for line in script.splitlines(keepends=True):
+        statement += line
+
+        if complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+
+
+def run_script(connection: Connection, script: str) -> None:
+    """run each statement of an SQL script, inside the current transaction"""
+
+    for statement in get_statements(script):
+        connection.execute(statement)
+
+
+def get_schema_version(connection: Connection) -> int:
+    """get the schema version of a DB (0 for a new DB, or one created before versioning)"""
+
+    return connection.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def migrate(connection: Connection, schema: str) -> int:
+    """bring the schema of a DB up to the latest version
+    - a new (empty) DB is created from the given schema, and an existing one is migrated from its version
+    - everything happens in one transaction, holding an exclusive lock on the DB file
+    - processes that set up the DB at the same time wait for the lock, and then find the DB already up to date
+    - returns the version the DB was at before"""
+
+    connection.execute("BEGIN EXCLUSIVE;")
+
+    try:
+        version = get_schema_version(connection)
+
+        if version < SCHEMA_VERSION:
+            if version == 0 and not connection.execute("SELECT EXISTS (SELECT 1 FROM sqlite_master);").fetchone()[0]:
+                run_script(connection, schema)
+
+            else:
+                for migration in MIGRATIONS[version:]:
+                    if isinstance(migration, str):
+                        run_script(connection, migration)
+
+                    else:
+                        migration(connection)
+
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+        connection.commit()
+
+    except BaseException:
+        connection.rollback()
+        raise
+
+    return version
@@ -20,7 +20,7 @@ NUMBER_MATCH_REGEX = compile_regex(r'^[\d]{1,2}?$')
 RANGE_MATCH_REGEX = compile_regex(r'^\d{1,2} *- *\d{1,2}$')
 
 # match for weekday name. day must appear as "daynames" (example = "mondays"). all lowercase.
-DAYS_MATCH_REGEX = compile_regex(f"^{'|'.join(map(lambda x: x.lower() + 's', WEEKDAY_NAMES_ITERABLE))}$")
+DAYS_MATCH_REGEX = compile_regex(f"^({'|'.join(map(lambda x: x.lower() + 's', WEEKDAY_NAMES_ITERABLE))})$")
 
 # match for nth weekday name. day must appear as "n-dayname" (example = "1-monday"). all lowercase. must be one digit.
 N_DAY_MATCH_REGEX = compile_regex(f"^\\d *- *({'|'.join(map(lambda x: x.lower(), WEEKDAY_NAMES_ITERABLE))})$")
@@ -28,6 +28,18 @@ N_DAY_MATCH_REGEX = compile_regex(f"^\\d *- *({'|'.join(map(lambda x: x.lower(),
 # match for the text "all" in any case.
 ALL_MATCH_REGEX = compile_regex(r'^all$', IGNORECASE)
 
+# match for any one undelivered string, in a single pass. combines the NUMBER, RANGE, DAYS, N_DAY and ALL patterns above.
+# the outer named group identifies which pattern matched (use `match.lastgroup`), and the inner named groups capture its operands.
+UNDELIVERED_STRING_MATCH_REGEX = compile_regex(
+    r'^(?:'
+    r'(?P<number>(?P<day>\d{1,2}))'
+    r'|(?P<range>(?P<start>\d{1,2}) *- *(?P<end>\d{1,2}))'
+    f"|(?P<weekday>(?P<weekday_name>{'|'.join(map(lambda x: x.lower(), WEEKDAY_NAMES_ITERABLE))})s)"
+    f"|(?P<nth_weekday>(?P<n>\\d) *- *(?P<nth_weekday_name>{'|'.join(map(lambda x: x.lower(), WEEKDAY_NAMES_ITERABLE))}))"
+    r'|(?P<all>(?i:all))'
+    r')$'
+)
+
 # match for seven values, each of which must be a 'Y' or an 'N'. there are no delimiters.
 DELIVERY_MATCH_REGEX = compile_regex(r'^[YN]{7}$')
 
@@ -5,7 +5,7 @@ test data-independent functions from the core
 
 from datetime import date
 
-from numpy import array
+from numpy import array, array_equal
 from pytest import raises
 
 import npbc_core
@@ -20,6 +20,29 @@ def test_get_number_of_each_weekday():
     assert tuple(npbc_core.get_number_of_each_weekday(12, 1954)) == (4, 4, 5, 5, 5, 4, 4)
 
 
+def test_get_month_context():
+    context = npbc_core.get_month_context(5, 2017)
+
+    assert context.number_of_days == 31
+    assert context.first_weekday == 0
+    assert context.number_of_each_weekday == (5, 5, 5, 4, 4, 4, 4)
+    assert context.nth_weekday_days[0] == (1, 8, 15, 22, 29)
+    assert context.nth_weekday_days[6] == (7, 14, 21, 28)
+    assert context.weekday_masks[0] == sum(1 << (day - 1) for day in (1, 8, 15, 22, 29))
+    assert context.all_mask == (1 << 31) - 1
+    assert context.weekday_of_each_day.tolist()[:8] == [0, 1, 2, 3, 4, 5, 6, 0]
+    assert context.weekday_matrix.shape == (31, 7)
+    assert context.weekday_matrix.sum(axis=0).tolist() == list(context.number_of_each_weekday)
+
+    # the context is computed once and shared
+    hits = npbc_core.get_month_context.cache_info().hits
+    assert npbc_core.get_month_context(5, 2017) is context
+    assert npbc_core.get_month_context.cache_info().hits == hits + 1
+
+    with raises(ValueError):
+        context.weekday_of_each_day[0] = 1
+
+
 def test_validate_undelivered_string():
     with raises(InvalidUndeliveredString):
         npbc_core.validate_undelivered_string("a")
@@ -46,7 +69,6 @@ def test_validate_undelivered_string():
     npbc_core.validate_undelivered_string("1","2","3-9","11","12","13-19","21","22","23-29","31")
     npbc_core.validate_undelivered_string("1","2","3","4","5","6","7","8","9")
     npbc_core.validate_undelivered_string("mondays")
-    npbc_core.validate_undelivered_string("mondays,tuesdays")
     npbc_core.validate_undelivered_string("mondays","tuesdays","wednesdays")
     npbc_core.validate_undelivered_string("mondays","5-21")
     npbc_core.validate_undelivered_string("mondays","5-21","tuesdays","5-21")
@@ -59,6 +81,35 @@ def test_validate_undelivered_string():
     npbc_core.validate_undelivered_string("aLL")
     npbc_core.validate_undelivered_string("ALL")
 
+    # a weekday name must make up the whole string
+    with raises(InvalidUndeliveredString):
+        npbc_core.validate_undelivered_string("mondays,tuesdays")
+
+    with raises(InvalidUndeliveredString):
+        npbc_core.validate_undelivered_string("tuesdaysx")
+
+
+def test_tokenize_undelivered_string():
+    assert npbc_core.tokenize_undelivered_string("5") == ("number", (5,))
+    assert npbc_core.tokenize_undelivered_string("31") == ("number", (31,))
+    assert npbc_core.tokenize_undelivered_string("5-17") == ("range", (5, 17))
+    assert npbc_core.tokenize_undelivered_string("5 - 17") == ("range", (5, 17))
+    assert npbc_core.tokenize_undelivered_string("mondays") == ("weekday", (0,))
+    assert npbc_core.tokenize_undelivered_string("sundays") == ("weekday", (6,))
+    assert npbc_core.tokenize_undelivered_string("2-wednesday") == ("nth_weekday", (2, 2))
+    assert npbc_core.tokenize_undelivered_string("2 -wednesday") == ("nth_weekday", (2, 2))
+    assert npbc_core.tokenize_undelivered_string("all") == ("all", ())
+    assert npbc_core.tokenize_undelivered_string("aLl") == ("all", ())
+
+    assert npbc_core.validate_undelivered_string("5", "", "mondays") == (("number", (5,)), ("weekday", (0,)))
+
+    for string in ("", "a", "monday", "1-mondays", "1monday", "1 monday", "monday-1", "111", "11-tuesday", "alls"):
+        with raises(InvalidUndeliveredString):
+            npbc_core.tokenize_undelivered_string(string)
+
+    # tokens can be parsed directly, without matching the string again
+    assert npbc_core.parse_undelivered_strings_to_mask(5, 2017, *npbc_core.validate_undelivered_string("1-2", "2-monday")) == 0b10000011
+
 
 def test_undelivered_string_parsing():
     MONTH = 5
@@ -179,6 +230,101 @@ def test_undelivered_string_parsing():
     ))
 
 
+def test_undelivered_string_parsing_to_mask():
+    MONTH = 5
+    YEAR = 2017
+
+    assert npbc_core.parse_undelivered_strings_to_mask(MONTH, YEAR, '') == 0
+    assert npbc_core.parse_undelivered_strings_to_mask(MONTH, YEAR, '1') == 0b1
+    assert npbc_core.parse_undelivered_strings_to_mask(MONTH, YEAR, '1-2') == 0b11
+    assert npbc_core.parse_undelivered_strings_to_mask(MONTH, YEAR, '5-7', '6', '9') == 0b101110000
+    assert npbc_core.parse_undelivered_strings_to_mask(MONTH, YEAR, 'mondays') == sum(1 << (day - 1) for day in (1, 8, 15, 22, 29))
+    assert npbc_core.parse_undelivered_strings_to_mask(MONTH, YEAR, '2-monday', '3-wednesday') == (1 << 7) | (1 << 16)
+    assert npbc_core.parse_undelivered_strings_to_mask(MONTH, YEAR, 'all') == (1 << 31) - 1
+    assert npbc_core.parse_undelivered_strings_to_mask(2, 2022, 'all') == (1 << 28) - 1
+
+    # invalid dates for the month are not counted
+    assert npbc_core.parse_undelivered_strings_to_mask(2, 2022, '30', '3') == 0b100
+    assert npbc_core.parse_undelivered_strings_to_mask(2, 2022, '5-monday') == 0
+
+    with raises(InvalidUndeliveredString):
+        npbc_core.parse_undelivered_string_to_mask(2, 2022, '29')
+
+    with raises(InvalidUndeliveredString):
+        npbc_core.parse_undelivered_string_to_mask(2, 2022, '5-monday')
+
+
+def test_parse_cache():
+    npbc_core.configure_parse_cache(2)
+
+    assert npbc_core.normalize_undelivered_string("5 - 7") == "5-7"
+    assert npbc_core.normalize_undelivered_string("2 -monday") == "2-monday"
+    assert npbc_core.normalize_undelivered_string("ALL") == "all"
+    assert npbc_core.normalize_undelivered_string("mondays") == "mondays"
+
+    assert npbc_core.get_undelivered_string_mask(5, 2017, "5-7") == 0b1110000
+    assert npbc_core.get_undelivered_string_mask(5, 2017, "5 - 7") == 0b1110000
+    assert npbc_core.get_undelivered_string_mask(5, 2017, "all") == (1 << 31) - 1
+    assert npbc_core.get_undelivered_string_mask(5, 2017, "ALL") == (1 << 31) - 1
+    assert npbc_core.get_parse_cache_info()[:2] == (2, 2)
+
+    # the same string in a different month is a different entry
+    assert npbc_core.get_undelivered_string_mask(2, 2022, "all") == (1 << 28) - 1
+    assert npbc_core.get_parse_cache_info()[:2] == (2, 3)
+
+    # the cache is bounded, so the least recently used entry ("5-7" in May 2017) was evicted
+    assert npbc_core.get_parse_cache_info().currsize == 2
+    npbc_core.get_undelivered_string_mask(5, 2017, "5-7")
+    assert npbc_core.get_parse_cache_info()[:2] == (2, 4)
+
+    with raises(InvalidUndeliveredString):
+        npbc_core.get_undelivered_string_mask(2, 2022, "30")
+
+    # batch parsing shares the mask of each distinct string among papers
+    npbc_core.clear_parse_cache()
+    assert npbc_core.get_parse_cache_info()[:2] == (0, 0)
+
+    assert npbc_core.parse_undelivered_strings_of_papers(5, 2017, {
+        1: ["sundays", "1"],
+        2: ["sundays"],
+        3: ["1", "sundays", ""],
+        4: []
+    }) == {
+        1: npbc_core.get_weekday_masks(5, 2017)[6] | 1,
+        2: npbc_core.get_weekday_masks(5, 2017)[6],
+        3: npbc_core.get_weekday_masks(5, 2017)[6] | 1,
+        4: 0
+    }
+
+    assert npbc_core.get_parse_cache_info()[:2] == (0, 2)
+
+    npbc_core.configure_parse_cache()
+
+
+def test_day_masks():
+    assert npbc_core.get_weekday_masks(5, 2017)[0] == sum(1 << (day - 1) for day in (1, 8, 15, 22, 29))
+    assert sum(npbc_core.get_weekday_masks(5, 2017)) == (1 << 31) - 1
+
+    for month, year in ((1, 2022), (2, 2022), (2, 2020), (12, 1954)):
+        assert tuple(mask.bit_count() for mask in npbc_core.get_weekday_masks(month, year)) == tuple(npbc_core.get_number_of_each_weekday(month, year))
+
+    DATES = set((
+        date(year=2022, month=1, day=1),
+        date(year=2022, month=1, day=17),
+        date(year=2022, month=1, day=31)
+    ))
+
+    assert npbc_core.get_mask_from_dates(DATES) == (1 << 0) | (1 << 16) | (1 << 30)
+    assert npbc_core.get_dates_from_mask(1, 2022, npbc_core.get_mask_from_dates(DATES)) == DATES
+    assert npbc_core.get_dates_from_mask(1, 2022, 0) == set()
+
+    assert npbc_core.get_date_strings_from_mask(1, 2022, npbc_core.get_mask_from_dates(DATES)) == [
+        day.strftime("%Y-%m-%d")
+        for day in sorted(DATES)
+    ]
+    assert npbc_core.get_date_strings_from_mask(1, 2022, 0) == []
+
+
 def test_calculating_cost_of_one_paper():
     DAYS_PER_WEEK = [5, 4, 4, 4, 4, 5, 5]
 
@@ -276,6 +422,147 @@ def test_calculating_cost_of_one_paper():
         *COST_AND_DELIVERY_DATA
     ) == 34
 
+    # the same calculations, with the undelivered dates as day bitmasks
+    assert npbc_core.calculate_cost_of_one_paper(
+        DAYS_PER_WEEK,
+        0,
+        *COST_AND_DELIVERY_DATA,
+        month=1,
+        year=2022
+    ) == 41
+
+    assert npbc_core.calculate_cost_of_one_paper(
+        DAYS_PER_WEEK,
+        0b10,
+        *COST_AND_DELIVERY_DATA,
+        month=1,
+        year=2022
+    ) == 40
+
+    assert npbc_core.calculate_cost_of_one_paper(
+        DAYS_PER_WEEK,
+        0b11100000,
+        *COST_AND_DELIVERY_DATA,
+        month=1,
+        year=2022
+    ) == 34
+
+    with raises(ValueError):
+        npbc_core.calculate_cost_of_one_paper(DAYS_PER_WEEK, 0b10, *COST_AND_DELIVERY_DATA)
+
+
+def test_get_weekday_of_each_day():
+    assert array_equal(npbc_core.get_weekday_of_each_day(1, 2022)[:8], array((5, 6, 0, 1, 2, 3, 4, 5)))
+    assert len(npbc_core.get_weekday_of_each_day(1, 2022)) == 31
+    assert len(npbc_core.get_weekday_of_each_day(2, 2020)) == 29
+    assert len(npbc_core.get_weekday_of_each_day(2, 2022)) == 28
+
+
+def test_calculating_cost_of_each_paper():
+    MONTH = 1
+    YEAR = 2022
+
+    PAPER_IDS = array((1, 2, 3))
+
+    COST_MATRIX = array((
+        (0, 0, 2, 2, 5, 0, 1),
+        (0, 0, 2, 2, 5, 0, 1),
+        (1.1, 2.2, 3.3, 4.4, 5.5, 6.6, 7.7)
+    ))
+
+    DELIVERY_MATRIX = array((
+        (False, False,  True,  True,  True, False,  True),
+        (False, False,  True,  True,  True, False, False),
+        (True, True, True, True, True, True, True)
+    ))
+
+    UNDELIVERED_DATES = {
+        1: set((
+            date(year=YEAR, month=MONTH, day=6),
+            date(year=YEAR, month=MONTH, day=7),
+            date(year=YEAR, month=MONTH, day=8)
+        )),
+        2: set(),
+        3: set((
+            date(year=YEAR, month=MONTH, day=2),
+            date(year=YEAR, month=MONTH, day=31)
+        ))
+    }
+
+    undelivered_matrix = npbc_core.get_undelivered_matrix(PAPER_IDS, UNDELIVERED_DATES, MONTH, YEAR)
+
+    assert undelivered_matrix.shape == (3, 31)
+    assert undelivered_matrix.sum() == 5
+    assert undelivered_matrix[0, 5] and undelivered_matrix[2, 30]
+
+    costs, total = npbc_core.calculate_cost_of_each_paper(MONTH, YEAR, undelivered_matrix, COST_MATRIX, DELIVERY_MATRIX)
+
+    # the results must be identical to calculating each paper on its own
+    expected = [
+        npbc_core.calculate_cost_of_one_paper(
+            list(npbc_core.get_number_of_each_weekday(MONTH, YEAR)),
+            UNDELIVERED_DATES[paper_id],
+            COST_MATRIX[index],
+            DELIVERY_MATRIX[index]
+        )
+        for index, paper_id in enumerate(PAPER_IDS)
+    ]
+
+    assert costs.tolist() == expected
+    assert costs[0] == 34
+    assert costs[1] == 36
+    assert total == sum(expected)
+
+
+def test_get_months_in_range():
+    assert npbc_core.get_months_in_range(11, 2021, 2, 2022) == [(11, 2021), (12, 2021), (1, 2022), (2, 2022)]
+    assert npbc_core.get_months_in_range(5, 2017, 5, 2017) == [(5, 2017)]
+    assert len(npbc_core.get_months_in_range(1, 2020, 12, 2022)) == 36
+    assert npbc_core.get_months_in_range(6, 2022, 5, 2022) == []
+
+
+def test_count_set_bits():
+    assert npbc_core.count_set_bits(array((0, 1, 0b1011, (1 << 31) - 1))).tolist() == [0, 1, 3, 31]
+    assert npbc_core.count_set_bits(array(((0, 1), (3, 7)))).tolist() == [[0, 1], [2, 3]]
+
+
+def test_calculating_cost_of_each_paper_in_range():
+    MONTHS = npbc_core.get_months_in_range(12, 2021, 2, 2022)
+
+    COST_MATRIX = array((
+        (0, 0, 2, 2, 5, 0, 1),
+        (1.1, 2.2, 3.3, 4.4, 5.5, 6.6, 7.7)
+    ))
+
+    DELIVERY_MATRIX = array((
+        (False, False,  True,  True,  True, False,  True),
+        (True, True, True, True, True, True, True)
+    ))
+
+    UNDELIVERED_MASKS = array((
+        (0, 0b11100000, (1 << 28) - 1),
+        (0b101, 1 << 30, 0b1000000)
+    ))
+
+    costs, totals = npbc_core.calculate_cost_of_each_paper_in_range(MONTHS, UNDELIVERED_MASKS, COST_MATRIX, DELIVERY_MATRIX)
+
+    assert costs.shape == (2, 3)
+    assert costs[0, 1] == 34
+    assert costs[0, 2] == 0
+
+    # each month must match calculating that month on its own
+    for column, (month, year) in enumerate(MONTHS):
+        expected, total = npbc_core.calculate_cost_of_each_paper(
+            month,
+            year,
+            npbc_core.get_undelivered_matrix(array((1, 2)), {1: int(UNDELIVERED_MASKS[0, column]), 2: int(UNDELIVERED_MASKS[1, column])}, month, year),
+            COST_MATRIX,
+            DELIVERY_MATRIX
+        )
+
+        assert costs[:, column].tolist() == expected.tolist()
+        assert totals[column] == total
+
 
 def test_validate_month_and_year():
     npbc_core.validate_month_and_year(1, 2020)
@@ -7,17 +7,21 @@ test data-dependent functions from the core
 """
 
 
+from csv import DictReader
 from datetime import date, datetime
+from json import dumps, loads
 from multiprocessing.connection import Connection
 from pathlib import Path
-from sqlite3 import connect
+from sqlite3 import IntegrityError, connect
 from typing import Counter
 
-from pytest import raises
+from numpy import array, array_equal, load
+from pytest import approx, raises
 
 import npbc_cli
 import npbc_core
 import npbc_exceptions
+import npbc_migrations
 
 ACTIVE_DIRECTORY = Path("data")
 DATABASE_PATH = ACTIVE_DIRECTORY / "npbc.sqlite"
@@ -44,6 +48,10 @@ def test_db_creation():
 
     assert DATABASE_PATH.exists()
 
+    connection = connect(DATABASE_PATH)
+    assert npbc_migrations.get_schema_version(connection) == npbc_migrations.SCHEMA_VERSION
+    connection.close()
+
 
 def test_get_papers():
     connection = setup_db()
@@ -76,6 +84,259 @@ def test_get_papers():
     connection.close()
 
 
+def test_get_cost_and_delivery_matrices():
+    connection = setup_db()
+
+    paper_ids, costs, delivered = npbc_core.get_cost_and_delivery_matrices(connection)
+
+    assert array_equal(paper_ids, array([1, 2, 3]))
+    assert costs.shape == delivered.shape == (3, 7)
+
+    assert array_equal(costs, array([
+        [0, 6.4, 0, 0, 0, 7.9, 4],
+        [0, 0, 0, 0, 3.4, 0, 8.4],
+        [2.4, 4.6, 0, 0, 3.4, 4.6, 6]
+    ]))
+
+    assert array_equal(delivered, array([
+        [0, 1, 0, 0, 0, 1, 1],
+        [0, 0, 0, 0, 1, 0, 1],
+        [1, 1, 0, 0, 1, 1, 1]
+    ]))
+
+    connection.close()
+
+
+def test_calculate_cost_of_all_papers():
+    connection = setup_db()
+
+    costs, total, undelivered_dates = npbc_core.calculate_cost_of_all_papers(
+        connection,
+        {1: ['5', '6-12'], 2: ['sundays'], 3: ['2-tuesday']},
+        11,
+        2020
+    )
+
+    assert costs == approx({1: 58.9, 2: 13.6, 3: 87.8})
+    assert total == approx(160.3)
+
+    assert undelivered_dates[1] == set(date(year=2020, month=11, day=day) for day in range(5, 13))
+    assert undelivered_dates[2] == set(date(year=2020, month=11, day=day) for day in (1, 8, 15, 22, 29))
+    assert undelivered_dates[3] == {date(year=2020, month=11, day=10)}
+
+    connection.close()
+
+
+def test_calculate_cost_of_all_papers_in_parallel():
+    connection = setup_db()
+
+    undelivered_strings = {1: ['5', '6-12'], 2: ['sundays'], 3: ['2-tuesday']}
+
+    serial = npbc_core.calculate_cost_of_all_papers(connection, undelivered_strings, 11, 2020)
+
+    for shard_size in (1, 2, 10):
+        assert npbc_core.calculate_cost_of_all_papers(connection, undelivered_strings, 11, 2020, workers=2, shard_size=shard_size) == serial
+
+    with raises(ValueError):
+        npbc_core.calculate_cost_of_all_papers(connection, undelivered_strings, 11, 2020, workers=2, shard_size=0)
+
+    # workers connect with the profile they are given
+    assert npbc_core.calculate_cost_of_all_papers(connection, undelivered_strings, 11, 2020, workers=2, shard_size=1, profile='compatible') == serial
+
+    with raises(npbc_exceptions.InvalidInput):
+        npbc_core.calculate_cost_of_all_papers(connection, undelivered_strings, 11, 2020, workers=2, shard_size=1, profile='unknown')
+
+    connection.close()
+
+
+def test_calculate_cost_of_all_papers_in_range():
+    connection = setup_db()
+
+    assert npbc_core.get_undelivered_strings_in_range(connection, npbc_core.get_months_in_range(10, 2020, 12, 2020)) == {
+        (10, 2020): {3: ['all']},
+        (11, 2020): {1: ['5', '6-12'], 2: ['sundays'], 3: ['2-tuesday']},
+        (12, 2020): {}
+    }
+
+    range_costs = npbc_core.calculate_cost_of_all_papers_in_range(connection, 10, 2020, 12, 2020)
+
+    assert array_equal(range_costs.paper_ids, array([1, 2, 3]))
+    assert range_costs.months == [(10, 2020), (11, 2020), (12, 2020)]
+    assert range_costs.costs.shape == range_costs.undelivered_masks.shape == (3, 3)
+
+    # each month must match calculating that month on its own
+    for column, (month, year) in enumerate(range_costs.months):
+        costs, total, undelivered_dates = npbc_core.calculate_cost_of_all_papers(
+            connection,
+            npbc_core.get_undelivered_strings_in_range(connection, [(month, year)])[(month, year)],
+            month,
+            year
+        )
+
+        assert range_costs.costs[:, column].tolist() == list(costs.values())
+        assert range_costs.totals[column] == total
+        assert [npbc_core.get_mask_from_dates(dates) for dates in undelivered_dates.values()] == range_costs.undelivered_masks[:, column].tolist()
+
+    assert range_costs.costs[2, 0] == 0
+
+    npbc_core.save_results_in_range(connection, range_costs, datetime(year=2022, month=1, day=4, hour=1, minute=5, second=42))
+
+    assert connection.execute("SELECT COUNT(*) FROM logs;").fetchone()[0] == 9
+    assert connection.execute("SELECT COUNT(*) FROM cost_logs;").fetchone()[0] == 9
+    assert connection.execute("SELECT undelivered_mask FROM logs WHERE paper_id = 3 AND month = 10;").fetchone()[0] == (1 << 31) - 1
+    assert sum(1 for row in npbc_core.get_logged_data(connection) if str(row[-1]).startswith('2020-10-')) == 31
+
+    connection.close()
+
+
+def test_transaction():
+    connection = setup_db()
+
+    with raises(npbc_exceptions.PaperAlreadyExists):
+        with npbc_core.transaction(connection):
+            connection.execute("DELETE FROM undelivered_strings;")
+            npbc_core.add_new_paper(connection, 'paper1', [True] * 7, [1] * 7)
+
+    # the failed block was rolled back
+    assert len(npbc_core.get_undelivered_strings(connection)) == 5
+
+    with npbc_core.transaction(connection):
+        connection.execute("DELETE FROM undelivered_strings WHERE string_id = 1;")
+
+    assert len(npbc_core.get_undelivered_strings(connection)) == 4
+
+    connection.close()
+
+
+def test_calculate_bill_with_cache():
+    connection = setup_db()
+
+    def bill(month: int, year: int):
+        return npbc_core.calculate_bill_with_cache(connection, month, year)
+
+    first = bill(11, 2020)
+    assert first[0] == approx({1: 58.9, 2: 13.6, 3: 87.8})
+    assert first[1] == approx(160.3)
+    assert npbc_core.get_cached_bill(connection, 11, 2020) is not None
+
+    # a cache hit returns the same bill
+    assert bill(11, 2020) == first
+
+    # strings of another month do not invalidate the bill
+    october = bill(10, 2020)
+    npbc_core.add_undelivered_string(connection, 10, 2020, 1, '1')
+    assert npbc_core.get_cached_bill(connection, 11, 2020) is not None
+    assert npbc_core.get_cached_bill(connection, 10, 2020) is None
+    assert bill(10, 2020) != october
+
+    # adding a string for the month invalidates the bill
+    npbc_core.add_undelivered_string(connection, 11, 2020, 1, '1')
+    assert npbc_core.get_cached_bill(connection, 11, 2020) is None
+    assert bill(11, 2020)[0][1] == approx(54.9)
+
+    # deleting it brings the original bill back
+    npbc_core.delete_undelivered_string(connection, string='1', paper_id=1, month=11, year=2020)
+    assert npbc_core.get_cached_bill(connection, 11, 2020) is None
+    assert bill(11, 2020) == first
+
+    # editing a paper invalidates every month
+    npbc_core.edit_existing_paper(connection, 2, days_cost=[0, 0, 0, 0, 3.4, 0, 10])
+    assert npbc_core.get_cached_bill(connection, 11, 2020) is None
+    assert npbc_core.get_cached_bill(connection, 10, 2020) is None
+    assert bill(11, 2020)[0][2] == approx(13.6)
+
+    npbc_core.edit_existing_paper(connection, 2, days_cost=[0, 0, 0, 0, 5, 0, 10])
+    assert bill(11, 2020)[0][2] == approx(20)
+
+    # deleting a paper removes it from the bill
+    npbc_core.delete_existing_paper(connection, 2)
+    assert npbc_core.get_cached_bill(connection, 11, 2020) is None
+    assert set(bill(11, 2020)[0]) == {1, 3}
+
+    connection.close()
+
+
+def test_recalculate():
+    connection = setup_db()
+
+    # without a cached bill, nothing can be recalculated
+    assert npbc_core.recalculate(connection, 11, 2020) is None
+
+    npbc_core.calculate_bill_with_cache(connection, 11, 2020)
+    npbc_core.calculate_bill_with_cache(connection, 10, 2020)
+    assert connection.execute("SELECT COUNT(*) FROM dirty_papers;").fetchone()[0] == 0
+
+    # nothing is dirty yet
+    assert npbc_core.recalculate(connection, 11, 2020) is None
+
+    # tamper with the cached cost of a paper that does not change, to check that it is not recalculated
+    connection.execute("UPDATE cached_bill_costs SET cost = 100 WHERE paper_id = 3 AND month = 11 AND year = 2020;")
+
+    npbc_core.add_undelivered_string(connection, 11, 2020, 1, '1')
+    assert set(connection.execute("SELECT paper_id, month, year FROM dirty_papers;")) == {(1, 11, 2020)}
+
+    costs, total, undelivered_masks = npbc_core.recalculate(connection, 11, 2020)
+    assert costs == approx({1: 54.9, 2: 13.6, 3: 100})
+    assert total == approx(160.3 - 4)
+    assert undelivered_masks[1] == 0b111111110001
+    assert connection.execute("SELECT COUNT(*) FROM dirty_papers;").fetchone()[0] == 0
+
+    # the updated bill is now cached
+    assert npbc_core.get_cached_bill(connection, 11, 2020) == (costs, total, undelivered_masks)
+
+    # paper-level changes mark the paper in every cached month
+    npbc_core.edit_existing_paper(connection, 2, name='paper4')
+    assert connection.execute("SELECT COUNT(*) FROM dirty_papers;").fetchone()[0] == 0
+
+    npbc_core.edit_existing_paper(connection, 2, days_delivered=[False] * 7)
+    assert set(connection.execute("SELECT paper_id, month, year FROM dirty_papers;")) == {(2, 11, 2020), (2, 10, 2020)}
+
+    npbc_core.delete_existing_paper(connection, 1)
+    npbc_core.delete_undelivered_string(connection, month=10, year=2020)
+    assert set(connection.execute("SELECT paper_id, month, year FROM dirty_papers;")) == {
+        (1, 11, 2020), (1, 10, 2020), (2, 11, 2020), (2, 10, 2020), (3, 10, 2020)
+    }
+
+    costs, total, _ = npbc_core.recalculate(connection, 11, 2020)
+    assert costs == approx({2: 0, 3: 100})
+
+    # the tampered cost was never part of the total
+    assert total == approx(87.8)
+
+    connection.close()
+
+
+def test_recalculate_after_writes_outside_the_core():
+    DATABASE_PATH.unlink(missing_ok=True)
+
+    connection = connect(DATABASE_PATH)
+    connection.executescript(SCHEMA_PATH.read_text())
+
+    npbc_core.add_new_paper(connection, 'a', [True] * 7, [1] * 7)
+    npbc_core.add_new_paper(connection, 'b', [True] * 7, [2] * 7)
+    assert npbc_core.calculate_bill_with_cache(connection, 3, 2022)[1] == 93
+
+    # a write through the compatibility view marks its paper dirty too, so editing another paper does not hide it
+    connection.execute("UPDATE cost_and_delivery_data SET cost = 10 WHERE paper_id = 1;")
+    npbc_core.edit_existing_paper(connection, 2, days_cost=[3] * 7)
+
+    costs, total, _ = npbc_core.calculate_bill_with_cache(connection, 3, 2022)
+    assert costs == {1: 310, 2: 93}
+    assert total == 403
+
+    # so does a raw write to the undelivered strings, of a paper or of every paper
+    connection.execute("INSERT INTO undelivered_strings (month, year, paper_id, string) VALUES (3, 2022, 1, '1');")
+    assert set(connection.execute("SELECT paper_id FROM dirty_papers;")) == {(1,)}
+    assert npbc_core.calculate_bill_with_cache(connection, 3, 2022)[:2] == ({1: 300, 2: 93}, 393)
+
+    connection.execute("INSERT INTO undelivered_strings (month, year, paper_id, string) VALUES (3, 2022, NULL, '2');")
+    assert connection.execute("SELECT COUNT(*) FROM cached_bills;").fetchone()[0] == 0
+    assert connection.execute("SELECT COUNT(*) FROM cached_bill_costs;").fetchone()[0] == 0
+    assert npbc_core.calculate_bill_with_cache(connection, 3, 2022)[:2] == ({1: 290, 2: 90}, 380)
+
+    connection.close()
+
+
 def test_get_undelivered_strings():
     connection = setup_db()
 
@@ -300,11 +561,13 @@ def test_add_string():
     assert Counter(npbc_core.get_undelivered_strings(connection)) == Counter(known_data)
 
     npbc_core.add_undelivered_string(connection, 9, 2017, None, '11')
-    known_data.append((7, 1, 2017, 9, '11'))
-    known_data.append((8, 2, 2017, 9, '11'))
-    known_data.append((9, 3, 2017, 9, '11'))
+    known_data.append((7, None, 2017, 9, '11'))
     assert Counter(npbc_core.get_undelivered_strings(connection)) == Counter(known_data)
 
+    # strings for all papers are stored once, and only matched by their own scope
+    assert npbc_core.get_undelivered_strings(connection, all_papers=True) == ((7, None, 2017, 9, '11'),)
+    assert npbc_core.get_undelivered_strings(connection, paper_id=3, year=2017) == ((6, 3, 2017, 4, 'sundays'),)
+
     connection.close()
 
 
@@ -312,14 +575,14 @@ def test_save_results():
     connection = setup_db()
 
     known_data = (
-        (1, 1, 2020, '04/01/2022 01:05:42 AM', '2020-01-01'),
-        (1, 1, 2020, '04/01/2022 01:05:42 AM', '2020-01-02'),
-        (2, 1, 2020, '04/01/2022 01:05:42 AM', '2020-01-01'),
-        (2, 1, 2020, '04/01/2022 01:05:42 AM', '2020-01-05'),
-        (2, 1, 2020, '04/01/2022 01:05:42 AM', '2020-01-03'),
-        (1, 1, 2020, '04/01/2022 01:05:42 AM', 105.0),
-        (2, 1, 2020, '04/01/2022 01:05:42 AM', 51.0),
-        (3, 1, 2020, '04/01/2022 01:05:42 AM', 647.0)
+        (1, 1, 2020, '2022-01-04 01:05:42', '2020-01-01'),
+        (1, 1, 2020, '2022-01-04 01:05:42', '2020-01-02'),
+        (2, 1, 2020, '2022-01-04 01:05:42', '2020-01-01'),
+        (2, 1, 2020, '2022-01-04 01:05:42', '2020-01-05'),
+        (2, 1, 2020, '2022-01-04 01:05:42', '2020-01-03'),
+        (1, 1, 2020, '2022-01-04 01:05:42', 105.0),
+        (2, 1, 2020, '2022-01-04 01:05:42', 51.0),
+        (3, 1, 2020, '2022-01-04 01:05:42', 647.0)
     )
 
     npbc_core.save_results(
@@ -338,3 +601,690 @@ def test_save_results():
     assert Counter(npbc_core.get_logged_data(connection)) == Counter(known_data)
 
     connection.close()
+
+
+def test_save_results_in_batches():
+    costs = {1: 105, 2: 51, 3: 647}
+    undelivered_dates = {
+        1: set((date(month=1, day=1, year=2020), date(month=1, day=2, year=2020))),
+        2: set((date(month=1, day=1, year=2020), date(month=1, day=5, year=2020), date(month=1, day=3, year=2020))),
+        3: set()
+    }
+    timestamp = datetime(year=2022, month=1, day=4, hour=1, minute=5, second=42)
+
+    connection = setup_db()
+    npbc_core.save_results(connection, costs, undelivered_dates, 1, 2020, timestamp)
+    known_data = Counter(npbc_core.get_logged_data(connection))
+    connection.close()
+
+    for batch_size in (1, 2, 100):
+        connection = setup_db()
+        npbc_core.save_results(connection, costs, undelivered_dates, 1, 2020, timestamp, batch_size=batch_size)
+        assert Counter(npbc_core.get_logged_data(connection)) == known_data
+        connection.close()
+
+    # undelivered dates may also be given as day bitmasks
+    connection = setup_db()
+    npbc_core.save_results(connection, costs, {1: 0b11, 2: 0b10101, 3: 0}, 1, 2020, timestamp, batch_size=2)
+    assert Counter(npbc_core.get_logged_data(connection)) == known_data
+
+    with raises(ValueError):
+        npbc_core.save_results(connection, costs, undelivered_dates, 1, 2020, timestamp, batch_size=0)
+
+    # logging the same timestamp twice is not allowed
+    with raises(IntegrityError):
+        npbc_core.save_results(connection, costs, undelivered_dates, 1, 2020, timestamp, batch_size=2)
+
+    # the failed save did not leave partial logs behind
+    assert Counter(npbc_core.get_logged_data(connection)) == known_data
+
+    connection.close()
+
+
+def test_logged_undelivered_masks():
+    connection = setup_db()
+
+    timestamp = datetime(year=2022, month=1, day=4, hour=1, minute=5, second=42)
+    npbc_core.save_results(connection, {1: 105, 2: 51, 3: 647}, {1: 0b11, 2: 0b10101, 3: 0}, 1, 2020, timestamp)
+
+    # dates are stored as one bitmask per log, not one row per date
+    assert connection.execute("SELECT COUNT(*) FROM undelivered_dates_logs;").fetchone()[0] == 0
+    assert connection.execute("SELECT paper_id, undelivered_mask FROM logs ORDER BY paper_id;").fetchall() == [(1, 0b11), (2, 0b10101), (3, 0)]
+
+    # without expanding them, each log yields its bitmask once
+    assert Counter(npbc_core.get_logged_data(connection, expand_dates=False)) == Counter((
+        (1, 1, 2020, '2022-01-04 01:05:42', 0b11),
+        (2, 1, 2020, '2022-01-04 01:05:42', 0b10101),
+        (1, 1, 2020, '2022-01-04 01:05:42', 105.0),
+        (2, 1, 2020, '2022-01-04 01:05:42', 51.0),
+        (3, 1, 2020, '2022-01-04 01:05:42', 647.0)
+    ))
+
+    connection.close()
+
+
+def test_migrate_undelivered_dates_logs():
+    DATABASE_PATH.unlink(missing_ok=True)
+    connection = connect(DATABASE_PATH)
+
+    # create a DB with the legacy log format, where logs have no bitmask
+    connection.executescript(SCHEMA_PATH.read_text().replace("    undelivered_mask INTEGER NOT NULL DEFAULT 0,\n    CONSTRAINT unique_log", "    CONSTRAINT unique_log"))
+    connection.executescript(TEST_SQL.read_text())
+    assert 'undelivered_mask' not in (row[1] for row in connection.execute("PRAGMA table_info(logs);"))
+
+    connection.execute("INSERT INTO logs (paper_id, month, year, timestamp) VALUES (1, 1, 2020, 'a'), (2, 1, 2020, 'a');")
+    connection.executemany(
+        "INSERT INTO undelivered_dates_logs (log_id, date_not_delivered) VALUES (?, ?);",
+        ((1, '2020-01-01'), (1, '2020-01-02'), (1, '2020-01-02'), (2, '2020-01-31'))
+    )
+    connection.commit()
+
+    npbc_migrations.migrate_undelivered_dates_logs(connection)
+
+    assert connection.execute("SELECT log_id, undelivered_mask FROM logs ORDER BY log_id;").fetchall() == [(1, 0b11), (2, 1 << 30)]
+    assert connection.execute("SELECT COUNT(*) FROM undelivered_dates_logs;").fetchone()[0] == 0
+
+    # running it again changes nothing
+    npbc_migrations.migrate_undelivered_dates_logs(connection)
+    assert connection.execute("SELECT log_id, undelivered_mask FROM logs ORDER BY log_id;").fetchall() == [(1, 0b11), (2, 1 << 30)]
+
+    connection.close()
+
+
+def test_get_logged_data_with_filters():
+    connection = setup_db()
+
+    first_timestamp = datetime(year=2022, month=1, day=4, hour=1, minute=5, second=42)
+    second_timestamp = datetime(year=2022, month=2, day=4, hour=1, minute=5, second=42)
+
+    npbc_core.save_results(connection, {1: 105, 2: 51}, {1: 0b11, 2: 0}, 1, 2020, first_timestamp)
+    npbc_core.save_results(connection, {1: 10, 2: 5}, {1: 0, 2: 0b100}, 2, 2020, second_timestamp)
+
+    assert Counter(npbc_core.get_logged_data(connection, query_paper_id=1)) == Counter((
+        (1, 1, 2020, '2022-01-04 01:05:42', '2020-01-01'),
+        (1, 1, 2020, '2022-01-04 01:05:42', '2020-01-02'),
+        (1, 1, 2020, '2022-01-04 01:05:42', 105.0),
+        (1, 2, 2020, '2022-02-04 01:05:42', 10.0)
+    ))
+
+    assert list(npbc_core.get_logged_data(connection, query_paper_id=2, query_month=2, query_year=2020)) == [
+        (2, 2, 2020, '2022-02-04 01:05:42', '2020-02-03'),
+        (2, 2, 2020, '2022-02-04 01:05:42', 5.0)
+    ]
+
+    assert list(npbc_core.get_logged_data(connection, query_log_id=2)) == [(2, 1, 2020, '2022-01-04 01:05:42', 51.0)]
+    assert len(list(npbc_core.get_logged_data(connection, query_timestamp=second_timestamp))) == 3
+    assert list(npbc_core.get_logged_data(connection, query_year=2021)) == []
+
+    # timestamps can be filtered by range, with both bounds inclusive
+    assert len(list(npbc_core.get_logged_data(connection, query_since=second_timestamp))) == 3
+    assert len(list(npbc_core.get_logged_data(connection, query_until=second_timestamp))) == 7
+    assert list(npbc_core.get_logged_data(connection, query_since=datetime(2022, 1, 5), query_until=datetime(2022, 2, 4), query_paper_id=1)) == []
+    assert list(npbc_core.get_logged_data(connection, query_since=datetime(2022, 1, 5), query_paper_id=1)) == [(1, 2, 2020, '2022-02-04 01:05:42', 10.0)]
+
+    # a date on its own includes the whole day when it is the upper bound
+    assert npbc_cli.extract_timestamp_from_user_input('2022-02-04') == datetime(2022, 2, 4)
+    assert npbc_cli.extract_timestamp_from_user_input('2022-02-04', end_of_day=True) == datetime(2022, 2, 4, 23, 59, 59)
+    assert npbc_cli.extract_timestamp_from_user_input('2022-02-04 01:00:00', end_of_day=True) == datetime(2022, 2, 4, 1)
+    assert npbc_cli.extract_timestamp_from_user_input('04/02/2022 01:05:42 AM', end_of_day=True) == second_timestamp
+
+    assert len(list(npbc_core.get_logged_data(
+        connection,
+        query_since=npbc_cli.extract_timestamp_from_user_input('2022-02-04'),
+        query_until=npbc_cli.extract_timestamp_from_user_input('2022-02-04', end_of_day=True)
+    ))) == 3
+
+    connection.close()
+
+
+def test_queries_use_indexes():
+    connection = setup_db()
+    npbc_core.save_results(connection, {1: 105, 2: 51}, {1: 0b11, 2: 0}, 1, 2020)
+
+    # record every statement the core runs
+    statements = []
+    connection.set_trace_callback(statements.append)
+
+    npbc_core.get_undelivered_strings(connection, month=11, year=2020)
+    npbc_core.get_undelivered_strings(connection, paper_id=1, month=11, year=2020)
+    npbc_core.get_undelivered_strings_in_range(connection, npbc_core.get_months_in_range(10, 2020, 12, 2020))
+    list(npbc_core.get_logged_data(connection, query_paper_id=1))
+    list(npbc_core.get_logged_data(connection, query_paper_id=1, query_month=1, query_year=2020))
+    list(npbc_core.get_logged_data(connection, query_since=datetime(2020, 1, 1), query_until=datetime(2020, 12, 31)))
+    npbc_core.delete_undelivered_string(connection, string='5', paper_id=1, month=11, year=2020)
+
+    connection.set_trace_callback(None)
+
+    indexed_tables = ('undelivered_strings', 'logs', 'cost_logs', 'undelivered_dates_logs')
+    used_indexes = set()
+
+    for statement in statements:
+        if not statement.lstrip().upper().startswith(('SELECT', 'DELETE', 'UPDATE')):
+            continue
+
+        for *_, detail in connection.execute(f"EXPLAIN QUERY PLAN {statement}"):
+            assert not any(detail.startswith(f"SCAN {table}") for table in indexed_tables), (statement, detail)
+
+            if ' INDEX ' in detail:
+                used_indexes.add(detail.split(' INDEX ')[1].split()[0])
+
+    assert {'undelivered_strings_by_month', 'logs_by_paper', 'cost_logs_by_log', 'sqlite_autoindex_logs_1'} <= used_indexes
+
+    connection.close()
+
+
+def get_schema(connection: Connection) -> dict[str, set]:
+    """describe the schema of a DB, ignoring the order of columns (columns added by migrations go at the end)"""
+
+    return {
+        name: set(connection.execute(f"PRAGMA table_info({name});"))
+        if object_type == 'table'
+        else set()
+        for object_type, name in connection.execute("SELECT type, name FROM sqlite_master;")
+    }
+
+
+def test_migrations():
+    # a DB created from the schema is at the latest version
+    fresh = connect(":memory:")
+    assert npbc_migrations.migrate(fresh, SCHEMA_PATH.read_text()) == 0
+    assert npbc_migrations.get_schema_version(fresh) == npbc_migrations.SCHEMA_VERSION
+
+    # so is a DB created by running the schema directly (as the tests do)
+    connection = setup_db()
+    assert npbc_migrations.get_schema_version(connection) == npbc_migrations.SCHEMA_VERSION
+    connection.close()
+
+    # a DB created before versioning (at version 0) is migrated to the same schema, keeping its data
+    DATABASE_PATH.unlink(missing_ok=True)
+    connection = connect(DATABASE_PATH)
+    connection.executescript(npbc_migrations.BASELINE)
+    connection.executescript(TEST_SQL.read_text())
+    connection.commit()
+
+    assert npbc_migrations.migrate(connection, SCHEMA_PATH.read_text()) == 0
+    assert npbc_migrations.get_schema_version(connection) == npbc_migrations.SCHEMA_VERSION
+    assert get_schema(connection) == get_schema(fresh)
+    assert len(npbc_core.get_undelivered_strings(connection)) == 5
+
+    # cost and delivery data is packed into papers, and still readable through the old table's name
+    fresh.executescript(TEST_SQL.read_text())
+
+    for migrated, expected in zip(npbc_core.get_cost_and_delivery_matrices(connection), npbc_core.get_cost_and_delivery_matrices(fresh)):
+        assert array_equal(migrated, expected)
+
+    assert Counter(npbc_core.get_papers(connection)) == Counter(npbc_core.get_papers(fresh))
+
+    connection.close()
+
+    # timestamps logged before version 7 are made sortable
+    DATABASE_PATH.unlink(missing_ok=True)
+    connection = connect(DATABASE_PATH)
+    connection.executescript(npbc_migrations.BASELINE)
+    connection.executescript(TEST_SQL.read_text())
+    connection.execute("""
+        INSERT INTO logs (paper_id, month, year, timestamp) VALUES
+        (1, 1, 2020, '04/01/2022 01:05:42 AM'),
+        (1, 2, 2020, '04/02/2022 12:05:42 PM'),
+        (1, 3, 2020, '31/12/2022 12:00:00 AM'),
+        (1, 4, 2020, '01/01/2023 11:59:59 PM');
+    """)
+    connection.commit()
+
+    npbc_migrations.migrate(connection, SCHEMA_PATH.read_text())
+
+    assert [row[0] for row in connection.execute("SELECT timestamp FROM logs ORDER BY log_id;")] == [
+        '2022-01-04 01:05:42',
+        '2022-02-04 12:05:42',
+        '2022-12-31 00:00:00',
+        '2023-01-01 23:59:59'
+    ]
+
+    # migrating again does nothing
+    assert npbc_migrations.migrate(connection, SCHEMA_PATH.read_text()) == npbc_migrations.SCHEMA_VERSION
+    connection.close()
+
+    # setting up an up-to-date DB does not need the schema at all
+    schema_path = npbc_core.SCHEMA_PATH
+    npbc_core.SCHEMA_PATH = ACTIVE_DIRECTORY / "missing.sql"
+
+    try:
+        assert npbc_core.create_and_setup_DB() == DATABASE_PATH
+
+    finally:
+        npbc_core.SCHEMA_PATH = schema_path
+
+    fresh.close()
+
+
+def test_get_statements():
+    script = """
+        CREATE TABLE a (b INTEGER);
+
+        -- a comment
+        CREATE TRIGGER c AFTER INSERT ON a
+        BEGIN
+            INSERT INTO a VALUES (1);
+            INSERT INTO a VALUES (2);
+        END;
+        INSERT INTO a VALUES (3);
+    """
+
+    statements = list(npbc_migrations.get_statements(script))
+
+    assert len(statements) == 3
+    assert statements[1].startswith("-- a comment")
+    assert statements[1].endswith("END;")
+
+
+def test_connect_to_DB():
+    setup_db().close()
+
+    connection = npbc_core.connect_to_DB(DATABASE_PATH, 'balanced')
+
+    assert connection.execute("PRAGMA journal_mode;").fetchone()[0] == 'wal'
+    assert connection.execute("PRAGMA synchronous;").fetchone()[0] == 1
+    assert connection.execute("PRAGMA temp_store;").fetchone()[0] == 2
+    assert connection.execute("PRAGMA cache_size;").fetchone()[0] == -64 * 1024
+    assert connection.execute("PRAGMA busy_timeout;").fetchone()[0] == 5000
+
+    # readers are not blocked by a writer in WAL mode
+    connection.execute("DELETE FROM undelivered_strings WHERE string_id = 1;")
+    assert connection.in_transaction
+
+    reader = npbc_core.connect_to_DB(DATABASE_PATH, 'balanced', read_only=True)
+    assert len(npbc_core.get_undelivered_strings(reader)) == 5
+    reader.close()
+
+    # workers open their own read-only connections
+    connection.commit()
+    costs, total, _ = npbc_core.calculate_cost_of_all_papers(connection, {}, 11, 2020, workers=2, shard_size=1)
+    assert costs == npbc_core.calculate_cost_of_all_papers(connection, {}, 11, 2020)[0]
+
+    connection.close()
+
+    # the compatible profile keeps SQLite's defaults
+    connection = npbc_core.connect_to_DB(DATABASE_PATH, 'compatible')
+    connection.execute("PRAGMA journal_mode = DELETE;")
+    assert connection.execute("PRAGMA synchronous;").fetchone()[0] == 2
+    connection.close()
+
+    with raises(npbc_exceptions.InvalidInput):
+        npbc_core.connect_to_DB(DATABASE_PATH, 'fastest')
+
+
+def test_packed_rates():
+    connection = setup_db()
+
+    # the test data is written through the compatibility view, into the packed columns
+    assert connection.execute("SELECT cost_1, cost_5, cost_6, delivery_mask FROM papers WHERE paper_id = 1;").fetchone() == (6.4, 7.9, 4, 0b1100010)
+
+    cost, delivered = npbc_core.get_cost_and_delivery_data(1, connection)
+    assert array_equal(cost, array([0, 6.4, 0, 0, 0, 7.9, 4]))
+    assert array_equal(delivered, array([0, 1, 0, 0, 0, 1, 1]))
+    assert len(npbc_core.get_cost_and_delivery_data(10, connection)[0]) == 0
+
+    # writes to the view change the paper (and its revision)
+    revision = npbc_core.get_revisions(connection, 1, 2020)[0]
+
+    connection.execute("UPDATE cost_and_delivery_data SET cost = 5, delivered = 1 WHERE paper_id = 1 AND day_id = 0;")
+    assert connection.execute("SELECT cost_0, delivery_mask FROM papers WHERE paper_id = 1;").fetchone() == (5, 0b1100011)
+
+    connection.execute("DELETE FROM cost_and_delivery_data WHERE paper_id = 1 AND day_id = 6;")
+    assert connection.execute("SELECT cost_6, delivery_mask FROM papers WHERE paper_id = 1;").fetchone() == (0, 0b0100011)
+
+    assert npbc_core.get_revisions(connection, 1, 2020)[0] == revision + 2
+
+    # adding and editing a paper writes one row
+    npbc_core.add_new_paper(connection, 'paper4', [True, False, False, False, False, False, True], [1, 0, 0, 0, 0, 0, 2])
+    assert connection.execute("SELECT cost_0, cost_6, delivery_mask FROM papers WHERE name = 'paper4';").fetchone() == (1, 2, 0b1000001)
+
+    npbc_core.edit_existing_paper(connection, 4, days_delivered=[False] * 6 + [True])
+    assert connection.execute("SELECT cost_0, cost_6, delivery_mask FROM papers WHERE name = 'paper4';").fetchone() == (1, 2, 0b1000000)
+
+    connection.close()
+
+
+def test_get_paper_columns():
+    connection = setup_db()
+
+    paper_columns = npbc_core.get_paper_columns(connection)
+
+    assert array_equal(paper_columns.paper_ids, array([1, 2, 3]))
+    assert paper_columns.names == ('paper1', 'paper2', 'paper3')
+
+    # the columns hold the same data as the rows
+    for paper in npbc_core.get_papers(connection):
+        assert paper_columns.costs[paper.paper_id - 1, paper.day_id] == paper.cost
+        assert paper_columns.delivered[paper.paper_id - 1, paper.day_id] == paper.delivered
+
+    single = npbc_core.get_paper_columns(connection, 2)
+    assert array_equal(single.paper_ids, array([2]))
+    assert single.names == ('paper2',)
+    assert single.costs.shape == (1, 7)
+
+    assert len(npbc_core.get_paper_columns(connection, 10).paper_ids) == 0
+
+    paper = npbc_core.get_paper(connection, 3)
+    assert paper.name == 'paper3'
+    assert array_equal(paper.costs, array([2.4, 4.6, 0, 0, 3.4, 4.6, 6]))
+    assert array_equal(paper.delivered, array([1, 1, 0, 0, 1, 1, 1]))
+
+    with raises(npbc_exceptions.PaperNotExists):
+        npbc_core.get_paper(connection, 10)
+
+    # an empty DB has empty columns of the right shape
+    connection.execute("DELETE FROM papers;")
+    assert npbc_core.get_paper_columns(connection).costs.shape == (0, 7)
+
+    connection.close()
+
+
+def test_bulk_papers():
+    connection = setup_db()
+
+    # cache a bill, so that the changes have to be picked up by it
+    npbc_core.calculate_bill_with_cache(connection, 1, 2022)
+
+    report = npbc_core.upsert_papers(
+        connection,
+        [
+            npbc_core.PaperDefinition('paper1', 0b1111111, [1] * 7),
+            npbc_core.PaperDefinition('paper4', 0b0000001, [2, 0, 0, 0, 0, 0, 0]),
+            npbc_core.PaperDefinition('', 0, [0] * 7),
+            npbc_core.PaperDefinition('paper5', 128, [0] * 7),
+            npbc_core.PaperDefinition('paper6', 0, [0] * 6),
+            npbc_core.PaperDefinition('paper7', 0, [-1] * 7),
+            npbc_core.PaperDefinition('paper8', 0, '1234567'),
+            npbc_core.PaperDefinition('paper4', 0, [0] * 7),
+            ('paper9',),
+            None
+        ],
+        batch_size=1
+    )
+
+    assert report.applied == 2
+    assert [index for index, _ in report.errors] == [2, 3, 4, 5, 6, 7, 8, 9]
+
+    paper1 = npbc_core.get_paper(connection, 1)
+    assert array_equal(paper1.costs, array([1] * 7))
+    assert array_equal(paper1.delivered, array([1] * 7))
+
+    # an upsert that edits a paper still uses up an ID, so find the new paper by name
+    paper_id = connection.execute("SELECT paper_id FROM papers WHERE name = 'paper4';").fetchone()[0]
+    paper4 = npbc_core.get_paper(connection, paper_id)
+    assert array_equal(paper4.delivered, array([1, 0, 0, 0, 0, 0, 0]))
+
+    report = npbc_core.delete_papers(connection, ['paper2', 'paper9', 'paper2'])
+    assert report.applied == 1
+    assert [index for index, _ in report.errors] == [1, 2]
+    assert npbc_core.get_paper_columns(connection).names == ('paper1', 'paper3', 'paper4')
+
+    # the cached bill is brought up to date with the changes
+    cached = npbc_core.calculate_bill_with_cache(connection, 1, 2022)
+    connection.execute("DELETE FROM cached_bills;")
+    connection.execute("DELETE FROM cached_bill_costs;")
+    fresh = npbc_core.calculate_bill_with_cache(connection, 1, 2022)
+
+    assert cached[0] == fresh[0]
+    assert cached[1] == approx(fresh[1])
+
+    connection.close()
+
+
+def test_bulkpapers_cli(tmp_path):
+    setup_db().close()
+
+    input_path = tmp_path / 'papers.json'
+    input_path.write_text(dumps({
+        'upsert': [
+            {'name': 'paper4', 'delivered': 'YNNNNNY', 'costs': [1, 0, 0, 0, 0, 0, 2]},
+            {'name': 'paper5', 'delivered': 'YY', 'costs': [0] * 7}
+        ],
+        'delete': ['paper3']
+    }))
+
+    npbc_cli.main(['bulkpapers', '-f', str(input_path)])
+
+    connection = connect(DATABASE_PATH)
+    assert npbc_core.get_paper_columns(connection).names == ('paper1', 'paper2', 'paper4')
+    paper_id = connection.execute("SELECT paper_id FROM papers WHERE name = 'paper4';").fetchone()[0]
+    assert array_equal(npbc_core.get_paper(connection, paper_id).delivered, array([1, 0, 0, 0, 0, 0, 1]))
+    connection.close()
+
+
+def test_import_records(tmp_path):
+    connection = setup_db()
+
+    papers_path = tmp_path / 'papers.csv'
+    papers_path.write_text(
+        "name,delivered,cost_0,cost_1,cost_2,cost_3,cost_4,cost_5,cost_6\n"
+        "paper4,YNNNNNY,1,0,0,0,0,0,2\n"
+        "paper1,127,1,1,1,1,1,1,1\n"
+        "paper5,YY,1,1,1,1,1,1,1\n"
+        "paper6,0,1,1,1\n"
+        "paper7,0,1,1,1,1,1,1,1,1\n"
+    )
+
+    report = npbc_core.import_records(connection, 'papers', papers_path, tmp_path / 'papers.rejects.jsonl', batch_size=2)
+    assert report == npbc_core.ImportReport(2, 3)
+
+    rejects = [loads(line) for line in (tmp_path / 'papers.rejects.jsonl').read_text().splitlines()]
+    assert [reject['line'] for reject in rejects] == [4, 5, 6]
+    assert rejects[0]['record']['name'] == 'paper5'
+    assert rejects[2]['record'] is None
+
+    assert npbc_core.get_paper_columns(connection).names == ('paper1', 'paper2', 'paper3', 'paper4')
+    assert array_equal(npbc_core.get_paper(connection, 1).delivered, array([1] * 7))
+
+    strings_path = tmp_path / 'strings.jsonl'
+    strings_path.write_text('\n'.join([
+        dumps({'paper_id': 1, 'month': 2, 'year': 2022, 'string': '5'}),
+        dumps({'paper_id': '2', 'month': '2', 'year': '2022', 'string': 'mondays'}),
+        '',
+        dumps({'paper_id': 9, 'month': 2, 'year': 2022, 'string': '5'}),
+        dumps({'paper_id': 1, 'month': 13, 'year': 2022, 'string': '5'}),
+        dumps({'paper_id': 1, 'month': 2, 'year': 2022, 'string': 'sometimes'}),
+        dumps({'paper_id': 1, 'month': 2, 'year': 2022}),
+        '{"paper_id": 1',
+        '[]'
+    ]))
+
+    report = npbc_core.import_records(connection, 'strings', strings_path, tmp_path / 'strings.rejects.jsonl', batch_size=3)
+    assert report == npbc_core.ImportReport(2, 6)
+
+    rejects = [loads(line) for line in (tmp_path / 'strings.rejects.jsonl').read_text().splitlines()]
+    assert [reject['line'] for reject in rejects] == [4, 5, 6, 7, 8, 9]
+
+    assert connection.execute("SELECT paper_id, string FROM undelivered_strings WHERE month = 2 AND year = 2022 ORDER BY paper_id;").fetchall() == [(1, '5'), (2, 'mondays')]
+
+    with raises(npbc_exceptions.InvalidInput):
+        npbc_core.import_records(connection, 'papers', tmp_path / 'papers.txt')
+
+    with raises(npbc_exceptions.InvalidInput):
+        npbc_core.import_records(connection, 'logs', papers_path)
+
+    connection.close()
+
+
+def test_import_cli(tmp_path):
+    setup_db().close()
+
+    input_path = tmp_path / 'papers.jsonl'
+    input_path.write_text(dumps({'name': 'paper4', 'delivered': 'YYYYYYY', 'costs': [1] * 7}) + '\n')
+
+    npbc_cli.main(['import', '-k', 'papers', '-f', str(input_path)])
+
+    connection = connect(DATABASE_PATH)
+    assert npbc_core.get_paper_columns(connection).names == ('paper1', 'paper2', 'paper3', 'paper4')
+    connection.close()
+
+
+def test_export_records(tmp_path):
+    connection = setup_db()
+
+    npbc_core.save_results(connection, {1: 10.5, 2: 3}, {1: 0b10100, 2: 0}, 1, 2022)
+    npbc_core.save_results(connection, {1: 11.5}, {1: 0b101}, 2, 2022)
+
+    assert npbc_core.export_records(connection, 'logs', tmp_path / 'logs.csv') == 3
+
+    with open(tmp_path / 'logs.csv', newline='') as logs_file:
+        rows = list(DictReader(logs_file))
+
+    assert [row['cost'] for row in rows] == ['10.5', '3.0', '11.5']
+    assert [row['undelivered_mask'] for row in rows] == ['20', '0', '5']
+
+    # filters
+    assert npbc_core.export_records(connection, 'logs', tmp_path / 'logs.jsonl', paper_id=1, start_month=2, start_year=2022) == 1
+    assert loads((tmp_path / 'logs.jsonl').read_text())['cost'] == 11.5
+
+    # dates are expanded from the bitmasks
+    assert npbc_core.export_records(connection, 'dates', tmp_path / 'dates.npy', end_month=1, end_year=2022) == 2
+    assert list(load(tmp_path / 'dates.npy')['date']) == ['2022-01-03', '2022-01-05']
+
+    assert npbc_core.export_records(connection, 'dates', tmp_path / 'dates.csv', start_month=3, start_year=2022) == 0
+
+    assert npbc_core.export_records(connection, 'papers', tmp_path / 'papers.npz', chunk_size=2) == 3
+
+    with load(tmp_path / 'papers.npz') as papers:
+        paper_columns = npbc_core.get_paper_columns(connection)
+
+        assert list(papers['name']) == list(paper_columns.names)
+        assert array_equal(papers['cost_1'], paper_columns.costs[:, 1])
+
+    with raises(npbc_exceptions.InvalidInput):
+        npbc_core.export_records(connection, 'papers', tmp_path / 'papers.txt')
+
+    connection.close()
+
+
+def test_archive_logs(tmp_path):
+    connection = setup_db()
+
+    npbc_core.save_results(connection, {1: 10.5, 2: 3}, {1: 0b10100, 2: 0}, 1, 2020, datetime(2022, 1, 1))
+    npbc_core.save_results(connection, {1: 11.5}, {1: 0b101}, 2, 2021, datetime(2022, 1, 2))
+    npbc_core.save_results(connection, {3: 12.5}, {3: 0b1}, 12, 2020, datetime(2022, 1, 3))
+    connection.commit()
+
+    before = list(npbc_core.get_logged_data(connection, archive_dir=tmp_path))
+
+    assert npbc_core.archive_logs(connection, 2020, tmp_path) == 3
+    assert npbc_core.get_archive_paths(archive_dir=tmp_path) == [tmp_path / 'logs-2020.sqlite']
+    assert connection.execute("SELECT year FROM logs;").fetchall() == [(2021,)]
+    assert connection.execute("SELECT COUNT(*) FROM cost_logs;").fetchone()[0] == 1
+
+    # the archive is created with the same performance profile as the main DB
+    archive = connect(tmp_path / 'logs-2020.sqlite')
+    assert archive.execute("PRAGMA journal_mode;").fetchone()[0] == npbc_core.PERFORMANCE_PROFILES[npbc_core.PERFORMANCE_PROFILE].get('journal_mode', 'delete').lower()
+    archive.close()
+
+    with raises(npbc_exceptions.InvalidInput):
+        npbc_core.archive_logs(connection, 2021, tmp_path, profile='unknown')
+
+    assert not (tmp_path / 'logs-2021.sqlite').exists()
+
+    # archived logs are still read, in the same order
+    assert list(npbc_core.get_logged_data(connection, archive_dir=tmp_path)) == before
+    assert list(npbc_core.get_logged_data(connection, query_year=2021, archive_dir=tmp_path)) == [row for row in before if row[2] == 2021]
+    assert list(npbc_core.get_logged_data(connection, query_paper_id=3, archive_dir=tmp_path)) == [row for row in before if row[0] == 3]
+
+    assert npbc_core.export_records(connection, 'logs', tmp_path / 'logs.csv', archive_dir=tmp_path) == 4
+    assert npbc_core.export_records(connection, 'dates', tmp_path / 'dates.npy', start_month=1, start_year=2021, archive_dir=tmp_path) == 2
+
+    # logs added to an archived year are moved by archiving it again
+    npbc_core.save_results(connection, {2: 1}, {2: 0}, 6, 2020, datetime(2022, 1, 4))
+    connection.commit()
+
+    assert npbc_core.archive_logs(connection, 2020, tmp_path) == 1
+
+    # a year without logs has nothing to archive, so no archive is created for it
+    assert npbc_core.archive_logs(connection, 2019, tmp_path) == 0
+    assert not (tmp_path / 'logs-2019.sqlite').exists()
+    assert len(list(npbc_core.get_logged_data(connection, query_year=2020, archive_dir=tmp_path))) == 7
+
+    with raises(npbc_exceptions.InvalidInput):
+        npbc_core.archive_logs(connection, date.today().year, tmp_path)
+
+    connection.close()
+
+
+def test_strings_for_all_papers():
+    connection = setup_db()
+
+    # a string for all papers is the same as giving it to every paper
+    fanned_out = npbc_core.calculate_cost_of_all_papers(connection, {1: ['5', '6-12', '1'], 2: ['sundays', '1'], 3: ['2-tuesday', '1']}, 11, 2020)
+    shared = npbc_core.calculate_cost_of_all_papers(connection, {1: ['5', '6-12'], 2: ['sundays'], 3: ['2-tuesday'], None: ['1']}, 11, 2020)
+    assert shared == fanned_out
+
+    for shard_size in (1, 2):
+        assert npbc_core.calculate_cost_of_all_papers(connection, {1: ['5', '6-12'], None: ['1']}, 11, 2020, workers=2, shard_size=shard_size) == npbc_core.calculate_cost_of_all_papers(connection, {1: ['5', '6-12'], None: ['1']}, 11, 2020)
+
+    # it is stored once, and used by the cached, incremental, and range calculations
+    npbc_core.calculate_bill_with_cache(connection, 11, 2020)
+    npbc_core.add_undelivered_string(connection, 11, 2020, None, '1')
+    assert connection.execute("SELECT COUNT(*) FROM undelivered_strings WHERE paper_id IS NULL;").fetchone()[0] == 1
+
+    npbc_core.add_undelivered_string(connection, 11, 2020, 2, '2')
+    assert npbc_core.calculate_bill_with_cache(connection, 11, 2020)[:2] == approx(npbc_core.calculate_cost_of_all_papers(connection, {1: ['5', '6-12', '1'], 2: ['sundays', '1', '2'], 3: ['2-tuesday', '1']}, 11, 2020)[:2])
+
+    # papers added later get the strings for all papers too
+    npbc_core.add_new_paper(connection, 'paper4', [True] * 7, [1] * 7)
+    costs, _, undelivered_dates = npbc_core.calculate_bill_with_cache(connection, 11, 2020)
+    assert costs[4] == 29
+    assert undelivered_dates[4] == {date(2020, 11, 1)}
+
+    range_costs = npbc_core.calculate_cost_of_all_papers_in_range(connection, 11, 2020, 11, 2020)
+    assert range_costs.costs[:, 0].tolist() == list(costs.values())
+
+    # deleting it needs its own scope
+    with raises(npbc_exceptions.StringNotExists):
+        npbc_core.delete_undelivered_string(connection, string='1', paper_id=1, month=11, year=2020)
+
+    npbc_core.delete_undelivered_string(connection, string='1', all_papers=True, month=11, year=2020)
+    assert npbc_core.calculate_bill_with_cache(connection, 11, 2020)[0][4] == 30
+
+    connection.close()
+
+
+def test_stored_masks():
+    connection = setup_db()
+    months = npbc_core.get_months_in_range(10, 2020, 11, 2020)
+
+    # strings added without masks are parsed when calculating
+    before = npbc_core.calculate_bill_with_cache(connection, 11, 2020)
+    revisions = npbc_core.get_revisions(connection, 11, 2020)
+    assert npbc_core.get_undelivered_strings_in_range(connection, months)[(11, 2020)] == {1: ['5', '6-12'], 2: ['sundays'], 3: ['2-tuesday']}
+
+    # backfilling compiles them, without making the cached bill stale
+    assert npbc_core.backfill_undelivered_string_masks(connection, batch_size=2) == (5, 0)
+    assert npbc_core.get_revisions(connection, 11, 2020) == revisions
+    assert npbc_core.get_cached_bill(connection, 11, 2020) is not None
+
+    assert npbc_core.get_undelivered_strings_in_range(connection, months) == {
+        (10, 2020): {3: [(1 << 31) - 1]},
+        (11, 2020): {1: [0b10000, 0b111111100000], 2: [npbc_core.get_weekday_masks(11, 2020)[6]], 3: [1 << 9]}
+    }
+
+    # compiled strings are not parsed again, and give the same bill
+    connection.execute("DELETE FROM cached_bills WHERE month = 11 AND year = 2020;")
+    npbc_core.clear_parse_cache()
+    assert npbc_core.calculate_bill_with_cache(connection, 11, 2020) == before
+    assert npbc_core.get_parse_cache_info()[:2] == (0, 0)
+
+    # new strings are compiled when they are added, and must be valid for their month
+    npbc_core.add_undelivered_string(connection, 2, 2022, 1, '2-3', 'all')
+    assert [row[0] for row in connection.execute("SELECT mask FROM undelivered_strings WHERE month = 2 AND year = 2022;")] == [0b110, (1 << 28) - 1]
+
+    with raises(npbc_exceptions.InvalidUndeliveredString):
+        npbc_core.add_undelivered_string(connection, 2, 2022, None, '30')
+
+    # strings that can't be compiled are left without a mask
+    connection.execute("INSERT INTO undelivered_strings (month, year, paper_id, string) VALUES (2, 2022, 1, '30');")
+    assert npbc_core.backfill_undelivered_string_masks(connection) == (0, 1)
+    assert connection.execute("SELECT mask FROM undelivered_strings WHERE string = '30';").fetchone()[0] is None
+    connection.commit()
+
+    npbc_cli.main(['compileudl'])
+    assert npbc_core.backfill_undelivered_string_masks(connection) == (0, 1)
+
+    connection.close()
@@ -70,6 +70,8 @@ def test_regex_days():
     assert npbc_regex.DAYS_MATCH_REGEX.match('monday,tuesday') is None
     assert npbc_regex.DAYS_MATCH_REGEX.match('mondays') is not None
     assert npbc_regex.DAYS_MATCH_REGEX.match('tuesdays') is not None
+    assert npbc_regex.DAYS_MATCH_REGEX.match('mondays,tuesdays') is None
+    assert npbc_regex.DAYS_MATCH_REGEX.match('tuesdaysx') is None
 
 def test_regex_n_days():
     assert npbc_regex.N_DAY_MATCH_REGEX.match('') is None
@@ -112,6 +114,28 @@ def test_regex_all_text():
     assert npbc_regex.ALL_MATCH_REGEX.match('AlL') is not None
     assert npbc_regex.ALL_MATCH_REGEX.match('ALL') is not None
 
+def test_regex_undelivered_string():
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('') is None
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('1').lastgroup == 'number'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('11').lastgroup == 'number'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('111') is None
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('1-2').lastgroup == 'range'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('11 - 12').lastgroup == 'range'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('11-12-1') is None
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('mondays').lastgroup == 'weekday'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('monday') is None
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('mondays,tuesdays') is None
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('1-tuesday').lastgroup == 'nth_weekday'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('1 - tuesday').lastgroup == 'nth_weekday'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('11-tuesday') is None
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('1-tuesdays') is None
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('all').lastgroup == 'all'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('AlL').lastgroup == 'all'
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('all,tuesdays') is None
+
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('5 - 17').group('start', 'end') == ('5', '17')
+    assert npbc_regex.UNDELIVERED_STRING_MATCH_REGEX.match('2-monday').group('n', 'nth_weekday_name') == ('2', 'monday')
+
 def test_delivery_regex():
     assert npbc_regex.DELIVERY_MATCH_REGEX.match('') is None
     assert npbc_regex.DELIVERY_MATCH_REGEX.match('a') is None